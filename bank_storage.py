@@ -0,0 +1,300 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Bank Storage Module
+
+Name: Kayla Bagley
+
+This module is the bank: a stash with no size limit that lives on
+disk in small pages, so big hoards don't have to be in the save file.
+"""
+
+import heapq
+import os
+
+import inventory_system
+from custom_exceptions import (
+    ItemNotFoundError,
+    InventoryFullError,
+    SaveFileCorruptedError,
+    InvalidSaveDataError
+)
+
+# ============================================================================
+# BANK STORAGE
+# ============================================================================
+# a bank is a folder with an index (which page each item is on) and
+# page files of "item_id: quantity" lines. every item sits on exactly
+# one page, and a page holds at most PAGE_SIZE different items. the
+# index's first line is always the page count header, so no item ID
+# (not even one called PAGES) can be mistaken for it.
+
+BANK_DIRECTORY = "data/save_games"
+SHARED_BANK_NAME = "shared"
+PAGE_SIZE = 50
+INDEX_FILENAME = "index.txt"
+PAGES_HEADER = "#PAGES"
+
+class Bank:
+    """
+    Paged on-disk stash
+
+    Opening a bank only reads the index. Pages are read the first time
+    something on them is needed, and flush() only writes pages that
+    changed (plus the index if items were added or removed). Pages with
+    room are kept in a heap, so new items go to the lowest one without
+    scanning; pages emptied at the end of the bank are dropped.
+    """
+
+    def __init__(self, name=SHARED_BANK_NAME, directory=BANK_DIRECTORY):
+        """
+        Open (or start) the bank called name
+
+        Raises:
+            SaveFileCorruptedError if the index can't be read
+            InvalidSaveDataError if the index is malformed
+        """
+        self.name = name
+        self.path = os.path.join(directory, f"bank_{name}")
+        self.index = {}
+        self.page_sizes = []
+        self.pages = {}
+        self.dirty_pages = set()
+        self.dropped_pages = set()
+        self.index_dirty = False
+        self._load_index()
+        self.open_pages = [n for n, size in enumerate(self.page_sizes) if size < PAGE_SIZE]
+        self.open_set = set(self.open_pages)
+
+    # ------------------------------------------------------------------ files
+
+    def _page_path(self, page_number):
+        return os.path.join(self.path, f"page_{page_number:04d}.txt")
+
+    def _load_index(self):
+        index_path = os.path.join(self.path, INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            return
+        pairs = read_pairs(index_path)
+# older banks wrote the header as "PAGES", but it was always the first line
+        if not pairs or pairs[0][0] not in (PAGES_HEADER, "PAGES"):
+            raise InvalidSaveDataError(f"Bank index {index_path} has no {PAGES_HEADER} header.")
+        self.page_sizes = [0] * pairs[0][1]
+        for item_id, value in pairs[1:]:
+            if not 0 <= value < len(self.page_sizes):
+                raise InvalidSaveDataError(f"Bank index puts {item_id} on a missing page.")
+            self.index[item_id] = value
+            self.page_sizes[value] += 1
+
+    def _load_page(self, page_number):
+        """Read a page from disk the first time it's needed"""
+        page = self.pages.get(page_number)
+        if page is None:
+            path = self._page_path(page_number)
+            page = dict(read_pairs(path)) if os.path.exists(path) else {}
+            self.pages[page_number] = page
+        return page
+
+    def flush(self):
+        """
+        Write every changed page (and the index if it changed)
+
+        Every file is written to a temporary file first and then moved
+        into place, index last, so a crash part way through never leaves
+        a half-written file or an index pointing at pages not written yet.
+
+        Returns: Number of files written
+        """
+        os.makedirs(self.path, exist_ok=True)
+        files = [(self._page_path(n), self.pages[n].items()) for n in sorted(self.dirty_pages)]
+        if self.index_dirty:
+            pairs = [(PAGES_HEADER, len(self.page_sizes))] + sorted(self.index.items())
+            files.append((os.path.join(self.path, INDEX_FILENAME), pairs))
+        for path, pairs in files:
+            write_pairs(path + ".tmp", pairs)
+        for path, _ in files:
+            os.replace(path + ".tmp", path)
+        written = len(files)
+        self.dirty_pages.clear()
+        self.index_dirty = False
+# dropped pages go once the index no longer counts them
+        for page_number in sorted(self.dropped_pages):
+            path = self._page_path(page_number)
+            if os.path.exists(path):
+                os.remove(path)
+                written += 1
+        self.dropped_pages.clear()
+        return written
+
+    # ---------------------------------------------------------------- contents
+
+    def count(self, item_id):
+        """How many of an item are in the bank"""
+        page_number = self.index.get(item_id)
+        if page_number is None:
+            return 0
+        return self._load_page(page_number).get(item_id, 0)
+
+    def page_count(self):
+        """Number of pages"""
+        return len(self.page_sizes)
+
+    def view_page(self, page_number):
+        """
+        Get the items on one page (loading only that page)
+
+        Returns: List of (item_id, quantity) tuples in item ID order
+        Raises: ValueError if the page doesn't exist
+        """
+        if not 0 <= page_number < len(self.page_sizes):
+            raise ValueError(f"Bank page {page_number + 1} doesn't exist.")
+        return sorted(self._load_page(page_number).items())
+
+    def _store(self, item_id, quantity):
+        """Add quantity of an item to its page (picking one if it's new)"""
+        page_number = self.index.get(item_id)
+        if page_number is None:
+            page_number = self._open_page()
+            self.index[item_id] = page_number
+            self.page_sizes[page_number] += 1
+            self.index_dirty = True
+        page = self._load_page(page_number)
+        page[item_id] = page.get(item_id, 0) + quantity
+        self.dirty_pages.add(page_number)
+
+    def _take(self, item_id, quantity):
+        """Remove quantity of an item (the caller checked there's enough)"""
+        page_number = self.index[item_id]
+        page = self._load_page(page_number)
+        page[item_id] -= quantity
+        self.dirty_pages.add(page_number)
+        if page[item_id] == 0:
+            del page[item_id]
+            del self.index[item_id]
+            self.page_sizes[page_number] -= 1
+            self.index_dirty = True
+            self._has_room(page_number)
+            self._drop_empty_pages()
+
+    def _has_room(self, page_number):
+        """Note that a page can take another item"""
+        if page_number not in self.open_set:
+            self.open_set.add(page_number)
+            heapq.heappush(self.open_pages, page_number)
+
+    def _drop_empty_pages(self):
+        """Drop empty pages from the end of the bank (their files go on flush)"""
+        while self.page_sizes and self.page_sizes[-1] == 0:
+            page_number = len(self.page_sizes) - 1
+            self.page_sizes.pop()
+            self.pages.pop(page_number, None)
+            self.dirty_pages.discard(page_number)
+            self.dropped_pages.add(page_number)
+
+    def _open_page(self):
+        """Lowest page number with room for a new item (adding a page if needed)"""
+# entries for pages that filled up or were dropped are skipped here
+        while self.open_pages:
+            page_number = self.open_pages[0]
+            if page_number < len(self.page_sizes) and self.page_sizes[page_number] < PAGE_SIZE:
+                return page_number
+            heapq.heappop(self.open_pages)
+            self.open_set.discard(page_number)
+        page_number = len(self.page_sizes)
+        self.page_sizes.append(0)
+# a dropped page's old file must not be read back
+        self.pages[page_number] = {}
+        self.dropped_pages.discard(page_number)
+        self.index_dirty = True
+        self._has_room(page_number)
+        return page_number
+
+    # ------------------------------------------------------- deposit/withdraw
+
+    def deposit(self, character, item_id, quantity=1):
+        """
+        Move items from the character's inventory into the bank
+
+        Returns: Quantity now in the bank
+        Raises:
+            ValueError if quantity is not positive
+            ItemNotFoundError if the character doesn't have that many
+        """
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1.")
+        if inventory_system.count_item(character, item_id) < quantity:
+            raise ItemNotFoundError(f"You don't have {quantity} {item_id}.")
+        for _ in range(quantity):
+            inventory_system.remove_item_from_inventory(character, item_id)
+        self._store(item_id, quantity)
+        return self.count(item_id)
+
+    def withdraw(self, character, item_id, quantity=1):
+        """
+        Move items from the bank into the character's inventory
+
+        Returns: Quantity left in the bank
+        Raises:
+            ValueError if quantity is not positive
+            ItemNotFoundError if the bank doesn't have that many
+            InventoryFullError if they won't all fit
+        """
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1.")
+        if self.count(item_id) < quantity:
+            raise ItemNotFoundError(f"The bank doesn't have {quantity} {item_id}.")
+        inventory = inventory_system.get_inventory(character)
+        if inventory.slots_needed(item_id, quantity) > inventory_system.get_inventory_space_remaining(character):
+            raise InventoryFullError("Not enough inventory space to withdraw that many.")
+        self._take(item_id, quantity)
+        for _ in range(quantity):
+            inventory_system.add_item_to_inventory(character, item_id)
+        return self.count(item_id)
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def read_pairs(path):
+    """
+    Read "name: number" lines from a bank file
+
+    Returns: List of (name, int) tuples
+    Raises:
+        SaveFileCorruptedError if the file can't be read
+        InvalidSaveDataError if a line is malformed
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError as e:
+        raise SaveFileCorruptedError(f"Could not read bank file {path}.") from e
+    pairs = []
+    for line in lines:
+        if not line.strip():
+            continue
+# item IDs can have ':' in them, the number is after the last one
+        name, colon, value = line.rpartition(":")
+        try:
+            if not colon:
+                raise ValueError(line)
+            pairs.append((name.strip(), int(value)))
+        except ValueError as e:
+            raise InvalidSaveDataError(f"Bad line in bank file {path}: {line.strip()}") from e
+    return pairs
+
+def write_pairs(path, pairs):
+    """Write "name: number" lines to a bank file in one write"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{name}: {value}\n" for name, value in pairs))
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=== BANK STORAGE TEST ===")
+
+    # bank = Bank("test", "data/save_games")
+    # hero = {'inventory': ['health_potion', 'health_potion']}
+    # bank.deposit(hero, "health_potion", 2)
+    # print(bank.view_page(0), bank.flush())
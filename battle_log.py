@@ -0,0 +1,161 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Battle Log Module
+
+Name: Kayla Bagley
+
+This module records what happens in a battle as structured events,
+renders them to the console in batches, and exports them for analysis.
+"""
+
+import json
+import sys
+from collections import deque
+
+# ============================================================================
+# EVENT LOG
+# ============================================================================
+# every event has the same columns, in this order
+
+EVENT_FIELDS = ("turn", "actor", "action", "target", "damage", "hp_after", "message")
+DEFAULT_CAPACITY = 1000
+
+class BattleLog:
+    """
+    Bounded log of battle events
+
+    Events are kept in a ring buffer (the oldest drop off once capacity
+    is reached). When rendering is on, new events wait in a pending list
+    and get written to the console in one write on flush() (or as soon
+    as capacity events are waiting). With render=False nothing is ever
+    formatted or printed, and with enabled=False record() returns
+    straight away, so simulations pay nothing for the log.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, render=True, stream=None, enabled=True):
+        """
+        Args:
+            capacity: Most events kept in memory (and waiting to render)
+            render: Whether flush() writes to the console
+            stream: File-like object to write to (defaults to sys.stdout)
+            enabled: Whether events are recorded at all
+        """
+        self.events = deque(maxlen=capacity)
+        self.capacity = capacity
+        self.render = render and enabled
+        self.enabled = enabled
+        self.stream = stream
+        self.pending = []
+
+    def record(self, turn, actor, action, target=None, damage=0, hp_after=None, message=None):
+        """
+        Record one battle event
+
+        Args:
+            turn: Turn number
+            actor: Name of whoever acted
+            action: Short action name (e.g. "attack", "ability", "escape")
+            target: Name of whoever was affected, if anyone
+            damage: Damage dealt (0 if none)
+            hp_after: Target's health after the action
+            message: Text shown on the console (built from the fields if None)
+        """
+        if not self.enabled:
+            return
+        event = (turn, actor, action, target, damage, hp_after, message)
+        self.events.append(event)
+        if self.render:
+            self.pending.append(event)
+            if len(self.pending) >= self.capacity:
+                self.flush()
+
+    def flush(self, footer=""):
+        """
+        Write pending events (and an optional footer) in a single write
+
+        Does nothing when rendering is off.
+        """
+        if not self.render:
+            return
+        lines = [f">>> {format_event(event)}\n" for event in self.pending]
+        self.pending = []
+        if footer:
+            lines.append(footer)
+        if lines:
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write("".join(lines))
+
+    def to_dicts(self):
+        """
+        Get the buffered events as dictionaries
+
+        Returns: List of {field: value} dictionaries, oldest first
+        """
+        return [dict(zip(EVENT_FIELDS, event)) for event in self.events]
+
+    def to_columns(self):
+        """
+        Get the buffered events column by column
+
+        Returns: Dictionary {field: [value, ...]}
+        """
+        if not self.events:
+            return {field: [] for field in EVENT_FIELDS}
+        columns = zip(*self.events)
+        return {field: list(values) for field, values in zip(EVENT_FIELDS, columns)}
+
+    def export_jsonl(self, filename):
+        """
+        Write every buffered event as JSON Lines (one event per line)
+
+        Returns: Number of events written
+        """
+        lines = [json.dumps(event) + "\n" for event in self.to_dicts()]
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write("".join(lines))
+        return len(lines)
+
+    def export_columns(self, filename):
+        """
+        Write every buffered event as one JSON object of columns
+
+        Returns: Number of events written
+        """
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_columns(), f)
+        return len(self.events)
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def format_event(event):
+    """
+    Turn an event tuple into a line of console text
+
+    Returns: String (the event's message if it has one)
+    """
+    turn, actor, action, target, damage, hp_after, message = event
+    if message:
+        return message
+    text = f"{actor} uses {action}"
+    if target is not None:
+        text += f" on {target}"
+    if damage:
+        text += f" for {damage} damage"
+    if hp_after is not None:
+        text += f" (HP {hp_after})"
+    return text + "."
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=== BATTLE LOG TEST ===")
+
+    # log = BattleLog(capacity=3)
+    # for turn in range(1, 5):
+    #     log.record(turn, "Hero", "attack", "Goblin", 5, 50 - turn * 5)
+    # log.flush()
+    # print(log.to_columns())
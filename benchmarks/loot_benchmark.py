@@ -0,0 +1,63 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Loot Benchmark
+
+Name: Kayla Bagley
+
+Times alias-table draws from the loot tables.
+
+Usage (from the project folder):
+    python benchmarks/loot_benchmark.py [draws] [table_id]
+
+Defaults to 10,000,000 draws from the orc table, then 100,000 full
+roll_loot calls (nested tables, quantities) for comparison.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loot_system
+
+DEFAULT_DRAWS = 10_000_000
+FULL_ROLLS = 100_000
+
+def benchmark_draws(table_id, draws, rng):
+    """
+    Time single-entry draws from one table
+
+    Returns: Tuple (seconds, {kind/ref: count})
+    """
+    tables = loot_system.get_loot_tables()
+    entries, probabilities, aliases, _ = tables[table_id]
+    draw = loot_system.combat_system.alias_draw
+    counts = [0] * len(entries)
+    start = time.perf_counter()
+    for _ in range(draws):
+        counts[draw(probabilities, aliases, rng)] += 1
+    elapsed = time.perf_counter() - start
+    return elapsed, {entry[1] or entry[0]: count for entry, count in zip(entries, counts)}
+
+def benchmark_rolls(table_id, rolls, rng):
+    """Time full roll_loot calls; returns seconds"""
+    start = time.perf_counter()
+    for _ in range(rolls):
+        loot_system.roll_loot(table_id, rng)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    draws = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DRAWS
+    table_id = sys.argv[2] if len(sys.argv) > 2 else "orc"
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    rng = random.Random(163)
+
+    elapsed, counts = benchmark_draws(table_id, draws, rng)
+    print(f"{draws:,} draws from '{table_id}': {elapsed:.2f}s ({draws / elapsed:,.0f} draws/s)")
+    for name, count in counts.items():
+        print(f"  {name}: {count / draws:.2%}")
+
+    elapsed = benchmark_rolls(table_id, FULL_ROLLS, rng)
+    print(f"{FULL_ROLLS:,} full rolls: {elapsed:.2f}s ({FULL_ROLLS / elapsed:,.0f} rolls/s)")
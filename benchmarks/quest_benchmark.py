@@ -0,0 +1,142 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Quest Benchmark
+
+Name: Kayla Bagley
+
+Times get_available_quests for a veteran character, with the quest
+lists as plain lists (the old linear 'in' checks) and as QuestSets,
+plan_quests and the quest analyzer on the same quests, then
+get_quests_by_level range queries on a much bigger catalog.
+
+Usage (from the project folder):
+    python benchmarks/quest_benchmark.py [quests] [completed] [calls] [catalog]
+
+Defaults to 10,000 quests, 5,000 of them completed, 20 calls each, and
+a 1,000,000 quest catalog for the level ranges.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quest_analyzer
+import quest_handler
+
+DEFAULT_QUESTS = 10_000
+DEFAULT_COMPLETED = 5_000
+DEFAULT_CALLS = 20
+DEFAULT_CATALOG = 1_000_000
+RANGE_QUERIES = 10_000
+MAX_QUEST_LEVEL = 1000
+
+def make_quests(count, rng):
+    """Quests where most need one earlier quest and levels run 1-50"""
+    quests = {}
+    for i in range(count):
+        prereq = f"quest_{rng.randrange(i)}" if i and rng.random() < 0.8 else None
+        quests[f"quest_{i}"] = {
+            "quest_id": f"quest_{i}",
+            "title": f"Quest {i}",
+            "description": "Benchmark quest",
+            "reward_xp": 10,
+            "reward_gold": 5,
+            "required_level": rng.randint(1, 50),
+            "prerequisite": prereq
+        }
+    return quests
+
+def list_scan_available(character, quest_data_dict):
+    """get_available_quests as it was, with list membership checks"""
+    available = []
+    level = character.get("level", 1)
+    completed = character.get("completed_quests", [])
+    active = character.get("active_quests", [])
+    for qid, quest in quest_data_dict.items():
+        if level < quest.get("required_level", 1):
+            continue
+        prereq = quest.get("prerequisite", "NONE")
+        if prereq and str(prereq).upper() != "NONE" and prereq not in completed:
+            continue
+        if qid in completed or qid in active:
+            continue
+        available.append(quest)
+    return available
+
+def benchmark_level_ranges(count, rng):
+    """
+    Time get_quests_by_level on a big catalog (the level index is built
+    once, like it is when the game loads)
+
+    Returns: Tuple (index build seconds, seconds per query, average quests returned)
+    """
+    quests = {}
+    for i in range(count):
+        quests[f"quest_{i}"] = {"quest_id": f"quest_{i}", "required_level": rng.randint(1, MAX_QUEST_LEVEL),
+                                "reward_xp": 10, "reward_gold": 5, "prerequisite": None}
+    start = time.perf_counter()
+    quest_handler.get_quest_graph(quests)
+    built = time.perf_counter() - start
+    ranges = [(level, level + rng.randint(0, 2)) for level in (rng.randint(1, MAX_QUEST_LEVEL) for _ in range(RANGE_QUERIES))]
+    found = 0
+    start = time.perf_counter()
+    for low, high in ranges:
+        found += len(quest_handler.get_quests_by_level(quests, low, high))
+    return built, (time.perf_counter() - start) / RANGE_QUERIES, found / RANGE_QUERIES
+
+def benchmark_planner(quests):
+    """
+    Time plan_quests from level 1 to level 40 and to the last quest
+
+    Returns: List of (label, seconds, quests planned) tuples
+    """
+    results = []
+    last_quest = list(quests)[-1]
+    for label, target in (("level 40", {"target_level": 40}), (last_quest, {"target_quest": last_quest})):
+        character = {"level": 1, "experience": 0, "class": "Warrior", "active_quests": [], "completed_quests": []}
+        start = time.perf_counter()
+        plan = quest_handler.plan_quests(character, quests, **target)
+        results.append((label, time.perf_counter() - start, len(plan["quests"])))
+    return results
+
+def benchmark(function, character, quests, calls):
+    """Time calls to function; returns (seconds per call, result size)"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        result = function(character, quests)
+    return (time.perf_counter() - start) / calls, len(result)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_QUESTS
+    completed = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_COMPLETED
+    calls = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_CALLS
+    catalog = int(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_CATALOG
+    rng = random.Random(163)
+    quests = make_quests(count, rng)
+    done = rng.sample(list(quests), completed)
+
+    before = {"level": 40, "active_quests": [], "completed_quests": list(done)}
+    after = {"level": 40, "active_quests": [], "completed_quests": list(done)}
+    quest_handler.get_quest_set(after, "completed_quests")
+
+    old_time, old_size = benchmark(list_scan_available, before, quests, max(1, calls // 10))
+    new_time, new_size = benchmark(quest_handler.get_available_quests, after, quests, calls)
+    assert old_size == new_size
+    print(f"{count:,} quests, {completed:,} completed, {new_size:,} available")
+    print(f"  lists:     {old_time * 1000:.1f} ms per call")
+    print(f"  QuestSets: {new_time * 1000:.1f} ms per call ({old_time / new_time:,.0f}x faster)")
+
+    for label, seconds, planned in benchmark_planner(quests):
+        print(f"  plan_quests to {label}: {seconds * 1000:.0f} ms ({planned:,} quests)")
+
+    start = time.perf_counter()
+    analysis = quest_analyzer.analyze_quests(quests)
+    print(f"  analyze_quests: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({len(analysis['reachable']):,} reachable, {len(analysis['gaps'])} XP gaps)")
+
+    built, per_query, average = benchmark_level_ranges(catalog, rng)
+    print(f"{catalog:,} quest catalog: level index built in {built:.1f}s")
+    print(f"  get_quests_by_level: {per_query * 1_000_000:.1f} us per query ({average:,.0f} quests each)")
@@ -10,6 +10,8 @@ This module handles character creation, loading, and saving.
 """
 
 import os
+
+import game_events
 from custom_exceptions import (
     InvalidCharacterClassError,
     CharacterNotFoundError,
@@ -62,7 +64,14 @@ def create_character(name, character_class):
         "gold": 100,
         "inventory": [],
         "active_quests": [],
-        "completed_quests": []
+        "completed_quests": [],
+        "base_stats": {"max_health": base["health"], "strength": base["strength"], "magic": base["magic"]},
+        "equipment": {},
+        "quest_progress": {},
+        "game_time": 0,
+        "quest_timers": {},
+        "quest_rewards": {"xp": 0, "gold": 0},
+        "quest_completions": {}
     }
     validate_character_data(character)
     return character
@@ -86,6 +95,12 @@ def save_character(character, save_directory="data/save_games"):
     INVENTORY: item1,item2,item3
     ACTIVE_QUESTS: quest1,quest2
     COMPLETED_QUESTS: quest1,quest2
+    EQUIPMENT: weapon:iron_sword:strength:5,armor:leather_armor:max_health:10
+    QUEST_PROGRESS: goblin_hunter:2,warriors_oath:1/0
+    GAME_TIME: 130
+    QUEST_TIMERS: goblin_bounty:expire:150,herb_run:reset:144
+    QUEST_REWARDS: 350/120
+    QUEST_COMPLETIONS: first_steps:1,herb_run:3
     
     Returns: True if successful
     Raises: PermissionError, IOError (let them propagate or handle)
@@ -101,6 +116,9 @@ def save_character(character, save_directory="data/save_games"):
     inventory_str = ",".join(character["inventory"])
     active_str = ",".join(character["active_quests"])
     completed_str = ",".join(character["completed_quests"])
+    equipment_str = format_equipment(character.get("equipment", {}))
+    progress_str = format_quest_progress(character.get("quest_progress", {}))
+    timers_str = format_quest_timers(character.get("quest_timers", {}))
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(f"NAME: {character['name']}\n")
         f.write(f"CLASS: {character['class']}\n")
@@ -114,6 +132,15 @@ def save_character(character, save_directory="data/save_games"):
         f.write(f"INVENTORY: {inventory_str}\n")
         f.write(f"ACTIVE_QUESTS: {active_str}\n")
         f.write(f"COMPLETED_QUESTS: {completed_str}\n")
+        f.write(f"EQUIPMENT: {equipment_str}\n")
+        f.write(f"QUEST_PROGRESS: {progress_str}\n")
+        f.write(f"GAME_TIME: {character.get('game_time', 0)}\n")
+        f.write(f"QUEST_TIMERS: {timers_str}\n")
+        if "quest_rewards" in character:
+            rewards = character["quest_rewards"]
+            f.write(f"QUEST_REWARDS: {rewards['xp']}/{rewards['gold']}\n")
+        if "quest_completions" in character:
+            f.write(f"QUEST_COMPLETIONS: {format_quest_completions(character['quest_completions'])}\n")
     return True
 
 def load_character(character_name, save_directory="data/save_games"):
@@ -165,13 +192,123 @@ def load_character(character_name, save_directory="data/save_games"):
             "gold": int(data_map["GOLD"]),
             "inventory": inventory_list,
             "active_quests": active_list,
-            "completed_quests": completed_list
+            "completed_quests": completed_list,
+            "equipment": parse_equipment(data_map.get("EQUIPMENT", "")),
+            "quest_progress": parse_quest_progress(data_map.get("QUEST_PROGRESS", "")),
+            "game_time": int(data_map.get("GAME_TIME", "0")),
+            "quest_timers": parse_quest_timers(data_map.get("QUEST_TIMERS", ""))
         }
+# older saves have no QUEST_REWARDS or QUEST_COMPLETIONS; quest_handler
+# starts them from the completed quests the first time they're needed
+        if "QUEST_REWARDS" in data_map:
+            xp, gold = data_map["QUEST_REWARDS"].split("/")
+            character["quest_rewards"] = {"xp": int(xp), "gold": int(gold)}
+        if "QUEST_COMPLETIONS" in data_map:
+            character["quest_completions"] = parse_quest_completions(data_map["QUEST_COMPLETIONS"])
     except (KeyError, ValueError) as e:
         raise InvalidSaveDataError("Save data is missing fields or has invalid types.") from e
     validate_character_data(character)
+    get_base_stats(character)
     return character
 
+def format_equipment(equipment):
+    """
+    Turn the equipment slots into a save file string
+
+    Returns: String like "weapon:iron_sword:strength:5,armor:..."
+    """
+    parts = []
+    for slot, equipped in equipment.items():
+        if equipped:
+            parts.append(f"{slot}:{equipped['item_id']}:{equipped['stat']}:{equipped['bonus']}")
+    return ",".join(parts)
+
+def parse_equipment(equipment_str):
+    """
+    Read the equipment slots back from a save file string
+
+    Returns: Dictionary {slot: {'item_id', 'stat', 'bonus'}}
+    Raises: ValueError if an entry is malformed
+    """
+    equipment = {}
+    for entry in equipment_str.split(","):
+        if not entry:
+            continue
+        slot, item_id, stat, bonus = entry.split(":")
+        equipment[slot] = {"item_id": item_id, "stat": stat, "bonus": int(bonus)}
+    return equipment
+
+def format_quest_progress(progress):
+    """
+    Turn quest objective progress into a save file string
+
+    Returns: String like "goblin_hunter:2,warriors_oath:1/0"
+    """
+    return ",".join(f"{quest_id}:{'/'.join(str(n) for n in counts)}" for quest_id, counts in progress.items())
+
+def parse_quest_progress(progress_str):
+    """
+    Read quest objective progress back from a save file string
+
+    Returns: Dictionary {quest_id: [count for each objective]}
+    Raises: ValueError if an entry is malformed
+    """
+    progress = {}
+    for entry in progress_str.split(","):
+        if not entry:
+            continue
+        quest_id, counts = entry.split(":")
+        progress[quest_id] = [int(n) for n in counts.split("/")]
+    return progress
+
+def format_quest_timers(timers):
+    """
+    Turn quest timers into a save file string
+
+    Returns: String like "goblin_bounty:expire:150,herb_run:reset:144"
+    """
+    return ",".join(f"{quest_id}:{kind}:{time}" for quest_id, (time, kind) in timers.items())
+
+def parse_quest_timers(timers_str):
+    """
+    Read quest timers back from a save file string
+
+    Returns: Dictionary {quest_id: (game time, "expire" or "reset")}
+    Raises: ValueError if an entry is malformed
+    """
+    timers = {}
+    for entry in timers_str.split(","):
+        if not entry:
+            continue
+        quest_id, kind, time = entry.split(":")
+        if kind not in ("expire", "reset"):
+            raise ValueError(f"Unknown quest timer: {entry}")
+        timers[quest_id] = (int(time), kind)
+    return timers
+
+def format_quest_completions(completions):
+    """
+    Turn per-quest completion counts into a save file string
+
+    Returns: String like "first_steps:1,herb_run:3"
+    """
+    return ",".join(f"{quest_id}:{count}" for quest_id, count in completions.items())
+
+def parse_quest_completions(completions_str):
+    """
+    Read per-quest completion counts back from a save file string
+
+    Returns: Dictionary {quest_id: times completed}
+    Raises: ValueError if an entry is malformed
+    """
+    completions = {}
+    for entry in completions_str.split(","):
+        if not entry:
+            continue
+        quest_id, count = entry.split(":")
+        completions[quest_id] = int(count)
+    return completions
+
 def list_saved_characters(save_directory="data/save_games"):
     """
     Get list of all saved character names
@@ -231,13 +368,19 @@ def gain_experience(character, xp_amount):
     if character.get("health", 0) <= 0:
         raise CharacterDeadError("Cannot gain experience when dead.")
     character["experience"] += xp_amount
+    old_level = character["level"]
+    leveled_up = False
     while character["experience"] >= character["level"] * 100:
         character["experience"] -= character["level"] * 100
         character["level"] += 1
-        character["max_health"] += 10
-        character["strength"] += 2
-        character["magic"] += 2
+        change_base_stat(character, "max_health", 10)
+        change_base_stat(character, "strength", 2)
+        change_base_stat(character, "magic", 2)
+        leveled_up = True
+    if leveled_up:
+        refresh_stats(character)
         character["health"] = character["max_health"]
+        game_events.emit("level_up", character=character, old_level=old_level, level=character["level"])
 
 def add_gold(character, amount):
     """
@@ -305,6 +448,81 @@ def revive_character(character):
     character["health"] = revived_health
     return True
 
+# ============================================================================
+# EFFECTIVE STATS
+# ============================================================================
+# the stat fields on the character (strength, magic, max_health) are a
+# cache of base stats + equipment + battle modifiers. base stats live in
+# character["base_stats"] and only change on level up or permanent boosts,
+# so equipping and unequipping never drifts them.
+
+DERIVED_STATS = ("max_health", "strength", "magic")
+
+def get_base_stats(character):
+    """
+    Get a character's base stats (before equipment and modifiers)
+
+    Characters made before base stats existed get them worked out from
+    their current stats.
+
+    Returns: Dictionary {stat: value} for DERIVED_STATS
+    """
+    base = character.get("base_stats")
+    if base is None:
+        bonuses = get_stat_bonuses(character)
+        base = {stat: character.get(stat, 0) - bonuses.get(stat, 0) for stat in DERIVED_STATS}
+        character["base_stats"] = base
+    return base
+
+def get_stat_bonuses(character):
+    """
+    Add up equipment bonuses and battle modifiers
+
+    Returns: Dictionary {stat: total bonus}
+    """
+    bonuses = {}
+    for slot in character.get("equipment", {}).values():
+        if slot and slot.get("stat") is not None:
+            bonuses[slot["stat"]] = bonuses.get(slot["stat"], 0) + slot.get("bonus", 0)
+    for stat, amount in character.get("stat_modifiers", {}).items():
+        bonuses[stat] = bonuses.get(stat, 0) + amount
+    return bonuses
+
+def mark_stats_dirty(character):
+    """Flag that the cached stats need recomputing"""
+    get_base_stats(character)
+    character["stats_dirty"] = True
+
+def refresh_stats(character):
+    """
+    Recompute the cached stat fields if anything changed
+
+    Does nothing when the cache is clean, so it's cheap to call before
+    every battle. Health is capped at the new max_health.
+
+    Returns: True if the stats were recomputed
+    """
+    if not character.get("stats_dirty"):
+        return False
+    base = get_base_stats(character)
+    bonuses = get_stat_bonuses(character)
+    for stat in DERIVED_STATS:
+        character[stat] = base[stat] + bonuses.get(stat, 0)
+    if character.get("health", 0) > character["max_health"]:
+        character["health"] = character["max_health"]
+    character["stats_dirty"] = False
+    return True
+
+def change_base_stat(character, stat_name, amount):
+    """
+    Permanently change a base stat (level ups, stat elixirs)
+
+    Marks the cache dirty; call refresh_stats when done changing stats.
+    """
+    base = get_base_stats(character)
+    base[stat_name] = base.get(stat_name, 0) + amount
+    character["stats_dirty"] = True
+
 # ============================================================================
 # VALIDATION
 # ============================================================================
@@ -9,12 +9,20 @@ AI Usage: Used AI to help me import is_character_dead to make sure not to re-imp
 Handles combat mechanics
 """
 
+import random
+from types import MappingProxyType
+
 from custom_exceptions import (
     InvalidTargetError,
     CombatNotActiveError,
     CharacterDeadError,
     AbilityOnCooldownError
 )
+import game_data
+import game_events
+from status_effects import EffectTracker
+from battle_log import BattleLog
+import loot_system
 
 # ============================================================================
 # ENEMY DEFINITIONS
@@ -22,13 +30,122 @@ from custom_exceptions import (
 #the main battle system, handlinig classes, special abilitees, & more.
 
 # doesnt let a dead character start a battle
-from character_manager import is_character_dead
+from character_manager import is_character_dead, refresh_stats
+
+# Enemy catalog built by load_enemy_catalog (loaded on first use)
+ENEMY_DATA_FILE = "data/enemies.txt"
+_enemy_catalog = None
+
+def build_alias_table(weights):
+    """
+    Build a Walker alias table for weighted random choice
+    
+    Args:
+        weights: List of positive weights
+    
+    Returns: Tuple of (probabilities, aliases), both lists of len(weights)
+    """
+# Vose's version of the alias method. every column gets filled to
+# exactly 1.0 by borrowing from one "large" column, so a draw is just
+# one column pick plus one coin flip.
+    count = len(weights)
+    total = float(sum(weights))
+    scaled = [w * count / total for w in weights]
+    probabilities = [0.0] * count
+    aliases = [0] * count
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        low = small.pop()
+        high = large.pop()
+        probabilities[low] = scaled[low]
+        aliases[low] = high
+        scaled[high] = (scaled[high] + scaled[low]) - 1.0
+        if scaled[high] < 1.0:
+            small.append(high)
+        else:
+            large.append(high)
+    # leftovers are 1.0 up to rounding error
+    for i in large + small:
+        probabilities[i] = 1.0
+        aliases[i] = i
+    return probabilities, aliases
+
+def alias_draw(probabilities, aliases, rng=random):
+    """
+    Draw one index from an alias table in O(1)
+    
+    Returns: Integer index into the original weights list
+    """
+    column = int(rng.random() * len(probabilities))
+    if rng.random() < probabilities[column]:
+        return column
+    return aliases[column]
+
+def load_enemy_catalog(filename=ENEMY_DATA_FILE):
+    """
+    Load enemy templates and precompute the spawn table for every level
+    
+    Each template is a read-only mapping; create_enemy copies it.
+    Level tables cover levels 1..top_level, anything higher uses the
+    top_level table (only enemies with MAX_LEVEL: NONE are in it).
+    
+    Returns: Catalog dictionary with 'templates', 'level_tables', 'top_level'
+    Raises: MissingDataFileError, InvalidDataFormatError, CorruptedDataError
+    """
+# loading all enemies once, so spawning never has to look at the
+# whole enemy list again.
+    global _enemy_catalog
+    enemies = game_data.load_enemies(filename)
+    templates = {}
+    top_level = 1
+    for enemy_id, data in enemies.items():
+        templates[enemy_id] = MappingProxyType({
+            "name": data["name"],
+            "type": enemy_id,
+            "health": data["health"],
+            "max_health": data["health"],
+            "strength": data["strength"],
+            "magic": data["magic"],
+            "xp_reward": data["xp_reward"],
+            "gold_reward": data["gold_reward"],
+            "speed": data["speed"]
+        })
+        top_level = max(top_level, data["min_level"])
+        if data["max_level"] is not None:
+            top_level = max(top_level, data["max_level"] + 1)
+    level_tables = [None]
+    for level in range(1, top_level + 1):
+        enemy_ids = []
+        weights = []
+        for enemy_id, data in enemies.items():
+            max_level = data["max_level"]
+            if data["min_level"] <= level and (max_level is None or level <= max_level):
+                enemy_ids.append(enemy_id)
+                weights.append(data["spawn_weight"])
+        if enemy_ids:
+            probabilities, aliases = build_alias_table(weights)
+            level_tables.append((tuple(enemy_ids), probabilities, aliases))
+        else:
+            level_tables.append(None)
+    _enemy_catalog = {
+        "templates": templates,
+        "level_tables": level_tables,
+        "top_level": top_level
+    }
+    return _enemy_catalog
+
+def get_enemy_catalog():
+    """Return the loaded enemy catalog, loading it on first use"""
+    if _enemy_catalog is None:
+        return load_enemy_catalog()
+    return _enemy_catalog
 
 def create_enemy(enemy_type):
     """
     Create an enemy based on type
     
-    Example enemy types and stats:
+    Enemy stats come from data/enemies.txt, e.g.:
     - goblin: health=50, strength=8, magic=2, xp_reward=25, gold_reward=10
     - orc: health=80, strength=12, magic=5, xp_reward=50, gold_reward=25
     - dragon: health=200, strength=25, magic=15, xp_reward=200, gold_reward=100
@@ -36,46 +153,34 @@ def create_enemy(enemy_type):
     Returns: Enemy dictionary
     Raises: InvalidTargetError if enemy_type not recognized
     """
-# based on enemy type, creates an dictionary with base stats.
-# if user passes unknown type, raises error.
+# copies the frozen template for that type. if user passes
+# unknown type, raises error.
     enemy_type = enemy_type.lower()
-    base_stats = {
-        "goblin": {"health": 50, "strength": 8, "magic": 2, "xp_reward": 25, "gold_reward": 10},
-        "orc": {"health": 80, "strength": 12, "magic": 5, "xp_reward": 50, "gold_reward": 25},
-        "dragon": {"health": 200, "strength": 25, "magic": 15, "xp_reward": 200, "gold_reward": 100},
-    }
-    if enemy_type not in base_stats:
+    templates = get_enemy_catalog()["templates"]
+    if enemy_type not in templates:
         raise InvalidTargetError(f"Unknown enemy type: {enemy_type}")
-    base = base_stats[enemy_type]
-    enemy = {
-        "name": enemy_type.capitalize(),
-        "type": enemy_type,
-        "health": base["health"],
-        "max_health": base["health"],
-        "strength": base["strength"],
-        "magic": base["magic"],
-        "xp_reward": base["xp_reward"],
-        "gold_reward": base["gold_reward"]
-    }
-    return enemy
+    return dict(templates[enemy_type])
 
 def get_random_enemy_for_level(character_level):
     """
     Get an appropriate enemy for character's level
     
-    Level 1-2: Goblins
-    Level 3-5: Orcs
-    Level 6+: Dragons
+    Picks from the enemies whose MIN_LEVEL/MAX_LEVEL range covers the
+    level, weighted by SPAWN_WEIGHT (default data: goblins at 1-2,
+    orcs at 3-5, dragons at 6+).
     
     Returns: Enemy dictionary
+    Raises: InvalidTargetError if no enemy spawns at that level
     """
-# picks appropriate enemy based on character level
-    if character_level <= 2:
-        enemy_type = "goblin"
-    elif character_level <= 5:
-        enemy_type = "orc"
-    else:
-        enemy_type = "dragon"
+# picks appropriate enemy based on character level, using the
+# precomputed table for that level
+    catalog = get_enemy_catalog()
+    level = min(max(character_level, 1), catalog["top_level"])
+    table = catalog["level_tables"][level]
+    if table is None:
+        raise InvalidTargetError(f"No enemies spawn at level {character_level}.")
+    enemy_ids, probabilities, aliases = table
+    enemy_type = enemy_ids[alias_draw(probabilities, aliases)]
     return create_enemy(enemy_type)
 
 # ============================================================================
@@ -90,34 +195,49 @@ class SimpleBattle:
     Manages combat between character and enemy
     """
     
-    def __init__(self, character, enemy):
-        """Initialize battle with character and enemy"""
+    def __init__(self, character, enemy, log=None):
+        """
+        Initialize battle with character and enemy
+        
+        log: BattleLog to record events in (a console-rendering log by default)
+        """
 
         self.character = character
         self.enemy = enemy
+        # stats are read every turn, so settle any pending gear changes now
+        refresh_stats(character)
         self.combat_active = True
         self.turn_count = 0
+        self.effects = EffectTracker()
+        self.log = log if log is not None else BattleLog()
     
     def start_battle(self):
         """
         Start the combat loop
         
         Returns: Dictionary with battle results:
-                {'winner': 'player'|'enemy'|None, 'xp_gained': int, 'gold_gained': int}
+                {'winner': 'player'|'enemy'|None, 'xp_gained': int, 'gold_gained': int,
+                 'loot': {item_id: quantity}, 'overflow': {item_id: quantity}}
+                Loot is already in the inventory; overflow didn't fit.
         
         Raises: CharacterDeadError if character is already dead
         """
 # COMBAT LOOP, between player and enemy. if player wins, 
-# then rewards calculated with dictionary (gold & XP)
+# then rewards calculated with dictionary (gold & XP), and the
+# enemy's loot table is rolled
         if is_character_dead(self.character):
             raise CharacterDeadError("Character is already dead and cannot fight.")
         xp_gained = 0
         gold_gained = 0
+        drops = {"loot": {}, "overflow": {}}
         while self.combat_active:
             winner = self.check_battle_end()
             if winner is not None:
                 break
             self.turn_count += 1
+            self.process_effects()
+            if self.check_battle_end() is not None:
+                break
             self.player_turn()
             winner = self.check_battle_end()
             if not self.combat_active or winner is not None:
@@ -128,8 +248,32 @@ class SimpleBattle:
             rewards = get_victory_rewards(self.enemy)
             xp_gained = rewards["xp"]
             gold_gained = rewards["gold"]
+            drops = loot_system.grant_battle_loot(self.character, self.enemy)
+            game_events.emit("enemy_defeated", character=self.character, enemy_type=self.enemy.get("type"))
         self.combat_active = False
-        return {"winner": winner, "xp_gained": xp_gained, "gold_gained": gold_gained}
+        self.effects.clear()
+        self.log.flush()
+        return {"winner": winner, "xp_gained": xp_gained, "gold_gained": gold_gained,
+                "loot": drops["loot"], "overflow": drops["overflow"]}
+    
+    def process_effects(self):
+        """
+        Advance status effects by one turn
+        
+        Deals damage over time through apply_damage and reports effects
+        that wore off.
+        """
+# effects tick once per round, before anyone acts
+        results = self.effects.advance_turn()
+        for target, damage in results["damage"]:
+            self.apply_damage(target, damage)
+            self.log.record(self.turn_count, target.get("name"), "effect_damage", target.get("name"),
+                            damage, target.get("health"),
+                            f"{target.get('name')} takes {damage} damage from lingering effects.")
+        for effect in results["expired"]:
+            target = effect["target"]
+            self.log.record(self.turn_count, effect["name"], "effect_expired", target.get("name"),
+                            0, target.get("health"), f"{effect['name']} wears off {target.get('name')}.")
     
     def player_turn(self):
         """
@@ -146,29 +290,40 @@ class SimpleBattle:
 # Error can also be raised if combat not active.
         if not self.combat_active:
             raise CombatNotActiveError("Combat is not active.")
-        display_combat_stats(self.character, self.enemy)
-        print("\nYour turn:")
-        print("1. Basic Attack")
-        print("2. Special Ability")
-        print("3. Try to Run")
+        # everything since the last prompt goes out in one write
+        menu = "\nYour turn:\n1. Basic Attack\n2. Special Ability\n3. Try to Run\n"
+        self.log.flush(format_combat_stats(self.character, self.enemy) + menu)
         choice = input("Choose an action (1-3): ").strip()
+        name = self.character.get("name")
+        enemy_name = self.enemy.get("name")
         if choice == "1":
             damage = self.calculate_damage(self.character, self.enemy)
             self.apply_damage(self.enemy, damage)
-            display_battle_log(f"You attack the {self.enemy['name']} for {damage} damage.")
+            self.log.record(self.turn_count, name, "attack", enemy_name, damage, self.enemy["health"],
+                            f"You attack the {enemy_name} for {damage} damage.")
         elif choice == "2":
-            result = use_special_ability(self.character, self.enemy)
-            display_battle_log(result)
+            try:
+                health_before = self.enemy.get("health", 0)
+                result = use_special_ability(self.character, self.enemy, self.effects)
+                damage = health_before - self.enemy.get("health", 0)
+                self.log.record(self.turn_count, name, "ability", enemy_name, damage,
+                                self.enemy.get("health"), result)
+            except AbilityOnCooldownError as e:
+                damage = self.calculate_damage(self.character, self.enemy)
+                self.apply_damage(self.enemy, damage)
+                self.log.record(self.turn_count, name, "attack", enemy_name, damage, self.enemy["health"],
+                                f"{e} You perform a basic attack for {damage} damage.")
         elif choice == "3":
             escaped = self.attempt_escape()
             if escaped:
-                display_battle_log("You successfully escaped from battle!")
+                self.log.record(self.turn_count, name, "escape", message="You successfully escaped from battle!")
             else:
-                display_battle_log("You failed to escape!")
+                self.log.record(self.turn_count, name, "escape_failed", message="You failed to escape!")
         else:
             damage = self.calculate_damage(self.character, self.enemy)
             self.apply_damage(self.enemy, damage)
-            display_battle_log(f"Invalid choice. You perform a basic attack for {damage} damage.")
+            self.log.record(self.turn_count, name, "attack", enemy_name, damage, self.enemy["health"],
+                            f"Invalid choice. You perform a basic attack for {damage} damage.")
     
     def enemy_turn(self):
         """
@@ -185,7 +340,9 @@ class SimpleBattle:
             return
         damage = self.calculate_damage(self.enemy, self.character)
         self.apply_damage(self.character, damage)
-        display_battle_log(f"The {self.enemy['name']} attacks you for {damage} damage.")
+        self.log.record(self.turn_count, self.enemy.get("name"), "attack", self.character.get("name"),
+                        damage, self.character["health"],
+                        f"The {self.enemy['name']} attacks you for {damage} damage.")
     
     def calculate_damage(self, attacker, defender):
         """
@@ -250,7 +407,15 @@ class SimpleBattle:
 # SPECIAL ABILITIES
 # ============================================================================
 
-def use_special_ability(character, enemy):
+# status effect left behind by each class ability (only inside a battle)
+ABILITY_EFFECTS = {
+    "warrior": {"name": "Shaken", "target": "enemy", "duration": 2, "stat": "strength", "amount": -3},
+    "mage": {"name": "Burn", "target": "enemy", "duration": 3, "scales_with": "magic", "damage_divisor": 4},
+    "rogue": {"name": "Bleed", "target": "enemy", "duration": 2, "scales_with": "strength", "damage_divisor": 3},
+    "cleric": {"name": "Blessing", "target": "self", "duration": 3, "stat": "strength", "amount": 2},
+}
+
+def use_special_ability(character, enemy, effects=None):
     """
     Use character's class-specific special ability
     
@@ -260,27 +425,62 @@ def use_special_ability(character, enemy):
     - Rogue: Critical Strike (3x strength damage, 50% chance)
     - Cleric: Heal (restore 30 health)
     
+    When an EffectTracker is passed (during a battle) the ability goes on
+    cooldown and also leaves its status effect from ABILITY_EFFECTS.
+    
     Returns: String describing what happened
     Raises: AbilityOnCooldownError if ability was used recently
     """
 # based on character class, uses special ability.
     char_class = character.get("class", "").lower()
+    if char_class not in ABILITY_EFFECTS:
+        raise AbilityOnCooldownError("Special ability not available for this class.")
+    if effects is not None:
+        effects.check_ability_ready(character)
     if char_class == "warrior":
         damage = warrior_power_strike(character, enemy)
-        return f"You use Power Strike and deal {damage} damage!"
+        message = f"You use Power Strike and deal {damage} damage!"
+        landed = True
     elif char_class == "mage":
         damage = mage_fireball(character, enemy)
-        return f"You cast Fireball and deal {damage} damage!"
+        message = f"You cast Fireball and deal {damage} damage!"
+        landed = True
     elif char_class == "rogue":
         damage, crit = rogue_critical_strike(character, enemy)
         if crit:
-            return f"Critical Strike! You deal {damage} damage!"
-        return f"You strike for {damage} damage."
-    elif char_class == "cleric":
-        healed = cleric_heal(character)
-        return f"You cast a healing spell and restore {healed} health."
+            message = f"Critical Strike! You deal {damage} damage!"
+        else:
+            message = f"You strike for {damage} damage."
+        landed = crit
     else:
-        raise AbilityOnCooldownError("Special ability not available for this class.")
+        healed = cleric_heal(character)
+        message = f"You cast a healing spell and restore {healed} health."
+        landed = True
+    if effects is not None:
+        effects.start_cooldown(character)
+        if landed:
+            message += " " + apply_ability_effect(character, enemy, effects)
+    return message
+
+def apply_ability_effect(character, enemy, effects):
+    """
+    Apply the status effect that goes with a class ability
+    
+    Returns: String describing the effect
+    """
+    spec = ABILITY_EFFECTS[character.get("class", "").lower()]
+    target = character if spec["target"] == "self" else enemy
+    stat_value = character.get(spec.get("scales_with", "strength"), 0)
+    damage_per_turn = stat_value // spec["damage_divisor"] if spec.get("damage_divisor") else 0
+    effects.add_effect(
+        target,
+        spec["name"],
+        spec["duration"],
+        stat=spec.get("stat"),
+        amount=spec.get("amount", 0),
+        damage_per_turn=damage_per_turn
+    )
+    return f"{target['name']} is affected by {spec['name']} for {spec['duration']} turns."
 
 def warrior_power_strike(character, enemy):
     """Warrior special ability"""
@@ -351,14 +551,24 @@ def get_victory_rewards(enemy):
         "gold": enemy.get("gold_reward", 0)
     }
 
+def format_combat_stats(character, enemy):
+    """
+    Build the current combat status text
+    
+    Returns: String with both character and enemy health
+    """
+    return (
+        f"\n{character['name']}: HP={character['health']}/{character['max_health']}\n"
+        f"{enemy['name']}: HP={enemy['health']}/{enemy['max_health']}\n"
+    )
+
 def display_combat_stats(character, enemy):
     """
     Display current combat status
     
     Shows both character and enemy health/stats
     """
-    print(f"\n{character['name']}: HP={character['health']}/{character['max_health']}")
-    print(f"{enemy['name']}: HP={enemy['health']}/{enemy['max_health']}")
+    print(format_combat_stats(character, enemy), end="")
 
 def display_battle_log(message):
     """
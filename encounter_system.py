@@ -0,0 +1,639 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Encounter System Module
+
+Name: Kayla Bagley
+
+This module handles party-versus-horde battles: several characters
+against many enemies, with turn order decided by speed. It also
+estimates how fights are likely to go, which is used to auto-resolve
+easy fights and to recommend equipment.
+"""
+
+import heapq
+import math
+import random
+from collections import OrderedDict
+
+from custom_exceptions import CharacterDeadError, AbilityOnCooldownError
+import combat_system
+from combat_system import SimpleBattle, use_special_ability, get_victory_rewards
+from battle_log import BattleLog
+from character_manager import refresh_stats
+from inventory_system import get_inventory, parse_item_effect, EQUIPMENT_SLOTS
+
+# ============================================================================
+# ENCOUNTER SETTINGS
+# ============================================================================
+# the biggest fights the engine is built for
+
+MAX_PARTY_SIZE = 4
+MAX_ENEMIES = 50
+
+# time between actions is TURN_LENGTH / speed, so speed 20 acts
+# twice as often as speed 10
+TURN_LENGTH = 100.0
+DEFAULT_SPEED = 10
+CLASS_SPEEDS = {
+    "Warrior": 10,
+    "Mage": 9,
+    "Rogue": 14,
+    "Cleric": 10,
+}
+
+TARGET_POLICIES = ("random", "weakest", "strongest")
+
+# outcome cache settings: health is grouped into buckets of this many HP,
+# and fights that can't be settled analytically are simulated this often
+HP_BUCKET_SIZE = 10
+SIMULATION_SAMPLES = 20
+DEFAULT_CACHE_SIZE = 512
+
+# ============================================================================
+# ROSTERS
+# ============================================================================
+
+class Roster:
+    """
+    One side of an encounter
+
+    Keeps the living members in a swap-remove list (O(1) random pick
+    and removal) plus lazy heaps for the weakest/strongest targets.
+    Heap entries are checked against the live stat when they surface,
+    so a buff or debuff never leaves a member under its old key.
+    """
+
+    def __init__(self, members):
+        """Start with every member that still has health"""
+        self.members = list(members)
+        self.alive = []
+        self.position = {}
+        self.weakest_heap = []
+        self.strongest_heap = []
+        # index -> the newest strongest_heap key pushed for that member
+        self.strength_key = {}
+        for index, member in enumerate(self.members):
+            if member.get("health", 0) > 0:
+                self.position[index] = len(self.alive)
+                self.alive.append(index)
+                self.weakest_heap.append((member["health"], index))
+                self.strength_key[index] = -member.get("strength", 0)
+                self.strongest_heap.append((self.strength_key[index], index))
+        heapq.heapify(self.weakest_heap)
+        heapq.heapify(self.strongest_heap)
+
+    def alive_count(self):
+        """Number of members still standing"""
+        return len(self.alive)
+
+    def is_alive(self, index):
+        """True if the member at index has not been defeated"""
+        return index in self.position
+
+    def health_changed(self, index):
+        """
+        Record a health change for a member
+
+        Returns: True if this change defeated the member
+        """
+# dead members leave the alive list right away, living ones get a
+# fresh heap entry (the old one is skipped when it surfaces)
+        if index not in self.position:
+            return False
+        health = self.members[index].get("health", 0)
+        if health <= 0:
+            slot = self.position.pop(index)
+            last = self.alive.pop()
+            if last != index:
+                self.alive[slot] = last
+                self.position[last] = slot
+            return True
+        heapq.heappush(self.weakest_heap, (health, index))
+        return False
+
+    def strength_changed(self, index):
+        """Record a strength change (buff, debuff or gear) for a member"""
+        if index not in self.position:
+            return
+        key = -self.members[index].get("strength", 0)
+        if self.strength_key[index] != key:
+            self.strength_key[index] = key
+            heapq.heappush(self.strongest_heap, (key, index))
+
+    def pick_target(self, policy, rng):
+        """
+        Choose a living member according to a targeting policy
+
+        Returns: Member index, or None if nobody is left
+        """
+        if not self.alive:
+            return None
+        if policy == "weakest":
+            heap = self.weakest_heap
+            while heap:
+                health, index = heap[0]
+                if index in self.position and self.members[index].get("health", 0) == health:
+                    return index
+                heapq.heappop(heap)
+            return None
+        if policy == "strongest":
+            heap = self.strongest_heap
+            while heap:
+                key, index = heap[0]
+                if index not in self.position:
+                    heapq.heappop(heap)
+                    continue
+                live = -self.members[index].get("strength", 0)
+                if key == live:
+                    return index
+                heapq.heappop(heap)
+# a change nobody reported: re-push the member under its live strength
+                if self.strength_key[index] != live:
+                    self.strength_key[index] = live
+                    heapq.heappush(heap, (live, index))
+            return None
+        return self.alive[int(rng.random() * len(self.alive))]
+
+# ============================================================================
+# PARTY BATTLE
+# ============================================================================
+
+class PartyBattle(SimpleBattle):
+    """
+    Party-versus-horde combat with a speed-based turn scheduler
+
+    Turn order comes from a heap keyed on each combatant's next action
+    time. Damage goes through SimpleBattle.calculate_damage/apply_damage
+    and the class abilities (party members use theirs whenever it is off
+    cooldown), and the battle end check reads live counters.
+    """
+
+    def __init__(self, party, enemies, party_policy="weakest", enemy_policy="random", rng=None, log=None):
+        """
+        Initialize battle with up to 4 characters and up to 50 enemies
+
+        log: BattleLog for the events (a disabled one by default, so
+             simulations don't spend time recording)
+
+        Raises: ValueError if either side is empty/too big or a policy is unknown
+        """
+        if not party or len(party) > MAX_PARTY_SIZE:
+            raise ValueError(f"Party must have 1 to {MAX_PARTY_SIZE} characters.")
+        if not enemies or len(enemies) > MAX_ENEMIES:
+            raise ValueError(f"Encounter must have 1 to {MAX_ENEMIES} enemies.")
+        for policy in (party_policy, enemy_policy):
+            if policy not in TARGET_POLICIES:
+                raise ValueError(f"Unknown targeting policy: {policy}")
+        super().__init__(party[0], enemies[0], log if log is not None else BattleLog(enabled=False))
+        for member in party[1:]:
+            refresh_stats(member)
+        self.party = Roster(party)
+        self.horde = Roster(enemies)
+        self.party_policy = party_policy
+        self.enemy_policy = enemy_policy
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = 0.0
+        self.defeated = []
+        self._sides = {"party": self.party, "enemy": self.horde}
+        # id(combatant) -> (side, index), so apply_damage can update counters
+        self._locate = {}
+        self._schedule = []
+        self._sequence = 0
+        for side, roster in self._sides.items():
+            for index, member in enumerate(roster.members):
+                self._locate[id(member)] = (side, index)
+                if roster.is_alive(index):
+                    self._push_turn(side, index, self.clock)
+
+    def _push_turn(self, side, index, now):
+        """Schedule a combatant's next action"""
+        member = self._sides[side].members[index]
+        interval = TURN_LENGTH / get_speed(member)
+        self._sequence += 1
+        heapq.heappush(self._schedule, (now + interval, self._sequence, side, index))
+
+    def start_battle(self, max_actions=10000):
+        """
+        Run the encounter until one side is wiped out
+
+        Returns: Dictionary with battle results:
+                {'winner': 'player'|'enemy'|None, 'xp_gained': int,
+                 'gold_gained': int, 'defeated': [enemy, ...], 'actions': int}
+
+        Raises: CharacterDeadError if every party member is already dead
+        """
+# pops the soonest action off the heap each step. dead combatants
+# are skipped when they come up instead of being searched for.
+        if self.party.alive_count() == 0:
+            raise CharacterDeadError("Every party member is already dead.")
+        actions = 0
+        while self.combat_active and actions < max_actions:
+            if self.check_battle_end() is not None:
+                break
+            if not self.take_turn():
+                break
+            actions += 1
+        winner = self.check_battle_end()
+        self.effects.clear()
+        self.log.flush()
+        xp_gained = 0
+        gold_gained = 0
+        if winner == "player":
+            for enemy in self.defeated:
+                rewards = get_victory_rewards(enemy)
+                xp_gained += rewards["xp"]
+                gold_gained += rewards["gold"]
+        self.combat_active = False
+        return {
+            "winner": winner,
+            "xp_gained": xp_gained,
+            "gold_gained": gold_gained,
+            "defeated": list(self.defeated),
+            "actions": actions
+        }
+
+    def take_turn(self):
+        """
+        Let the next combatant in the schedule act
+
+        Returns: True if someone acted, False if the schedule is empty
+        """
+        while self._schedule:
+            when, _, side, index = heapq.heappop(self._schedule)
+            roster = self._sides[side]
+            if not roster.is_alive(index):
+                continue
+            self.clock = when
+            self.turn_count += 1
+            # status effects tick once per TURN_LENGTH of battle time
+            while self.effects.turn < int(when // TURN_LENGTH):
+                self.process_effects()
+                if not roster.is_alive(index):
+                    break
+            if not roster.is_alive(index) or self.check_battle_end() is not None:
+                return True
+            if side == "party":
+                self._party_action(index)
+            else:
+                self._enemy_action(index)
+            if roster.is_alive(index):
+                self._push_turn(side, index, when)
+            return True
+        return False
+
+    def _party_action(self, index):
+        """One party member attacks or uses their class ability"""
+        member = self.party.members[index]
+        target_index = self.horde.pick_target(self.party_policy, self.rng)
+        if target_index is None:
+            return
+        target = self.horde.members[target_index]
+        wants_ability = self.effects.cooldown_remaining(member) == 0
+        if member.get("class") == "Cleric" and member.get("health", 0) >= member.get("max_health", 0):
+            wants_ability = False
+        if wants_ability:
+            try:
+                health_before = target.get("health", 0)
+                message = use_special_ability(member, target, self.effects)
+                self._health_changed("party", index)
+                self._health_changed("enemy", target_index)
+                self.party.strength_changed(index)
+                self.horde.strength_changed(target_index)
+                self.log.record(self.turn_count, member.get("name"), "ability", target.get("name"),
+                                health_before - target.get("health", 0), target.get("health"), message)
+                return
+            except AbilityOnCooldownError:
+                pass
+        damage = self.calculate_damage(member, target)
+        self.apply_damage(target, damage)
+        self.log.record(self.turn_count, member.get("name"), "attack", target.get("name"),
+                        damage, target.get("health"))
+
+    def _enemy_action(self, index):
+        """One enemy attacks a party member"""
+        enemy = self.horde.members[index]
+        target_index = self.party.pick_target(self.enemy_policy, self.rng)
+        if target_index is None:
+            return
+        target = self.party.members[target_index]
+        damage = self.calculate_damage(enemy, target)
+        self.apply_damage(target, damage)
+        self.log.record(self.turn_count, enemy.get("name"), "attack", target.get("name"),
+                        damage, target.get("health"))
+
+    def apply_damage(self, target, damage):
+        """
+        Apply damage to a combatant and update the living counters
+        """
+        super().apply_damage(target, damage)
+        location = self._locate.get(id(target))
+        if location is not None:
+            self._health_changed(*location)
+
+    def process_effects(self):
+        """
+        Advance status effects by one round
+
+        Damage over time goes through apply_damage so counters stay right,
+        and expired buffs/debuffs update the strongest-target heaps.
+        """
+        results = self.effects.advance_turn()
+        for effect in results["expired"]:
+            location = self._locate.get(id(effect["target"]))
+            if location is not None and effect["stat"] == "strength":
+                self._sides[location[0]].strength_changed(location[1])
+        for target, damage in results["damage"]:
+            self.apply_damage(target, damage)
+            self.log.record(self.turn_count, target.get("name"), "effect_damage", target.get("name"),
+                            damage, target.get("health"))
+
+    def _health_changed(self, side, index):
+        """Update a roster after a health change and note defeated enemies"""
+        if self._sides[side].health_changed(index) and side == "enemy":
+            self.defeated.append(self.horde.members[index])
+
+    def check_battle_end(self):
+        """
+        Check if battle is over using the live counters
+
+        Returns: 'player' if every enemy is dead, 'enemy' if the whole
+                 party is dead, None if ongoing
+        """
+        if self.horde.alive_count() == 0:
+            self.combat_active = False
+            return "player"
+        if self.party.alive_count() == 0:
+            self.combat_active = False
+            return "enemy"
+        return None
+
+# ============================================================================
+# ENCOUNTER UTILITIES
+# ============================================================================
+
+def get_speed(combatant):
+    """
+    Get how fast a combatant acts
+
+    Enemies carry a 'speed' stat, characters use their class speed.
+    """
+    if "speed" in combatant:
+        return combatant["speed"]
+    return CLASS_SPEEDS.get(combatant.get("class"), DEFAULT_SPEED)
+
+def create_horde(character_level, enemy_count):
+    """
+    Create a group of level-appropriate enemies
+
+    Returns: List of enemy dictionaries with numbered names
+    Raises: ValueError if enemy_count is out of range
+    """
+    if enemy_count < 1 or enemy_count > MAX_ENEMIES:
+        raise ValueError(f"Encounter must have 1 to {MAX_ENEMIES} enemies.")
+    horde = []
+    for number in range(1, enemy_count + 1):
+        enemy = combat_system.get_random_enemy_for_level(character_level)
+        enemy["name"] = f"{enemy['name']} {number}"
+        horde.append(enemy)
+    return horde
+
+# ============================================================================
+# OUTCOME CACHE
+# ============================================================================
+
+def outcome_key(character, enemy_type):
+    """
+    Build the cache key for a character fighting an enemy type
+
+    Returns: Tuple (class, level, strength, magic, hp bucket, enemy type)
+    """
+    return (
+        character.get("class"),
+        character.get("level", 1),
+        character.get("strength", 0),
+        character.get("magic", 0),
+        character.get("health", 0) // HP_BUCKET_SIZE,
+        enemy_type.lower()
+    )
+
+def _stand_in(character, health):
+    """Copy just the combat stats of a character for a simulation"""
+    return {
+        "name": character.get("name", "Hero"),
+        "class": character.get("class"),
+        "level": character.get("level", 1),
+        "health": health,
+        "max_health": max(character.get("max_health", health), health),
+        "strength": character.get("strength", 0),
+        "magic": character.get("magic", 0)
+    }
+
+def estimate_outcome_analytic(character, enemy_type, health=None):
+    """
+    Work out a one-on-one fight using basic attacks only
+
+    Abilities only ever help the character, so this is a safe upper bound
+    on health lost.
+
+    Returns: {'win_rate': 1.0, 'avg_hp_loss': int} if the character surely
+             wins, or None if the fight isn't clear-cut
+    """
+    enemy = combat_system.create_enemy(enemy_type)
+    if health is None:
+        health = character.get("health", 0)
+    battle = SimpleBattle(character, enemy, BattleLog(enabled=False))
+    player_damage = battle.calculate_damage(character, enemy)
+    enemy_damage = battle.calculate_damage(enemy, character)
+    player_interval = TURN_LENGTH / get_speed(character)
+    enemy_interval = TURN_LENGTH / get_speed(enemy)
+    finish_time = math.ceil(enemy["health"] / player_damage) * player_interval
+    # enemy gets every hit that lands at or before the killing blow
+    enemy_hits = math.floor(finish_time / enemy_interval)
+    hp_loss = enemy_hits * enemy_damage
+    if hp_loss >= health:
+        return None
+    return {"win_rate": 1.0, "avg_hp_loss": hp_loss}
+
+def simulate_outcome(character, enemy_type, samples=SIMULATION_SAMPLES, health=None, rng=None):
+    """
+    Estimate a one-on-one fight by running headless battles
+
+    Returns: {'win_rate': float, 'avg_hp_loss': float}
+    """
+    if rng is None:
+        rng = random.Random()
+    if health is None:
+        health = character.get("health", 0)
+    wins = 0
+    total_loss = 0
+    for _ in range(samples):
+        fighter = _stand_in(character, health)
+        enemy = combat_system.create_enemy(enemy_type)
+        result = PartyBattle([fighter], [enemy], rng=rng).start_battle()
+        if result["winner"] == "player":
+            wins += 1
+        total_loss += health - fighter["health"]
+    return {"win_rate": wins / samples, "avg_hp_loss": total_loss / samples}
+
+class OutcomeCache:
+    """
+    LRU cache of expected battle outcomes
+
+    Entries are keyed by outcome_key() and filled the first time they are
+    asked for: analytically when the win is certain, otherwise by
+    simulate_outcome(). The least recently used entry is dropped once
+    capacity is reached.
+    """
+
+    def __init__(self, capacity=DEFAULT_CACHE_SIZE, samples=SIMULATION_SAMPLES, rng=None):
+        """Create an empty cache"""
+        self.capacity = capacity
+        self.samples = samples
+        self.rng = rng if rng is not None else random.Random()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, character, enemy_type):
+        """
+        Get the expected outcome of a fight, computing it if needed
+
+        Returns: {'win_rate': float, 'avg_hp_loss': float}
+        """
+        key = outcome_key(character, enemy_type)
+        outcome = self.entries.get(key)
+        if outcome is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return outcome
+        self.misses += 1
+        # the bottom of the HP bucket, so the answer holds for the whole bucket
+        health = max(1, key[4] * HP_BUCKET_SIZE)
+        outcome = estimate_outcome_analytic(character, enemy_type, health)
+        if outcome is None:
+            outcome = simulate_outcome(character, enemy_type, self.samples, health, self.rng)
+        self.entries[key] = outcome
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return outcome
+
+    def clear(self):
+        """Forget every cached outcome"""
+        self.entries.clear()
+
+# ============================================================================
+# EQUIPMENT RECOMMENDATIONS
+# ============================================================================
+
+def level_spawn_odds(level):
+    """
+    Chance of meeting each enemy type at a level
+
+    Read back out of the level's alias table, so it matches what
+    get_random_enemy_for_level draws from.
+
+    Returns: Dictionary {enemy_type: probability}
+    """
+    catalog = combat_system.get_enemy_catalog()
+    table = catalog["level_tables"][min(max(level, 1), catalog["top_level"])]
+    if table is None:
+        return {}
+    enemy_ids, probabilities, aliases = table
+    count = len(enemy_ids)
+    odds = [0.0] * count
+    for column in range(count):
+        odds[column] += probabilities[column] / count
+        odds[aliases[column]] += (1.0 - probabilities[column]) / count
+    return dict(zip(enemy_ids, odds))
+
+def gear_stand_in(character, slot, item_data=None):
+    """
+    Copy of the character's combat stats with different gear in a slot
+
+    The current item in the slot is taken off and item_data (if any) put
+    on. The copy is at full health so every option is compared fairly.
+    """
+    stand_in = _stand_in(character, character.get("max_health", 0))
+    current = character.get("equipment", {}).get(slot)
+    if current:
+        stand_in[current["stat"]] = stand_in.get(current["stat"], 0) - current["bonus"]
+    if item_data is not None:
+        stat_name, value = parse_item_effect(item_data.get("effect", ""))
+        stand_in[stat_name] = stand_in.get(stat_name, 0) + value
+    stand_in["health"] = stand_in["max_health"]
+    return stand_in
+
+def recommend_equipment(character, item_data_dict, cache, slot=None):
+    """
+    Rank the weapons and armor a character could wear
+
+    Each option is scored against the enemies that spawn at the
+    character's level (weighted by how often they spawn), using the
+    outcome cache, so repeated questions don't re-run any battles and
+    only distinct items are scored however big the inventory is.
+
+    Args:
+        character: Character dictionary
+        item_data_dict: Dictionary of all item data
+        cache: OutcomeCache to read fight results from
+        slot: 'weapon' or 'armor', or None for both
+
+    Returns: List of dictionaries, best first (highest win rate, then
+             most health left), with 'item_id', 'slot', 'win_rate',
+             'avg_hp_loss', 'hp_left', and 'equipped' (True for the item
+             worn now)
+    Raises: ValueError if slot isn't an equipment slot
+    """
+    if slot is not None and slot not in EQUIPMENT_SLOTS:
+        raise ValueError(f"Unknown equipment slot: {slot}")
+    slots = [slot] if slot is not None else list(EQUIPMENT_SLOTS)
+    odds = level_spawn_odds(character.get("level", 1))
+    candidates = []
+    for slot_name in slots:
+        current = character.get("equipment", {}).get(slot_name)
+        if current:
+            candidates.append((slot_name, current["item_id"], True))
+        for item_id in get_inventory(character).counts:
+            data = item_data_dict.get(item_id, {})
+            if data.get("type") == EQUIPMENT_SLOTS[slot_name]:
+                candidates.append((slot_name, item_id, False))
+    ranked = []
+    for slot_name, item_id, equipped in candidates:
+        stand_in = gear_stand_in(character, slot_name, item_data_dict.get(item_id, {"effect": "strength:0"}))
+        win_rate = 0.0
+        hp_loss = 0.0
+        for enemy_type, chance in odds.items():
+            outcome = cache.lookup(stand_in, enemy_type)
+            win_rate += chance * outcome["win_rate"]
+            hp_loss += chance * outcome["avg_hp_loss"]
+        ranked.append({
+            "item_id": item_id,
+            "slot": slot_name,
+            "win_rate": win_rate,
+            "avg_hp_loss": hp_loss,
+            "hp_left": stand_in["max_health"] - hp_loss,
+            "equipped": equipped
+        })
+    ranked.sort(key=lambda option: (-option["win_rate"], -option["hp_left"], option["item_id"]))
+    return ranked
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=== ENCOUNTER SYSTEM TEST ===")
+
+    # Test a party against a horde
+    # import character_manager
+    # party = [
+    #     character_manager.create_character("Ayla", "Warrior"),
+    #     character_manager.create_character("Bren", "Cleric"),
+    # ]
+    # horde = create_horde(1, 6)
+    # battle = PartyBattle(party, horde)
+    # result = battle.start_battle()
+    # print(f"Winner: {result['winner']} after {result['actions']} actions")
@@ -32,30 +32,21 @@ def load_quests(filename="data/quests.txt"):
     REWARD_XP: 100
     REWARD_GOLD: 50
     REQUIRED_LEVEL: 1
-    PREREQUISITE: previous_quest_id (or NONE)
+    PREREQUISITE: previous_quest_id (or NONE, or an expression like
+                  goblin_hunter AND (orc_menace OR equipment_upgrade))
+    REQUIRED_CLASS: Warrior (optional)
+    REQUIRED_ITEMS: item_id:quantity, item_id:quantity (optional)
+    OBJECTIVES: kill:goblin:3, collect:health_potion:2, level:5 (optional;
+                kill:any:N counts every enemy)
+    REPEATABLE: ALWAYS or DAILY (optional, NONE by default)
+    COOLDOWN: 10 (optional; game turns before an ALWAYS quest comes back)
+    TIME_LIMIT: 24 (optional; game turns to finish the quest once accepted)
     
     Returns: Dictionary of quests {quest_id: quest_data_dict}
     Raises: MissingDataFileError, InvalidDataFormatError, CorruptedDataError
     """
 # loading quests from a text file, validating its format. 
-    try:
-        with open(filename, "r", encoding="utf-8") as f:
-            lines = [line.rstrip("\n") for line in f]
-    except FileNotFoundError as e:
-        raise MissingDataFileError(f"Quest data file not found: {filename}") from e
-    except OSError as e:
-        raise CorruptedDataError(f"Could not read quest data file: {filename}") from e
-    blocks = []
-    current = []
-    for line in lines:
-        if line.strip() == "":
-            if current:
-                blocks.append(current)
-                current = []
-        else:
-            current.append(line)
-    if current:
-        blocks.append(current)
+    blocks = read_data_blocks(filename, "Quest")
     quests = {}
     try:
         for block in blocks:
@@ -77,28 +68,12 @@ def load_items(filename="data/items.txt"):
     EFFECT: stat_name:value (e.g., strength:5 or health:20)
     COST: 100
     DESCRIPTION: Item description
+    STACK_LIMIT: 10 (optional, how many share one inventory slot; default 1)
     
     Returns: Dictionary of items {item_id: item_data_dict}
     Raises: MissingDataFileError, InvalidDataFormatError, CorruptedDataError
     """
-    try:
-        with open(filename, "r", encoding="utf-8") as f:
-            lines = [line.rstrip("\n") for line in f]
-    except FileNotFoundError as e:
-        raise MissingDataFileError(f"Item data file not found: {filename}") from e
-    except OSError as e:
-        raise CorruptedDataError(f"Could not read item data file: {filename}") from e
-    blocks = []
-    current = []
-    for line in lines:
-        if line.strip() == "":
-            if current:
-                blocks.append(current)
-                current = []
-        else:
-            current.append(line)
-    if current:
-        blocks.append(current)
+    blocks = read_data_blocks(filename, "Item")
     items = {}
     try:
         for block in blocks:
@@ -109,6 +84,93 @@ def load_items(filename="data/items.txt"):
         raise InvalidDataFormatError(f"Invalid item data format in file {filename}: {e}") from e
     return items
 
+def load_enemies(filename="data/enemies.txt"):
+    """
+    Load enemy data from file
+    
+    Expected format per enemy (separated by blank lines):
+    ENEMY_ID: goblin
+    NAME: Goblin
+    HEALTH: 50
+    STRENGTH: 8
+    MAGIC: 2
+    XP_REWARD: 25
+    GOLD_REWARD: 10
+    SPEED: 12 (optional, default 10)
+    MIN_LEVEL: 1
+    MAX_LEVEL: 2 (or NONE for no upper limit)
+    SPAWN_WEIGHT: 10
+    
+    Returns: Dictionary of enemies {enemy_id: enemy_data_dict}
+    Raises: MissingDataFileError, InvalidDataFormatError, CorruptedDataError
+    """
+# same layout as quests & items, one enemy per block.
+    blocks = read_data_blocks(filename, "Enemy")
+    enemies = {}
+    try:
+        for block in blocks:
+            enemy = parse_enemy_block(block)
+            validate_enemy_data(enemy)
+            enemies[enemy["enemy_id"]] = enemy
+    except InvalidDataFormatError as e:
+        raise InvalidDataFormatError(f"Invalid enemy data format in file {filename}: {e}") from e
+    return enemies
+
+def load_loot_tables(filename="data/loot_tables.txt"):
+    """
+    Load loot table data from file
+    
+    Expected format per table (separated by blank lines):
+    TABLE_ID: goblin
+    ROLLS: 1 (optional, default 1)
+    ENTRY: health_potion, 8, 1-2
+    ENTRY: NOTHING, 6
+    ENTRY: TABLE:common_consumables, 4
+    
+    Each ENTRY is "what, weight, quantity". What is an item ID, NOTHING
+    (no drop), or TABLE:<table_id> (roll that table instead). Quantity
+    is optional: a number or a min-max range (default 1).
+    
+    Returns: Dictionary of loot tables {table_id: table_data_dict}
+    Raises: MissingDataFileError, InvalidDataFormatError, CorruptedDataError
+    """
+# tables are named after the enemy that drops them, other tables
+# can be shared through TABLE: entries.
+    blocks = read_data_blocks(filename, "Loot table")
+    tables = {}
+    try:
+        for block in blocks:
+            table = parse_loot_block(block)
+            validate_loot_table_data(table)
+            tables[table["table_id"]] = table
+    except InvalidDataFormatError as e:
+        raise InvalidDataFormatError(f"Invalid loot table format in file {filename}: {e}") from e
+    return tables
+
+def load_recipes(filename="data/recipes.txt"):
+    """
+    Load crafting recipes from file
+    
+    Expected format per recipe (separated by blank lines):
+    RECIPE_ID: brew_super_potion
+    OUTPUT: super_health_potion:1
+    INPUTS: health_potion:3, wisdom_elixir:1
+    
+    Returns: Dictionary of recipes {recipe_id: recipe_data_dict}
+    Raises: MissingDataFileError, InvalidDataFormatError, CorruptedDataError
+    """
+# quantities use the same "name:number" style as item effects
+    blocks = read_data_blocks(filename, "Recipe")
+    recipes = {}
+    try:
+        for block in blocks:
+            recipe = parse_recipe_block(block)
+            validate_recipe_data(recipe)
+            recipes[recipe["recipe_id"]] = recipe
+    except InvalidDataFormatError as e:
+        raise InvalidDataFormatError(f"Invalid recipe format in file {filename}: {e}") from e
+    return recipes
+
 def validate_quest_data(quest_dict):
     """
     Validate that quest dictionary has all required fields
@@ -162,6 +224,116 @@ def validate_item_data(item_dict):
         raise InvalidDataFormatError(f"Invalid item type: {item_dict['type']}")
     if not isinstance(item_dict["cost"], int):
         raise InvalidDataFormatError("Item cost must be an integer.")
+    stack_limit = item_dict.get("stack_limit", 1)
+    if not isinstance(stack_limit, int) or stack_limit < 1:
+        raise InvalidDataFormatError("Item stack limit must be a positive integer.")
+    return True
+
+def validate_enemy_data(enemy_dict):
+    """
+    Validate that enemy dictionary has all required fields
+    
+    Required fields: enemy_id, name, health, strength, magic, xp_reward,
+                    gold_reward, speed, min_level, max_level, spawn_weight
+    
+    Returns: True if valid
+    Raises: InvalidDataFormatError if missing fields or invalid values
+    """
+# level range has to make sense and the weight has to be positive,
+# otherwise the spawn tables can't be built.
+    if not isinstance(enemy_dict, dict):
+        raise InvalidDataFormatError("Enemy data must be a dictionary.")
+    required_fields = [
+        "enemy_id",
+        "name",
+        "health",
+        "strength",
+        "magic",
+        "xp_reward",
+        "gold_reward",
+        "speed",
+        "min_level",
+        "max_level",
+        "spawn_weight"
+    ]
+    for field in required_fields:
+        if field not in enemy_dict:
+            raise InvalidDataFormatError(f"Missing enemy field: {field}")
+    numeric_fields = ["health", "strength", "magic", "xp_reward", "gold_reward", "speed", "min_level", "spawn_weight"]
+    for field in numeric_fields:
+        if not isinstance(enemy_dict[field], int):
+            raise InvalidDataFormatError(f"Enemy field {field} must be an integer.")
+    if enemy_dict["health"] <= 0:
+        raise InvalidDataFormatError("Enemy health must be positive.")
+    if enemy_dict["speed"] <= 0:
+        raise InvalidDataFormatError("Enemy speed must be positive.")
+    if enemy_dict["spawn_weight"] <= 0:
+        raise InvalidDataFormatError("Enemy spawn weight must be positive.")
+    max_level = enemy_dict["max_level"]
+    if max_level is not None:
+        if not isinstance(max_level, int):
+            raise InvalidDataFormatError("Enemy field max_level must be an integer or NONE.")
+        if max_level < enemy_dict["min_level"]:
+            raise InvalidDataFormatError("Enemy max_level is lower than min_level.")
+    return True
+
+def validate_loot_table_data(table_dict):
+    """
+    Validate that a loot table dictionary is usable
+    
+    Required fields: table_id, rolls, entries
+    Each entry needs kind ('item', 'nothing', 'table'), ref, weight,
+    min_quantity and max_quantity.
+    
+    Returns: True if valid
+    Raises: InvalidDataFormatError if missing fields or invalid values
+    """
+# references to other tables are checked when the tables are compiled,
+# since they can point at tables later in the file.
+    if not isinstance(table_dict, dict):
+        raise InvalidDataFormatError("Loot table data must be a dictionary.")
+    for field in ["table_id", "rolls", "entries"]:
+        if field not in table_dict:
+            raise InvalidDataFormatError(f"Missing loot table field: {field}")
+    if not isinstance(table_dict["rolls"], int) or table_dict["rolls"] < 1:
+        raise InvalidDataFormatError("Loot table rolls must be a positive integer.")
+    if not table_dict["entries"]:
+        raise InvalidDataFormatError(f"Loot table {table_dict['table_id']} has no entries.")
+    for entry in table_dict["entries"]:
+        if entry.get("kind") not in ("item", "nothing", "table"):
+            raise InvalidDataFormatError("Loot entry kind must be item, nothing, or table.")
+        if not isinstance(entry.get("weight"), int) or entry["weight"] < 1:
+            raise InvalidDataFormatError("Loot entry weight must be a positive integer.")
+        low = entry.get("min_quantity")
+        high = entry.get("max_quantity")
+        if not isinstance(low, int) or not isinstance(high, int) or low < 1 or high < low:
+            raise InvalidDataFormatError("Loot entry quantity must be a positive number or range.")
+    return True
+
+def validate_recipe_data(recipe_dict):
+    """
+    Validate that recipe dictionary has all required fields
+    
+    Required fields: recipe_id, output, output_quantity, inputs
+    
+    Returns: True if valid
+    Raises: InvalidDataFormatError if missing fields or invalid values
+    """
+# a recipe needs at least one input and can't use its own output
+    if not isinstance(recipe_dict, dict):
+        raise InvalidDataFormatError("Recipe data must be a dictionary.")
+    for field in ["recipe_id", "output", "output_quantity", "inputs"]:
+        if field not in recipe_dict:
+            raise InvalidDataFormatError(f"Missing recipe field: {field}")
+    if not isinstance(recipe_dict["output_quantity"], int) or recipe_dict["output_quantity"] < 1:
+        raise InvalidDataFormatError("Recipe output quantity must be a positive integer.")
+    if not recipe_dict["inputs"]:
+        raise InvalidDataFormatError(f"Recipe {recipe_dict['recipe_id']} has no inputs.")
+    for item_id, quantity in recipe_dict["inputs"].items():
+        if not isinstance(quantity, int) or quantity < 1:
+            raise InvalidDataFormatError("Recipe input quantities must be positive integers.")
+    if recipe_dict["output"] in recipe_dict["inputs"]:
+        raise InvalidDataFormatError(f"Recipe {recipe_dict['recipe_id']} uses its own output.")
     return True
 
 def create_default_data_files():
@@ -174,6 +346,9 @@ def create_default_data_files():
     os.makedirs("data", exist_ok=True)
     quests_path = os.path.join("data", "quests.txt")
     items_path = os.path.join("data", "items.txt")
+    enemies_path = os.path.join("data", "enemies.txt")
+    loot_path = os.path.join("data", "loot_tables.txt")
+    recipes_path = os.path.join("data", "recipes.txt")
     if not os.path.exists(quests_path):
         quests_content = (
             "QUEST_ID: goblin_cave\n"
@@ -212,11 +387,111 @@ def create_default_data_files():
         )
         with open(items_path, "w", encoding="utf-8") as f:
             f.write(items_content)
+    if not os.path.exists(enemies_path):
+        enemies_content = (
+            "ENEMY_ID: goblin\n"
+            "NAME: Goblin\n"
+            "HEALTH: 50\n"
+            "STRENGTH: 8\n"
+            "MAGIC: 2\n"
+            "XP_REWARD: 25\n"
+            "GOLD_REWARD: 10\n"
+            "SPEED: 12\n"
+            "MIN_LEVEL: 1\n"
+            "MAX_LEVEL: 2\n"
+            "SPAWN_WEIGHT: 1\n"
+            "\n"
+            "ENEMY_ID: orc\n"
+            "NAME: Orc\n"
+            "HEALTH: 80\n"
+            "STRENGTH: 12\n"
+            "MAGIC: 5\n"
+            "XP_REWARD: 50\n"
+            "GOLD_REWARD: 25\n"
+            "SPEED: 9\n"
+            "MIN_LEVEL: 3\n"
+            "MAX_LEVEL: 5\n"
+            "SPAWN_WEIGHT: 1\n"
+            "\n"
+            "ENEMY_ID: dragon\n"
+            "NAME: Dragon\n"
+            "HEALTH: 200\n"
+            "STRENGTH: 25\n"
+            "MAGIC: 15\n"
+            "XP_REWARD: 200\n"
+            "GOLD_REWARD: 100\n"
+            "SPEED: 8\n"
+            "MIN_LEVEL: 6\n"
+            "MAX_LEVEL: NONE\n"
+            "SPAWN_WEIGHT: 1\n"
+        )
+        with open(enemies_path, "w", encoding="utf-8") as f:
+            f.write(enemies_content)
+    if not os.path.exists(loot_path):
+        loot_content = (
+            "TABLE_ID: goblin\n"
+            "ROLLS: 1\n"
+            "ENTRY: NOTHING, 3\n"
+            "ENTRY: health_potion, 1\n"
+            "\n"
+            "TABLE_ID: orc\n"
+            "ROLLS: 1\n"
+            "ENTRY: NOTHING, 2\n"
+            "ENTRY: health_potion, 2, 1-2\n"
+            "\n"
+            "TABLE_ID: dragon\n"
+            "ROLLS: 2\n"
+            "ENTRY: health_potion, 3, 1-3\n"
+            "ENTRY: iron_sword, 1\n"
+        )
+        with open(loot_path, "w", encoding="utf-8") as f:
+            f.write(loot_content)
+    if not os.path.exists(recipes_path):
+        recipes_content = (
+            "RECIPE_ID: trade_up_sword\n"
+            "OUTPUT: iron_sword:1\n"
+            "INPUTS: health_potion:4\n"
+        )
+        with open(recipes_path, "w", encoding="utf-8") as f:
+            f.write(recipes_content)
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+def read_data_blocks(filename, label):
+    """
+    Read a data file and split it into blocks of non-blank lines
+    
+    Args:
+        filename: Path of the data file
+        label: Name used in error messages (e.g. "Quest", "Item")
+    
+    Returns: List of blocks, each a list of lines
+    Raises: MissingDataFileError, CorruptedDataError
+    """
+# every data file uses blank lines between records, so all the
+# loaders share this.
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            lines = [line.rstrip("\n") for line in f]
+    except FileNotFoundError as e:
+        raise MissingDataFileError(f"{label} data file not found: {filename}") from e
+    except OSError as e:
+        raise CorruptedDataError(f"Could not read {label.lower()} data file: {filename}") from e
+    blocks = []
+    current = []
+    for line in lines:
+        if line.strip() == "":
+            if current:
+                blocks.append(current)
+                current = []
+        else:
+            current.append(line)
+    if current:
+        blocks.append(current)
+    return blocks
+
 def parse_quest_block(lines):
     """
     Parse a block of lines into a quest dictionary
@@ -244,9 +519,27 @@ def parse_quest_block(lines):
         reward_gold = int(data["REWARD_GOLD"])
         required_level = int(data["REQUIRED_LEVEL"])
         prereq_raw = data.get("PREREQUISITE", "NONE")
+        class_raw = data.get("REQUIRED_CLASS", "NONE")
+        required_items = {}
+        items_raw = data.get("REQUIRED_ITEMS", "NONE")
+        if items_raw.upper() != "NONE":
+            for part in items_raw.split(","):
+                item_id, quantity = parse_item_quantity(part)
+                required_items[item_id] = required_items.get(item_id, 0) + quantity
+        repeatable = data.get("REPEATABLE", "NONE").lower()
+        cooldown = int(data.get("COOLDOWN", "0"))
+        limit_raw = data.get("TIME_LIMIT", "NONE")
+        time_limit = None if limit_raw.upper() == "NONE" else int(limit_raw)
     except (KeyError, ValueError) as e:
         raise InvalidDataFormatError("Invalid quest block format.") from e
+    if repeatable not in REPEAT_TYPES:
+        raise InvalidDataFormatError(f"Unknown REPEATABLE value: {data['REPEATABLE']}")
+    if cooldown < 0 or (time_limit is not None and time_limit < 1):
+        raise InvalidDataFormatError("COOLDOWN can't be negative and TIME_LIMIT must be at least 1.")
+    objectives = parse_objectives(data.get("OBJECTIVES", "NONE"))
     prerequisite = None if prereq_raw.upper() == "NONE" else prereq_raw
+# checked here so a bad expression is caught when the file loads
+    parse_prerequisite_tree(prerequisite)
     quest = {
         "quest_id": quest_id,
         "title": title,
@@ -254,7 +547,13 @@ def parse_quest_block(lines):
         "reward_xp": reward_xp,
         "reward_gold": reward_gold,
         "required_level": required_level,
-        "prerequisite": prerequisite
+        "prerequisite": prerequisite,
+        "required_class": None if class_raw.upper() == "NONE" else class_raw,
+        "required_items": required_items,
+        "objectives": objectives,
+        "repeatable": None if repeatable == "none" else repeatable,
+        "cooldown": cooldown,
+        "time_limit": time_limit
     }
     return quest
 
@@ -284,6 +583,7 @@ def parse_item_block(lines):
         effect = data["EFFECT"]
         cost = int(data["COST"])
         description = data["DESCRIPTION"]
+        stack_limit = int(data.get("STACK_LIMIT", "1"))
     except (KeyError, ValueError) as e:
         raise InvalidDataFormatError("Invalid item block format.") from e
     item = {
@@ -292,10 +592,323 @@ def parse_item_block(lines):
         "type": item_type,
         "effect": effect,
         "cost": cost,
-        "description": description
+        "description": description,
+        "stack_limit": stack_limit
     }
     return item
 
+def parse_enemy_block(lines):
+    """
+    Parse a block of lines into an enemy dictionary
+    
+    Args:
+        lines: List of strings representing one enemy
+    
+    Returns: Dictionary with enemy data
+    Raises: InvalidDataFormatError if parsing fails
+    """
+# MAX_LEVEL: NONE means the enemy keeps spawning at every higher level
+    data = {}
+    for line in lines:
+        if ":" not in line:
+            raise InvalidDataFormatError("Missing ':' in enemy line.")
+        key, value = line.split(":", 1)
+        key = key.strip().upper()
+        value = value.strip()
+        data[key] = value
+    try:
+        enemy_id = data["ENEMY_ID"].lower()
+        name = data.get("NAME", enemy_id.capitalize())
+        health = int(data["HEALTH"])
+        strength = int(data["STRENGTH"])
+        magic = int(data["MAGIC"])
+        xp_reward = int(data["XP_REWARD"])
+        gold_reward = int(data["GOLD_REWARD"])
+        speed = int(data.get("SPEED", "10"))
+        min_level = int(data.get("MIN_LEVEL", "1"))
+        max_raw = data.get("MAX_LEVEL", "NONE")
+        max_level = None if max_raw.upper() == "NONE" else int(max_raw)
+        spawn_weight = int(data.get("SPAWN_WEIGHT", "1"))
+    except (KeyError, ValueError) as e:
+        raise InvalidDataFormatError("Invalid enemy block format.") from e
+    enemy = {
+        "enemy_id": enemy_id,
+        "name": name,
+        "health": health,
+        "strength": strength,
+        "magic": magic,
+        "xp_reward": xp_reward,
+        "gold_reward": gold_reward,
+        "speed": speed,
+        "min_level": min_level,
+        "max_level": max_level,
+        "spawn_weight": spawn_weight
+    }
+    return enemy
+
+def parse_loot_block(lines):
+    """
+    Parse a block of lines into a loot table dictionary
+    
+    Args:
+        lines: List of strings representing one loot table
+    
+    Returns: Dictionary with loot table data
+    Raises: InvalidDataFormatError if parsing fails
+    """
+# ENTRY can show up many times, so it's collected separately from
+# the other KEY: value lines
+    data = {}
+    entries = []
+    for line in lines:
+        if ":" not in line:
+            raise InvalidDataFormatError("Missing ':' in loot table line.")
+        key, value = line.split(":", 1)
+        key = key.strip().upper()
+        value = value.strip()
+        if key == "ENTRY":
+            entries.append(parse_loot_entry(value))
+        else:
+            data[key] = value
+    try:
+        table_id = data["TABLE_ID"].lower()
+        rolls = int(data.get("ROLLS", "1"))
+    except (KeyError, ValueError) as e:
+        raise InvalidDataFormatError("Invalid loot table block format.") from e
+    return {"table_id": table_id, "rolls": rolls, "entries": entries}
+
+def parse_loot_entry(value):
+    """
+    Parse the value of one ENTRY line
+    
+    Example: "health_potion, 8, 1-2" -> item health_potion, weight 8, 1 to 2 of it
+    
+    Returns: Entry dictionary
+    Raises: InvalidDataFormatError if parsing fails
+    """
+    parts = [part.strip() for part in value.split(",")]
+    if len(parts) not in (2, 3) or not parts[0]:
+        raise InvalidDataFormatError(f"Invalid loot entry: {value}")
+    what = parts[0]
+    if what.upper() == "NOTHING":
+        kind, ref = "nothing", None
+    elif what.upper().startswith("TABLE:"):
+        kind, ref = "table", what.split(":", 1)[1].strip().lower()
+    else:
+        kind, ref = "item", what
+    quantity = parts[2] if len(parts) == 3 else "1"
+    try:
+        weight = int(parts[1])
+        if "-" in quantity:
+            low, high = quantity.split("-", 1)
+            min_quantity, max_quantity = int(low), int(high)
+        else:
+            min_quantity = max_quantity = int(quantity)
+    except ValueError as e:
+        raise InvalidDataFormatError(f"Invalid loot entry: {value}") from e
+    return {
+        "kind": kind,
+        "ref": ref,
+        "weight": weight,
+        "min_quantity": min_quantity,
+        "max_quantity": max_quantity
+    }
+
+def parse_recipe_block(lines):
+    """
+    Parse a block of lines into a recipe dictionary
+    
+    Args:
+        lines: List of strings representing one recipe
+    
+    Returns: Dictionary with recipe data
+    Raises: InvalidDataFormatError if parsing fails
+    """
+    data = {}
+    for line in lines:
+        if ":" not in line:
+            raise InvalidDataFormatError("Missing ':' in recipe line.")
+        key, value = line.split(":", 1)
+        key = key.strip().upper()
+        value = value.strip()
+        data[key] = value
+    try:
+        recipe_id = data["RECIPE_ID"]
+        output, output_quantity = parse_item_quantity(data["OUTPUT"])
+        inputs = {}
+        for part in data["INPUTS"].split(","):
+            item_id, quantity = parse_item_quantity(part)
+            inputs[item_id] = inputs.get(item_id, 0) + quantity
+    except (KeyError, ValueError) as e:
+        raise InvalidDataFormatError("Invalid recipe block format.") from e
+    return {
+        "recipe_id": recipe_id,
+        "output": output,
+        "output_quantity": output_quantity,
+        "inputs": inputs
+    }
+
+def parse_item_quantity(text):
+    """
+    Parse "item_id:quantity" (quantity defaults to 1)
+    
+    Returns: Tuple (item_id, quantity)
+    Raises: ValueError if the quantity isn't a number or the ID is blank
+    """
+    item_id, _, quantity = text.strip().partition(":")
+    item_id = item_id.strip()
+    if not item_id:
+        raise ValueError("Missing item ID.")
+    return item_id, int(quantity) if quantity.strip() else 1
+
+OBJECTIVE_TYPES = ("kill", "collect", "level")
+
+REPEAT_TYPES = ("none", "always", "daily")
+
+def parse_objectives(text):
+    """
+    Parse an OBJECTIVES line
+    
+    Example: "kill:goblin:3, level:5" ->
+             [{'type': 'kill', 'target': 'goblin', 'count': 3},
+              {'type': 'level', 'target': None, 'count': 5}]
+    
+    Returns: List of objective dictionaries (empty for NONE)
+    Raises: InvalidDataFormatError for unknown types or bad counts
+    """
+    objectives = []
+    if not text.strip() or text.strip().upper() == "NONE":
+        return objectives
+    for part in text.split(","):
+        pieces = [piece.strip() for piece in part.split(":")]
+        kind = pieces[0].lower()
+        if kind not in OBJECTIVE_TYPES:
+            raise InvalidDataFormatError(f"Unknown objective type: {part.strip()}")
+        try:
+            if kind == "level":
+                if len(pieces) != 2:
+                    raise ValueError(part)
+                target, count = None, int(pieces[1])
+            else:
+                if len(pieces) != 3 or not pieces[1]:
+                    raise ValueError(part)
+                target, count = pieces[1], int(pieces[2])
+        except ValueError as e:
+            raise InvalidDataFormatError(f"Invalid objective: {part.strip()}") from e
+        if count < 1:
+            raise InvalidDataFormatError(f"Objective count must be at least 1: {part.strip()}")
+        if kind == "kill":
+            target = target.lower()
+        objectives.append({"type": kind, "target": target, "count": count})
+    return objectives
+
+def parse_prerequisite_tree(text):
+    """
+    Parse a PREREQUISITE expression into a tree
+    
+    Quest IDs are joined with AND / OR (AND comes first) and grouped
+    with parentheses. A tree is a quest ID string or a tuple
+    ("AND" or "OR", [subtrees]); nested groups of the same kind are
+    merged. Example: "a AND (b OR c)" -> ("AND", ["a", ("OR", ["b", "c"])])
+    
+    Returns: The tree, or None for None or NONE
+    Raises: InvalidDataFormatError if the expression is malformed
+    """
+    if text is None or not str(text).strip() or str(text).strip().upper() == "NONE":
+        return None
+    tokens = str(text).replace("(", " ( ").replace(")", " ) ").split()
+    position = 0
+
+    def join(kind, parts):
+        if len(parts) == 1:
+            return parts[0]
+        children = []
+        for part in parts:
+            if isinstance(part, tuple) and part[0] == kind:
+                children.extend(part[1])
+            else:
+                children.append(part)
+        return (kind, children)
+
+    def parse_or():
+        nonlocal position
+        parts = [parse_and()]
+        while position < len(tokens) and tokens[position].upper() == "OR":
+            position += 1
+            parts.append(parse_and())
+        return join("OR", parts)
+
+    def parse_and():
+        nonlocal position
+        parts = [parse_term()]
+        while position < len(tokens) and tokens[position].upper() == "AND":
+            position += 1
+            parts.append(parse_term())
+        return join("AND", parts)
+
+    def parse_term():
+        nonlocal position
+        if position >= len(tokens):
+            raise InvalidDataFormatError(f"Prerequisite ends too early: {text}")
+        token = tokens[position]
+        position += 1
+        if token == "(":
+            tree = parse_or()
+            if position >= len(tokens) or tokens[position] != ")":
+                raise InvalidDataFormatError(f"Missing ')' in prerequisite: {text}")
+            position += 1
+            return tree
+        if token == ")" or token.upper() in ("AND", "OR"):
+            raise InvalidDataFormatError(f"Unexpected '{token}' in prerequisite: {text}")
+        return token
+
+    tree = parse_or()
+    if position != len(tokens):
+        raise InvalidDataFormatError(f"Unexpected '{tokens[position]}' in prerequisite: {text}")
+    return tree
+
+def prerequisite_ids(tree):
+    """Get every quest ID in a prerequisite tree, in the order they appear"""
+    quest_ids = []
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, tuple):
+            stack.extend(reversed(node[1]))
+        elif node not in quest_ids:
+            quest_ids.append(node)
+    return quest_ids
+
+def parse_prerequisites(text):
+    """
+    Parse a PREREQUISITE expression into the ways it can be met
+    
+    Example: "a AND (b OR c)" -> [("a", "b"), ("a", "c")]
+    An AND of ORs multiplies out, so this is for planning and reports;
+    checking a prerequisite goes through the tree instead.
+    
+    Returns: List of options, each a sorted tuple of quest IDs that all
+             have to be completed; empty for None or NONE
+    Raises: InvalidDataFormatError if the expression is malformed
+    """
+    tree = parse_prerequisite_tree(text)
+    if tree is None:
+        return []
+
+    def expand(node):
+        if not isinstance(node, tuple):
+            return [frozenset([node])]
+        kind, children = node
+        options = expand(children[0])
+        for child in children[1:]:
+            if kind == "OR":
+                options = options + expand(child)
+            else:
+                right = expand(child)
+                options = [left | other for left in options for other in right]
+        return options
+
+    return sorted(set(tuple(sorted(option)) for option in expand(tree)))
 
 # ============================================================================
 # TESTING
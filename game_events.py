@@ -0,0 +1,74 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Game Events Module
+
+Name: Kayla Bagley
+
+This module lets one part of the game react to things that happen in
+another (like a purchase or a level up) without the two importing
+each other.
+"""
+
+# ============================================================================
+# EVENT LISTENERS
+# ============================================================================
+# event name -> list of callbacks, called in the order they subscribed
+
+_listeners = {}
+
+def subscribe(event_name, callback):
+    """
+    Call callback(**details) every time event_name is emitted
+
+    Subscribing the same callback twice does nothing.
+    """
+    callbacks = _listeners.setdefault(event_name, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+def unsubscribe(event_name, callback):
+    """
+    Stop calling callback for event_name
+
+    Returns: True if the callback was subscribed
+    """
+    callbacks = _listeners.get(event_name, [])
+    if callback not in callbacks:
+        return False
+    callbacks.remove(callback)
+    if not callbacks:
+        del _listeners[event_name]
+    return True
+
+def emit(event_name, **details):
+    """
+    Tell every listener that an event happened
+
+    Args:
+        event_name: Event name (e.g. "item_purchased")
+        **details: Passed to each callback as keyword arguments
+
+    Returns: Number of listeners called
+    """
+# copy so a listener can unsubscribe itself while being called
+    callbacks = list(_listeners.get(event_name, ()))
+    for callback in callbacks:
+        callback(**details)
+    return len(callbacks)
+
+def clear_listeners(event_name=None):
+    """Remove the listeners for one event (or every event if None)"""
+    if event_name is None:
+        _listeners.clear()
+    else:
+        _listeners.pop(event_name, None)
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=== GAME EVENTS TEST ===")
+
+    # subscribe("item_purchased", lambda **details: print(details))
+    # emit("item_purchased", character=None, item_id="health_potion", quantity=1)
@@ -9,16 +9,363 @@ AI Usage: Needed help to parse through item effect strings and managing the char
 This module handles inventory management, item usage, and equipment.
 """
 
+import bisect
+from contextlib import contextmanager
+
+import character_manager
+import game_events
 from custom_exceptions import (
     InventoryFullError,
     ItemNotFoundError,
     InsufficientResourcesError,
-    InvalidItemTypeError
+    InvalidItemTypeError,
+    InvalidDataFormatError
 )
 
-# Maximum inventory size
+# Maximum inventory size (in slots)
 MAX_INVENTORY_SIZE = 20
 
+# how many of an item share one slot; items not listed take a slot each
+DEFAULT_STACK_LIMIT = 1
+STACK_LIMITS = {}
+_stack_limits_version = 0
+
+# equipment slots and the item type each one holds
+EQUIPMENT_SLOTS = {
+    "weapon": "weapon",
+    "armor": "armor",
+}
+
+# ============================================================================
+# INVENTORY STORAGE
+# ============================================================================
+
+class StackedInventory(list):
+    """
+    Inventory list that also keeps per-item counts
+
+    It is still a plain list of item IDs (so saving, joining and
+    'in' checks work as before), but counts, positions and used slots
+    are kept up to date, which makes has/count/remove O(1).
+    remove() fills the gap with the last item, so order is not kept.
+    Each consumer that calls take_changes() gets its own set of item IDs
+    whose count changed (None means everything may have changed), so
+    consumers never take changes from each other. Results a consumer
+    works out from them are kept in derived, with the inventory, so
+    they go away with it.
+    """
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self.changes = {}
+        self.derived = {}
+        self._rebuild()
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def _rebuild(self):
+        """Recount everything from the list contents"""
+        self.changes = dict.fromkeys(getattr(self, "changes", ()))
+        self.counts = {}
+        self.positions = {}
+        for index, item_id in enumerate(self):
+            self.counts[item_id] = self.counts.get(item_id, 0) + 1
+            self.positions.setdefault(item_id, set()).add(index)
+        self._recount_slots()
+
+    def _recount_slots(self):
+        """Recompute slot usage (needed when stack limits change)"""
+        self.slots_used = 0
+        for item_id, quantity in self.counts.items():
+            self.slots_used += slots_for(item_id, quantity)
+        self.limits_version = _stack_limits_version
+
+    def used_slots(self):
+        """Number of inventory slots taken"""
+        if self.limits_version != _stack_limits_version:
+            self._recount_slots()
+        return self.slots_used
+
+    def slots_needed(self, item_id, quantity=1):
+        """Extra slots needed to add quantity more of an item"""
+        current = self.counts.get(item_id, 0)
+        return slots_for(item_id, current + quantity) - slots_for(item_id, current)
+
+    def _added(self, item_id, index):
+        current = self.counts.get(item_id, 0)
+        self.slots_used += slots_for(item_id, current + 1) - slots_for(item_id, current)
+        self.counts[item_id] = current + 1
+        self.positions.setdefault(item_id, set()).add(index)
+        self._note(item_id)
+
+    def _removed(self, item_id, index):
+        current = self.counts[item_id]
+        self.slots_used -= slots_for(item_id, current) - slots_for(item_id, current - 1)
+        self._note(item_id)
+        positions = self.positions[item_id]
+        positions.discard(index)
+        if current == 1:
+            del self.counts[item_id]
+            del self.positions[item_id]
+        else:
+            self.counts[item_id] = current - 1
+
+    def _note(self, item_id):
+        for changed in self.changes.values():
+            if changed is not None:
+                changed.add(item_id)
+
+    def take_changes(self, consumer):
+        """
+        Get the item IDs whose count changed since consumer last called
+
+        Returns: Set of item IDs, or None if everything should be
+                 rechecked (always the case on a consumer's first call)
+        """
+        changed = self.changes.get(consumer)
+        self.changes[consumer] = set()
+        return changed
+
+    def __contains__(self, item_id):
+        return item_id in self.counts
+
+    def count(self, item_id):
+        return self.counts.get(item_id, 0)
+
+    def append(self, item_id):
+        super().append(item_id)
+        self._added(item_id, len(self) - 1)
+
+    def extend(self, items):
+        for item_id in items:
+            self.append(item_id)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def remove(self, item_id):
+        if item_id not in self.counts:
+            raise ValueError(f"{item_id!r} is not in inventory")
+        index = next(iter(self.positions[item_id]))
+        last = len(self) - 1
+        self._removed(item_id, index)
+        if index != last:
+            moved = self[last]
+            super().__setitem__(index, moved)
+            self.positions[moved].discard(last)
+            self.positions[moved].add(index)
+        super().pop()
+
+    def pop(self, index=-1):
+        if index in (-1, len(self) - 1):
+            item_id = super().pop()
+            self._removed(item_id, len(self))
+            return item_id
+        item_id = super().pop(index)
+        self._rebuild()
+        return item_id
+
+    def clear(self):
+        super().clear()
+        self._rebuild()
+
+    # anything that shifts items around just recounts
+    def insert(self, index, item_id):
+        super().insert(index, item_id)
+        self._rebuild()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+    def __imul__(self, times):
+        super().__imul__(times)
+        self._rebuild()
+        return self
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._rebuild()
+
+    def regroup(self, order=None):
+        """
+        Lay the list out as one run per item, in the given item order
+
+        Counts and slots don't change, so only positions are redone
+        (one range per item instead of a full recount).
+
+        Args:
+            order: Item IDs in the order they should appear (defaults to
+                   first-seen order); must contain every item once
+        """
+        if order is None:
+            order = list(self.counts)
+        layout = []
+        positions = {}
+        for item_id in order:
+            quantity = self.counts[item_id]
+            positions[item_id] = set(range(len(layout), len(layout) + quantity))
+            layout.extend([item_id] * quantity)
+        super().__setitem__(slice(None), layout)
+        self.positions = positions
+
+    def reverse(self):
+        super().reverse()
+        self._rebuild()
+
+def slots_for(item_id, quantity):
+    """Number of slots quantity of an item takes up"""
+    limit = STACK_LIMITS.get(item_id, DEFAULT_STACK_LIMIT)
+    return -(-quantity // limit)
+
+def register_stack_limits(item_data_dict):
+    """
+    Set stack limits from item data ('stack_limit' field)
+
+    Args:
+        item_data_dict: Dictionary of all item data
+    """
+# inventories notice the change and recount their slots the
+# next time they are checked
+    global _stack_limits_version
+    STACK_LIMITS.clear()
+    for item_id, data in item_data_dict.items():
+        limit = data.get("stack_limit", DEFAULT_STACK_LIMIT)
+        if limit != DEFAULT_STACK_LIMIT:
+            STACK_LIMITS[item_id] = limit
+    _stack_limits_version += 1
+
+def get_inventory(character):
+    """
+    Get a character's inventory as a StackedInventory
+
+    A plain list (e.g. from a save file) is converted once, and its
+    duplicates are grouped into stacks.
+    """
+    inventory = character.get("inventory")
+    if not isinstance(inventory, StackedInventory):
+        inventory = StackedInventory(inventory or [])
+        inventory.regroup()
+        character["inventory"] = inventory
+    return inventory
+
+# ============================================================================
+# TRANSACTIONS
+# ============================================================================
+
+class InventoryTransaction:
+    """
+    Staged gold, item, and stat changes for one character
+
+    Nothing touches the character until commit(), which checks every
+    change in one pass and then applies all of them (or none).
+    """
+
+    def __init__(self, character):
+        self.character = character
+        self.gold_delta = 0
+        self.item_deltas = {}
+        self.stat_changes = []
+        self.field_changes = {}
+        self.equipment_changes = {}
+        self.committed = False
+
+    def add_item(self, item_id, quantity=1):
+        """Stage adding quantity of an item"""
+        self.item_deltas[item_id] = self.item_deltas.get(item_id, 0) + quantity
+
+    def remove_item(self, item_id, quantity=1):
+        """Stage removing quantity of an item"""
+        self.item_deltas[item_id] = self.item_deltas.get(item_id, 0) - quantity
+
+    def add_gold(self, amount):
+        """Stage a gold change (negative to spend)"""
+        self.gold_delta += amount
+
+    def change_stat(self, stat_name, value):
+        """Stage a stat change (applied with apply_stat_effect)"""
+        self.stat_changes.append((stat_name, value))
+
+    def set_field(self, key, value):
+        """Stage setting a character field (e.g. equipped item IDs)"""
+        self.field_changes[key] = value
+
+    def set_equipment(self, slot, equipped):
+        """Stage filling (or emptying, with None) an equipment slot"""
+        self.equipment_changes[slot] = equipped
+
+    def validate(self):
+        """
+        Check that every staged change can be applied
+
+        Raises:
+            InsufficientResourcesError if gold would go negative
+            ItemNotFoundError if removing more of an item than the character has
+            InventoryFullError if the added items don't fit
+        """
+# one pass over the net change per item
+        if self.character.get("gold", 0) + self.gold_delta < 0:
+            raise InsufficientResourcesError("Not enough gold.")
+        inventory = get_inventory(self.character)
+        slots = inventory.used_slots()
+        for item_id, delta in self.item_deltas.items():
+            current = inventory.count(item_id)
+            if current + delta < 0:
+                raise ItemNotFoundError(f"Item {item_id} not found in inventory.")
+            slots += slots_for(item_id, current + delta) - slots_for(item_id, current)
+        if slots > MAX_INVENTORY_SIZE:
+            raise InventoryFullError("Inventory is full.")
+
+    def commit(self):
+        """
+        Validate and apply every staged change
+
+        Raises: Same as validate(); nothing is applied if it fails
+        """
+        self.validate()
+        inventory = get_inventory(self.character)
+        for item_id, delta in self.item_deltas.items():
+            for _ in range(-delta):
+                inventory.remove(item_id)
+        for item_id, delta in self.item_deltas.items():
+            for _ in range(delta):
+                inventory.append(item_id)
+        self.character["gold"] = self.character.get("gold", 0) + self.gold_delta
+        for stat_name, value in self.stat_changes:
+            apply_stat_effect(self.character, stat_name, value)
+        self.character.update(self.field_changes)
+        if self.equipment_changes:
+            character_manager.mark_stats_dirty(self.character)
+            self.character.setdefault("equipment", {}).update(self.equipment_changes)
+            character_manager.refresh_stats(self.character)
+        self.committed = True
+        for item_id, delta in self.item_deltas.items():
+            if delta > 0:
+                game_events.emit("item_added", character=self.character, item_id=item_id, quantity=delta)
+
+@contextmanager
+def transaction(character):
+    """
+    Group inventory, gold, and stat changes so they all happen or none do
+
+    Usage:
+        with inventory_system.transaction(character) as tx:
+            tx.add_gold(-100)
+            tx.add_item("iron_sword")
+
+    Changes are committed when the block ends. If the block raises, or
+    the commit fails validation, the character is left untouched.
+    """
+    tx = InventoryTransaction(character)
+    yield tx
+    tx.commit()
+
 # ============================================================================
 # INVENTORY MANAGEMENT
 # ============================================================================
@@ -34,13 +381,13 @@ def add_item_to_inventory(character, item_id):
     Returns: True if added successfully
     Raises: InventoryFullError if inventory is at max capacity
     """
-# checks if inventory full. full, raise error. else, append 
-# item_id to inventory list
-    inventory = character.get("inventory", [])
-    if len(inventory) >= MAX_INVENTORY_SIZE:
+# checks if the item needs a new slot and there is none left.
+# full, raise error. else, append item_id to inventory list
+    inventory = get_inventory(character)
+    if inventory.used_slots() + inventory.slots_needed(item_id) > MAX_INVENTORY_SIZE:
         raise InventoryFullError("Inventory is full.")
     inventory.append(item_id)
-    character["inventory"] = inventory
+    game_events.emit("item_added", character=character, item_id=item_id, quantity=1)
     return True
 
 def remove_item_from_inventory(character, item_id):
@@ -56,11 +403,10 @@ def remove_item_from_inventory(character, item_id):
     """
 # if item isn't in inventory list, raise error. else, 
 # remove 1 copy and return True.
-    inventory = character.get("inventory", [])
+    inventory = get_inventory(character)
     if item_id not in inventory:
         raise ItemNotFoundError(f"Item {item_id} not found in inventory.")
     inventory.remove(item_id)
-    character["inventory"] = inventory
     return True
 
 def has_item(character, item_id):
@@ -70,7 +416,7 @@ def has_item(character, item_id):
     Returns: True if item in inventory, False otherwise
     """
 # returns true if item is in inventory list, else false
-    return item_id in character.get("inventory", [])
+    return item_id in get_inventory(character)
 
 def count_item(character, item_id):
     """
@@ -79,15 +425,15 @@ def count_item(character, item_id):
     Returns: Integer count of item
     """
 # return how many copies of specific item, 'count()'.
-    return character.get("inventory", []).count(item_id)
+    return get_inventory(character).count(item_id)
 
 def get_inventory_space_remaining(character):
     """
-    Calculate how many more items can fit in inventory
+    Calculate how many more slots are free in inventory
     
     Returns: Integer representing available slots
     """
-    return MAX_INVENTORY_SIZE - len(character.get("inventory", []))
+    return MAX_INVENTORY_SIZE - get_inventory(character).used_slots()
 
 def clear_inventory(character):
     """
@@ -97,9 +443,9 @@ def clear_inventory(character):
     """
 # saves copy of current inventory, then clears it. returns 
 # the list of removed items.
-    inventory = character.get("inventory", [])
+    inventory = get_inventory(character)
     removed = list(inventory)
-    character["inventory"] = []
+    character["inventory"] = StackedInventory()
     return removed
 
 # ============================================================================
@@ -158,25 +504,13 @@ def equip_weapon(character, item_id, item_data):
         ItemNotFoundError if item not in inventory
         InvalidItemTypeError if item type is not 'weapon'
     """
-# makes sure character has item. if not, raise error. if 
-# weapon is already equpped reme state bonus.
-    if item_id not in character.get("inventory", []):
+# makes sure character has item. if not, raise error. the old
+# weapon goes back to the inventory and its bonus goes away.
+    if not has_item(character, item_id):
         raise ItemNotFoundError("Item not in inventory.")
     if item_data.get("type") != "weapon":
         raise InvalidItemTypeError("Item is not a weapon.")
-
-    stat_name, value = parse_item_effect(item_data.get("effect", "strength:0"))
-
-    current_weapon = character.get("equipped_weapon")
-    if current_weapon is not None:
-        if len(character.get("inventory", [])) >= MAX_INVENTORY_SIZE:
-            raise InventoryFullError("Inventory is full.")
-        character["inventory"].append(current_weapon)
-
-    character["equipped_weapon"] = item_id
-    character["inventory"].remove(item_id)
-    apply_stat_effect(character, stat_name, value)
-
+    equip_item(character, "weapon", item_id, item_data)
     return f"Equipped weapon: {item_data.get('name', item_id)}"
 
 def equip_armor(character, item_id, item_data):
@@ -204,18 +538,7 @@ def equip_armor(character, item_id, item_data):
         raise ItemNotFoundError(f"Item {item_id} not found in inventory.")
     if item_data.get("type") != "armor":
         raise InvalidItemTypeError("Item is not armor.")
-    current_id = character.get("equipped_armor_id")
-    current_bonus = character.get("equipped_armor_bonus", 0)
-    current_stat = character.get("equipped_armor_stat")
-    if current_id is not None:
-        apply_stat_effect(character, current_stat, -current_bonus)
-        add_item_to_inventory(character, current_id)
-    stat_name, value = parse_item_effect(item_data.get("effect", "max_health:0"))
-    remove_item_from_inventory(character, item_id)
-    apply_stat_effect(character, stat_name, value)
-    character["equipped_armor_id"] = item_id
-    character["equipped_armor_bonus"] = value
-    character["equipped_armor_stat"] = stat_name
+    equip_item(character, "armor", item_id, item_data)
     item_name = item_data.get("name", item_id)
     return f"Equipped {item_name}."
 
@@ -227,19 +550,7 @@ def unequip_weapon(character):
     Raises: InventoryFullError if inventory is full
     """
 # if no weapon equipped, return none. if inventory full, raise
-    current_id = character.get("equipped_weapon_id")
-    if current_id is None:
-        return None
-    if get_inventory_space_remaining(character) <= 0:
-        raise InventoryFullError("Inventory is full.")
-    current_bonus = character.get("equipped_weapon_bonus", 0)
-    current_stat = character.get("equipped_weapon_stat")
-    apply_stat_effect(character, current_stat, -current_bonus)
-    add_item_to_inventory(character, current_id)
-    character["equipped_weapon_id"] = None
-    character["equipped_weapon_bonus"] = 0
-    character["equipped_weapon_stat"] = None
-    return current_id
+    return unequip_item(character, "weapon")
 
 def unequip_armor(character):
     """
@@ -249,18 +560,55 @@ def unequip_armor(character):
     Raises: InventoryFullError if inventory is full
     """
 # same as 'unequip_weapon', but for armor.
-    current_id = character.get("equipped_armor_id")
+    return unequip_item(character, "armor")
+
+def get_equipped(character, slot):
+    """
+    Get the item ID in an equipment slot
+
+    Returns: Item ID, or None if the slot is empty
+    """
+    equipped = character.get("equipment", {}).get(slot)
+    return equipped["item_id"] if equipped else None
+
+def equip_item(character, slot, item_id, item_data):
+    """
+    Put an item in an equipment slot (swapping out what was there)
+
+    Base stats are never touched; the slot's bonus is added when the
+    character's cached stats are refreshed.
+
+    Raises:
+        ValueError if the slot doesn't exist
+        ItemNotFoundError if item not in inventory
+        InventoryFullError if the old item can't go back to the inventory
+    """
+    if slot not in EQUIPMENT_SLOTS:
+        raise ValueError(f"Unknown equipment slot: {slot}")
+    default_effect = "strength:0" if slot == "weapon" else "max_health:0"
+    stat_name, value = parse_item_effect(item_data.get("effect", default_effect))
+    current_id = get_equipped(character, slot)
+    with transaction(character) as tx:
+        if current_id is not None:
+            tx.add_item(current_id)
+        tx.remove_item(item_id)
+        tx.set_equipment(slot, {"item_id": item_id, "stat": stat_name, "bonus": value})
+        tx.set_field(f"equipped_{slot}", item_id)
+
+def unequip_item(character, slot):
+    """
+    Empty an equipment slot, returning the item to the inventory
+
+    Returns: Item ID that was unequipped, or None if the slot was empty
+    Raises: InventoryFullError if the inventory has no room
+    """
+    current_id = get_equipped(character, slot)
     if current_id is None:
         return None
-    if get_inventory_space_remaining(character) <= 0:
-        raise InventoryFullError("Inventory is full.")
-    current_bonus = character.get("equipped_armor_bonus", 0)
-    current_stat = character.get("equipped_armor_stat")
-    apply_stat_effect(character, current_stat, -current_bonus)
-    add_item_to_inventory(character, current_id)
-    character["equipped_armor_id"] = None
-    character["equipped_armor_bonus"] = 0
-    character["equipped_armor_stat"] = None
+    with transaction(character) as tx:
+        tx.add_item(current_id)
+        tx.set_equipment(slot, None)
+        tx.set_field(f"equipped_{slot}", None)
     return current_id
 
 # ============================================================================
@@ -284,13 +632,12 @@ def purchase_item(character, item_id, item_data):
 # price of item. subtract cost from character, then add to 
 # inventory.if not enough gold, raise error. same for full inv
     cost = item_data.get("cost", 0)
-    gold = character.get("gold", 0)
-    if gold < cost:
+    if character.get("gold", 0) < cost:
         raise InsufficientResourcesError("Not enough gold to purchase item.")
-    if get_inventory_space_remaining(character) <= 0:
-        raise InventoryFullError("Inventory is full.")
-    character["gold"] = gold - cost
-    add_item_to_inventory(character, item_id)
+    with transaction(character) as tx:
+        tx.add_gold(-cost)
+        tx.add_item(item_id)
+    game_events.emit("item_purchased", character=character, item_id=item_id, quantity=1)
     return True
 
 def sell_item(character, item_id, item_data):
@@ -311,10 +658,71 @@ def sell_item(character, item_id, item_data):
         raise ItemNotFoundError(f"Item {item_id} not found in inventory.")
     cost = item_data.get("cost", 0)
     sell_price = cost // 2
-    remove_item_from_inventory(character, item_id)
-    character["gold"] = character.get("gold", 0) + sell_price
+    with transaction(character) as tx:
+        tx.remove_item(item_id)
+        tx.add_gold(sell_price)
+    game_events.emit("item_sold", character=character, item_id=item_id, quantity=1)
     return sell_price
 
+def purchase_items(character, purchases, item_data_dict):
+    """
+    Buy several items at once, all or nothing
+    
+    Args:
+        character: Character dictionary
+        purchases: List of (item_id, quantity) pairs
+        item_data_dict: Dictionary of all item data
+    
+    Returns: Total gold spent
+    Raises:
+        ItemNotFoundError if an item is not sold
+        ValueError if a quantity is not positive
+        InsufficientResourcesError if not enough gold for everything
+        InventoryFullError if everything doesn't fit
+    """
+# the whole order is checked once at commit, so a failed order
+# leaves gold and inventory exactly as they were
+    total = 0
+    with transaction(character) as tx:
+        for item_id, quantity in purchases:
+            if item_id not in item_data_dict:
+                raise ItemNotFoundError(f"Item {item_id} is not for sale.")
+            if quantity < 1:
+                raise ValueError("Quantity must be at least 1.")
+            total += item_data_dict[item_id].get("cost", 0) * quantity
+            tx.add_item(item_id, quantity)
+        tx.add_gold(-total)
+    for item_id, quantity in purchases:
+        game_events.emit("item_purchased", character=character, item_id=item_id, quantity=quantity)
+    return total
+
+def sell_items(character, sales, item_data_dict):
+    """
+    Sell several items at once (half cost each), all or nothing
+    
+    Args:
+        character: Character dictionary
+        sales: List of (item_id, quantity) pairs
+        item_data_dict: Dictionary of all item data
+    
+    Returns: Total gold received
+    Raises:
+        ItemNotFoundError if the character doesn't have enough of an item
+        ValueError if a quantity is not positive
+    """
+    total = 0
+    with transaction(character) as tx:
+        for item_id, quantity in sales:
+            if quantity < 1:
+                raise ValueError("Quantity must be at least 1.")
+            cost = item_data_dict.get(item_id, {}).get("cost", 0)
+            total += (cost // 2) * quantity
+            tx.remove_item(item_id, quantity)
+        tx.add_gold(total)
+    for item_id, quantity in sales:
+        game_events.emit("item_sold", character=character, item_id=item_id, quantity=quantity)
+    return total
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -345,7 +753,12 @@ def apply_stat_effect(character, stat_name, value):
     
     Note: health cannot exceed max_health
     """
-# adding specific value to stats 
+# adding specific value to stats. strength, magic and max_health
+# are permanent boosts to the base stats, so gear stays separate
+    if stat_name in character_manager.DERIVED_STATS:
+        character_manager.change_base_stat(character, stat_name, value)
+        character_manager.refresh_stats(character)
+        return
     if stat_name not in character:
         character[stat_name] = 0
     character[stat_name] += value
@@ -354,31 +767,375 @@ def apply_stat_effect(character, stat_name, value):
         if character["health"] > max_health:
             character["health"] = max_health
 
-def display_inventory(character, item_data_dict):
+def display_inventory(character, item_data_dict, sort_by=None):
     """
     Display character's inventory in formatted way
     
     Args:
         character: Character dictionary
         item_data_dict: Dictionary of all item data
+        sort_by: One of SORT_KEYS, or None for the current order
     
     Shows item names, types, and quantities
     """
 # gets inventory list. and full databse of full items.
 #  if empty, print empty message. 
-    inventory = character.get("inventory", [])
+    inventory = get_inventory(character)
     if not inventory:
         print("Inventory is empty.")
         return
-    counts = {}
-    for item_id in inventory:
-        counts[item_id] = counts.get(item_id, 0) + 1
-    print("Inventory:")
-    for item_id, qty in counts.items():
+    if sort_by is None:
+        stacks = inventory.counts.items()
+    else:
+        stacks = sorted_stacks(character, item_data_dict, sort_by)
+    lines = ["Inventory:"]
+    for item_id, qty in stacks:
         data = item_data_dict.get(item_id, {})
         name = data.get("name", item_id)
         item_type = data.get("type", "unknown")
-        print(f"- {name} (x{qty}) [{item_type}]")
+        lines.append(f"- {name} (x{qty}) [{item_type}]")
+    print("\n".join(lines))
+
+# ============================================================================
+# CRAFTING
+# ============================================================================
+
+class RecipeBook:
+    """
+    Recipes from game_data.load_recipes, with the lookups crafting needs
+
+    uses maps each ingredient to the recipes that need it (so only
+    recipes touching a changed item get rechecked), producers maps each
+    item to the recipes that make it, and order lists items with every
+    ingredient before whatever it is used to make. The cheapest cost of
+    one of each item (buying or crafting, ignoring the inventory) is
+    worked out once, in that order.
+    """
+
+    def __init__(self, recipes, item_data_dict=None):
+        """
+        Args:
+            recipes: Dictionary of recipe data
+            item_data_dict: Item data for shop prices (and to check IDs)
+
+        Raises: InvalidDataFormatError for unknown items or recipes that
+                loop back into their own ingredients
+        """
+        self.recipes = recipes
+        self.uses = {}
+        self.producers = {}
+# a dict rather than a set so the ingredient order is the same every run
+        items = {}
+        for recipe_id, recipe in recipes.items():
+            for item_id in list(recipe["inputs"]) + [recipe["output"]]:
+                if item_data_dict is not None and item_id not in item_data_dict:
+                    raise InvalidDataFormatError(f"Recipe {recipe_id} uses unknown item {item_id}.")
+                items[item_id] = True
+            for item_id in recipe["inputs"]:
+                self.uses.setdefault(item_id, set()).add(recipe_id)
+            self.producers.setdefault(recipe["output"], []).append(recipe_id)
+        self.order = self._ingredient_order(items)
+        self.buy_prices = {}
+        if item_data_dict is not None:
+            self.buy_prices = {item_id: item_data_dict[item_id].get("cost", 0) for item_id in items}
+        self.unit_costs = {}
+        self.best_recipe = {}
+        for item_id in self.order:
+            cost = self.buy_prices.get(item_id, float("inf"))
+            best = None
+            for recipe_id in self.producers.get(item_id, ()):
+                recipe = recipes[recipe_id]
+                total = sum(self.unit_costs[i] * q for i, q in recipe["inputs"].items())
+                if total / recipe["output_quantity"] < cost:
+                    cost = total / recipe["output_quantity"]
+                    best = recipe_id
+            self.unit_costs[item_id] = cost
+            self.best_recipe[item_id] = best
+
+    def _ingredient_order(self, items):
+        """
+        Topological order of items (ingredients first)
+
+        Raises: InvalidDataFormatError if recipes form a loop
+        """
+        waiting = {item_id: 0 for item_id in items}
+        made_from = {}
+        for recipe in self.recipes.values():
+            for item_id in recipe["inputs"]:
+                made_from.setdefault(item_id, []).append(recipe["output"])
+                waiting[recipe["output"]] += 1
+        ready = [item_id for item_id, count in waiting.items() if count == 0]
+        order = []
+        while ready:
+            item_id = ready.pop()
+            order.append(item_id)
+            for output in made_from.get(item_id, ()):
+                waiting[output] -= 1
+                if waiting[output] == 0:
+                    ready.append(output)
+        if len(order) != len(items):
+            stuck = sorted(item_id for item_id, count in waiting.items() if count > 0)
+            raise InvalidDataFormatError(f"Recipes loop back on themselves: {', '.join(stuck)}")
+        return order
+
+    def can_craft(self, inventory, recipe_id, times=1):
+        """True if the inventory has every ingredient for the recipe"""
+        inputs = self.recipes[recipe_id]["inputs"]
+        return all(inventory.count(item_id) >= quantity * times for item_id, quantity in inputs.items())
+
+    def craftable(self, character):
+        """
+        Recipes the character could craft right now
+
+        The answer is kept on the inventory (one per recipe book) and
+        only the recipes that use an item whose count changed are
+        checked again.
+
+        Returns: Set of recipe IDs
+        """
+        inventory = get_inventory(character)
+        craftable = inventory.derived.setdefault(self, set())
+        changed = inventory.take_changes(self)
+        if changed is None:
+            to_check = self.recipes
+        else:
+            to_check = set()
+            for item_id in changed:
+                to_check |= self.uses.get(item_id, set())
+        for recipe_id in to_check:
+            if self.can_craft(inventory, recipe_id):
+                craftable.add(recipe_id)
+            else:
+                craftable.discard(recipe_id)
+        return set(craftable)
+
+def craft_item(character, recipe_id, recipe_book, times=1):
+    """
+    Craft a recipe, using up its ingredients
+
+    Args:
+        character: Character dictionary
+        recipe_id: Recipe to craft
+        recipe_book: RecipeBook
+        times: How many times to craft it
+
+    Returns: Tuple (output item_id, quantity made)
+    Raises:
+        ItemNotFoundError if the recipe doesn't exist or ingredients are missing
+        InventoryFullError if the result doesn't fit
+    """
+# all ingredients and outputs go through one transaction, so a failed
+# craft doesn't eat anything
+    recipe = recipe_book.recipes.get(recipe_id)
+    if recipe is None:
+        raise ItemNotFoundError(f"Unknown recipe: {recipe_id}")
+    if times < 1:
+        raise ValueError("Must craft at least once.")
+    made = recipe["output_quantity"] * times
+    with transaction(character) as tx:
+        for item_id, quantity in recipe["inputs"].items():
+            tx.remove_item(item_id, quantity * times)
+        tx.add_item(recipe["output"], made)
+    return recipe["output"], made
+
+def cheapest_path(character, item_id, recipe_book, quantity=1):
+    """
+    Plan the cheapest way to end up with quantity more of an item
+
+    Items already in the inventory are used first (they cost nothing);
+    anything else is bought or made with the recipe book's cheapest
+    choice for it (best_recipe, worked out once from shop prices).
+    Items are visited once each, in reverse ingredient order, so every
+    item's total demand is known before it is planned.
+
+    Returns: Dictionary {'gold': total cost,
+                         'use': {item_id: quantity} taken from the inventory,
+                         'buy': {item_id: quantity},
+                         'craft': [(recipe_id, times), ...] in crafting order}
+    Raises: ItemNotFoundError if the item can't be bought or crafted
+    """
+    if recipe_book.unit_costs.get(item_id, float("inf")) == float("inf"):
+        raise ItemNotFoundError(f"No way to get {item_id}.")
+    have = get_inventory(character).counts
+    plan = {"gold": 0, "use": {}, "buy": {}, "craft": []}
+    needed = {item_id: quantity}
+    for current in reversed(recipe_book.order):
+        count = needed.get(current, 0)
+        if count == 0:
+            continue
+# the target item itself is never taken from the inventory
+        owned = 0 if current == item_id else min(have.get(current, 0), count)
+        if owned:
+            plan["use"][current] = owned
+            count -= owned
+        if count == 0:
+            continue
+        recipe_id = recipe_book.best_recipe[current]
+        if recipe_id is None:
+            plan["buy"][current] = count
+            plan["gold"] += recipe_book.buy_prices[current] * count
+            continue
+        recipe = recipe_book.recipes[recipe_id]
+        times = -(-count // recipe["output_quantity"])
+        plan["craft"].append((recipe_id, times))
+        for input_id, input_quantity in recipe["inputs"].items():
+            needed[input_id] = needed.get(input_id, 0) + input_quantity * times
+    plan["craft"].reverse()
+    return plan
+
+# ============================================================================
+# SORTING AND SEARCH
+# ============================================================================
+# everything here works on the distinct items (inventory.counts), not
+# on every entry, so a 10k entry bag with a normal catalog stays fast
+
+SORT_KEYS = ("type", "name", "value", "stat")
+
+def item_sort_key(item_id, item_data_dict, sort_by):
+    """
+    Build the sort key for one item
+
+    Raises: ValueError if sort_by is not in SORT_KEYS
+    """
+    data = item_data_dict.get(item_id, {})
+    name = data.get("name", item_id).lower()
+    if sort_by == "name":
+        return (name, item_id)
+    if sort_by == "type":
+        return (data.get("type", "unknown"), name, item_id)
+    if sort_by == "value":
+        return (data.get("cost", 0), name, item_id)
+    if sort_by == "stat":
+        try:
+            stat_name, amount = parse_item_effect(data.get("effect", ""))
+        except ValueError:
+            stat_name, amount = "", 0
+        return (stat_name, -amount, name, item_id)
+    raise ValueError(f"Can't sort by {sort_by}; use one of {', '.join(SORT_KEYS)}.")
+
+def sorted_stacks(character, item_data_dict, sort_by="name", reverse=False):
+    """
+    List the distinct items in the inventory in sorted order
+
+    Returns: List of (item_id, quantity) tuples
+    Raises: ValueError for an unknown sort key
+    """
+    inventory = get_inventory(character)
+    order = sorted(inventory.counts, key=lambda item_id: item_sort_key(item_id, item_data_dict, sort_by),
+                   reverse=reverse)
+    return [(item_id, inventory.counts[item_id]) for item_id in order]
+
+def sort_inventory(character, item_data_dict, sort_by="name", reverse=False):
+    """
+    Reorder the inventory list itself, with duplicates grouped together
+
+    Returns: List of (item_id, quantity) tuples in the new order
+    Raises: ValueError for an unknown sort key
+    """
+    stacks = sorted_stacks(character, item_data_dict, sort_by, reverse)
+    get_inventory(character).regroup([item_id for item_id, _ in stacks])
+    return stacks
+
+def compact_inventory(character):
+    """
+    Merge scattered duplicates so each item sits together as stacks
+
+    Slot usage is always counted by stacks, so this only tidies the
+    order (e.g. after loading a save where duplicates are spread out).
+
+    Returns: Number of slots the inventory uses
+    """
+    inventory = get_inventory(character)
+    inventory.regroup()
+    return inventory.used_slots()
+
+NGRAM_SIZE = 3
+
+class ItemSearchIndex:
+    """
+    Name index over the item catalog for prefix and substring search
+
+    Prefix search uses bisect on the sorted lowercase names. Substring
+    search narrows the candidates down with a trigram index and only
+    checks the names that share every trigram with the query. Every 1
+    and 2 letter chunk is indexed too, so a shorter query is a single
+    lookup instead of a scan of every name.
+    """
+
+    def __init__(self, item_data_dict):
+        """Build the index from all item data"""
+        self.names = {}
+        self.sorted_names = []
+        self.ngrams = {}
+        for item_id, data in item_data_dict.items():
+            name = data.get("name", item_id).lower()
+            self.names[item_id] = name
+            self.sorted_names.append((name, item_id))
+            for size in range(1, NGRAM_SIZE + 1):
+                for gram in name_ngrams(name, size):
+                    self.ngrams.setdefault(gram, set()).add(item_id)
+        self.sorted_names.sort()
+
+    def prefix(self, query):
+        """Item IDs whose name starts with query, in name order"""
+        query = query.lower()
+        start = bisect.bisect_left(self.sorted_names, (query, ""))
+        matches = []
+        for name, item_id in self.sorted_names[start:]:
+            if not name.startswith(query):
+                break
+            matches.append(item_id)
+        return matches
+
+    def substring(self, query):
+        """Item IDs whose name contains query, in name order"""
+        query = query.lower()
+        if not query:
+            candidates = self.names
+        elif len(query) < NGRAM_SIZE:
+            # short chunks are indexed whole, so these all match
+            candidates = self.ngrams.get(query, ())
+        else:
+            candidates = None
+            for gram in name_ngrams(query):
+                ids = self.ngrams.get(gram)
+                if not ids:
+                    return []
+                candidates = set(ids) if candidates is None else candidates & ids
+        matches = [item_id for item_id in candidates if query in self.names[item_id]]
+        return sorted(matches, key=lambda item_id: (self.names[item_id], item_id))
+
+def name_ngrams(name, size=NGRAM_SIZE):
+    """Set of the size-letter chunks in a name"""
+    return {name[i:i + size] for i in range(len(name) - size + 1)}
+
+_search_index = None
+_search_index_source = None
+
+def get_search_index(item_data_dict):
+    """Return the search index for this item data, building it if needed"""
+    global _search_index, _search_index_source
+    if _search_index is None or _search_index_source is not item_data_dict:
+        _search_index = ItemSearchIndex(item_data_dict)
+        _search_index_source = item_data_dict
+    return _search_index
+
+def search_inventory(character, query, item_data_dict, prefix=False):
+    """
+    Find items in the inventory by name
+
+    Args:
+        character: Character dictionary
+        query: Text to look for (case doesn't matter)
+        item_data_dict: Dictionary of all item data
+        prefix: Match only the start of names (otherwise anywhere)
+
+    Returns: List of (item_id, quantity) tuples in name order
+    """
+    index = get_search_index(item_data_dict)
+    matches = index.prefix(query) if prefix else index.substring(query)
+    counts = get_inventory(character).counts
+    return [(item_id, counts[item_id]) for item_id in matches if item_id in counts]
 
 # ============================================================================
 # TESTING
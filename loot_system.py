@@ -0,0 +1,192 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Loot System Module
+
+Name: Kayla Bagley
+
+This module rolls item drops for defeated enemies from the loot
+tables in data/loot_tables.txt and puts them in the inventory.
+"""
+
+import random
+
+import combat_system
+import game_data
+import inventory_system
+from custom_exceptions import InvalidDataFormatError, InventoryFullError
+
+# ============================================================================
+# LOOT TABLES
+# ============================================================================
+
+LOOT_DATA_FILE = "data/loot_tables.txt"
+
+# compiled tables {table_id: (entries, probabilities, aliases, rolls)},
+# each entry is a (kind, ref, min_quantity, max_quantity) tuple
+_loot_tables = None
+
+def compile_loot_tables(table_data, item_ids=None):
+    """
+    Turn loot table data into alias tables for O(1) draws
+
+    Args:
+        table_data: Dictionary from game_data.load_loot_tables
+        item_ids: Known item IDs to check entries against (skipped if None)
+
+    Returns: Dictionary {table_id: (entries, probabilities, aliases, rolls)}
+    Raises: InvalidDataFormatError for unknown items or tables, or tables
+            that end up rolling themselves
+    """
+    compiled = {}
+    for table_id, table in table_data.items():
+        entries = []
+        weights = []
+        for entry in table["entries"]:
+            if entry["kind"] == "table" and entry["ref"] not in table_data:
+                raise InvalidDataFormatError(f"Loot table {table_id} uses unknown table {entry['ref']}.")
+            if entry["kind"] == "item" and item_ids is not None and entry["ref"] not in item_ids:
+                raise InvalidDataFormatError(f"Loot table {table_id} drops unknown item {entry['ref']}.")
+            entries.append((entry["kind"], entry["ref"], entry["min_quantity"], entry["max_quantity"]))
+            weights.append(entry["weight"])
+        probabilities, aliases = combat_system.build_alias_table(weights)
+        compiled[table_id] = (tuple(entries), probabilities, aliases, table["rolls"])
+    check_for_cycles(compiled)
+    return compiled
+
+def check_for_cycles(compiled):
+    """
+    Make sure no table ends up rolling itself through TABLE: entries
+
+    Raises: InvalidDataFormatError naming a table in the cycle
+    """
+# depth first search; a table seen again while it is still being
+# visited means a loop
+    visiting = set()
+    done = set()
+    for start in compiled:
+        if start in done:
+            continue
+        stack = [(start, iter(compiled[start][0]))]
+        visiting.add(start)
+        while stack:
+            table_id, entries = stack[-1]
+            for kind, ref, _, _ in entries:
+                if kind != "table" or ref in done:
+                    continue
+                if ref in visiting:
+                    raise InvalidDataFormatError(f"Loot table {ref} ends up rolling itself.")
+                visiting.add(ref)
+                stack.append((ref, iter(compiled[ref][0])))
+                break
+            else:
+                stack.pop()
+                visiting.discard(table_id)
+                done.add(table_id)
+
+def load_loot_tables(filename=LOOT_DATA_FILE, item_ids=None):
+    """
+    Load and compile the loot tables
+
+    Returns: Compiled tables (see compile_loot_tables)
+    Raises: MissingDataFileError, InvalidDataFormatError, CorruptedDataError
+    """
+    global _loot_tables
+    _loot_tables = compile_loot_tables(game_data.load_loot_tables(filename), item_ids)
+    return _loot_tables
+
+def get_loot_tables():
+    """Return the compiled loot tables, loading them on first use"""
+    if _loot_tables is None:
+        return load_loot_tables()
+    return _loot_tables
+
+# ============================================================================
+# ROLLING LOOT
+# ============================================================================
+
+def draw_entry(table_id, rng=random, tables=None):
+    """
+    Draw one entry from a table (without following TABLE: entries)
+
+    Returns: (kind, ref, min_quantity, max_quantity) tuple
+    Raises: KeyError if the table doesn't exist
+    """
+    entries, probabilities, aliases, _ = (tables or get_loot_tables())[table_id]
+    return entries[combat_system.alias_draw(probabilities, aliases, rng)]
+
+def roll_loot(table_id, rng=random, tables=None):
+    """
+    Roll every drop from a loot table
+
+    Nested tables are rolled (with their own ROLLS) when drawn.
+
+    Args:
+        table_id: Table to roll, usually the enemy type
+        rng: Random number generator (random module by default)
+        tables: Compiled tables (the loaded tables if None)
+
+    Returns: Dictionary {item_id: quantity}, empty if nothing dropped or
+             there is no table with that ID
+    """
+    if tables is None:
+        tables = get_loot_tables()
+    drops = {}
+    if table_id not in tables:
+        return drops
+    pending = [table_id]
+    while pending:
+        entries, probabilities, aliases, rolls = tables[pending.pop()]
+        for _ in range(rolls):
+            kind, ref, low, high = entries[combat_system.alias_draw(probabilities, aliases, rng)]
+            if kind == "item":
+                quantity = low if low == high else rng.randint(low, high)
+                drops[ref] = drops.get(ref, 0) + quantity
+            elif kind == "table":
+                pending.append(ref)
+    return drops
+
+def award_loot(character, drops):
+    """
+    Put dropped items into the character's inventory
+
+    Items are added one at a time with add_item_to_inventory; whatever
+    doesn't fit is left behind instead of raising.
+
+    Returns: Tuple (awarded, overflow), both {item_id: quantity}
+    """
+    awarded = {}
+    overflow = {}
+    for item_id, quantity in drops.items():
+        for added in range(quantity):
+            try:
+                inventory_system.add_item_to_inventory(character, item_id)
+            except InventoryFullError:
+                overflow[item_id] = quantity - added
+                break
+            awarded[item_id] = awarded.get(item_id, 0) + 1
+    return awarded, overflow
+
+def grant_battle_loot(character, enemy, rng=random):
+    """
+    Roll and award the loot for a defeated enemy
+
+    Returns: Dictionary {'loot': {item_id: quantity},
+                         'overflow': {item_id: quantity}}
+    """
+    drops = roll_loot(enemy.get("type", ""), rng)
+    awarded, overflow = award_loot(character, drops)
+    return {"loot": awarded, "overflow": overflow}
+
+def format_loot(loot):
+    """Turn {item_id: quantity} into text like 'health_potion x2, iron_sword'"""
+    return ", ".join(item_id if quantity == 1 else f"{item_id} x{quantity}" for item_id, quantity in loot.items())
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=== LOOT SYSTEM TEST ===")
+
+    # for _ in range(5):
+    #     print(roll_loot("orc"))
@@ -15,7 +15,12 @@ import character_manager
 import inventory_system
 import quest_handler
 import combat_system
+import encounter_system
 import game_data
+import shop_system
+import loot_system
+import bank_storage
+import game_events
 from custom_exceptions import *
 
 # ============================================================================
@@ -26,8 +31,19 @@ from custom_exceptions import *
 current_character = None
 all_quests = {}
 all_items = {}
+recipe_book = None
+bank = None
+quest_tracker = None
+objective_tracker = None
 game_running = False
 
+# fights the character wins at least this often are settled without
+# playing every turn (set above 1.0 to always fight manually)
+AUTO_RESOLVE_THRESHOLD = 0.99
+outcome_cache = encounter_system.OutcomeCache()
+shop_catalog = shop_system.ShopCatalog()
+shop_pricing = shop_system.PricingEngine()
+
 # ============================================================================
 # MAIN MENU
 # ============================================================================
@@ -96,6 +112,10 @@ def load_game():
         selected_name = saved_names[idx - 1]
         try:
             current_character = character_manager.load_character(selected_name)
+# the completed-quest count and reward totals are worked out once here
+# and kept up to date after
+            quest_handler.get_quest_set(current_character, "completed_quests").stats_for(all_quests)
+            quest_handler.get_quest_rewards(current_character, all_quests)
             print(f"\nLoaded {current_character['name']} the {current_character['class']}.")
             game_loop()
         except CharacterNotFoundError:
@@ -120,6 +140,7 @@ def game_loop():
     global game_running, current_character
     
     game_running = True
+    get_objective_tracker()
     
     while game_running and current_character is not None:
         choice = game_menu()
@@ -134,11 +155,16 @@ def game_loop():
         elif choice == 5:
             shop()
         elif choice == 6:
+            bank_menu()
+        elif choice == 7:
             save_game()
             print("Game saved. Returning to main menu.")
             game_running = False
         else:
-            print("Invalid choice. Please select 1-6.")
+            print("Invalid choice. Please select 1-7.")
+        if game_running:
+            advance_game_turn()
+        announce_finished_quests()
 
 def game_menu():
     """
@@ -150,8 +176,9 @@ def game_menu():
     print("3. Quest Menu")
     print("4. Explore (Find Battles)")
     print("5. Shop")
-    print("6. Save and Quit")
-    choice = input("Choose an option (1-6): ").strip()
+    print("6. Bank")
+    print("7. Save and Quit")
+    choice = input("Choose an option (1-7): ").strip()
     try:
         return int(choice)
     except ValueError:
@@ -180,6 +207,10 @@ def view_character_stats():
     print(f"MAG:    {c.get('magic')}")
     print(f"XP:     {c.get('experience')}")
     print(f"Gold:   {c.get('gold')}")
+    weapon = inventory_system.get_equipped(c, "weapon")
+    armor = inventory_system.get_equipped(c, "armor")
+    print(f"Weapon: {all_items.get(weapon, {}).get('name', weapon) if weapon else 'None'}")
+    print(f"Armor:  {all_items.get(armor, {}).get('name', armor) if armor else 'None'}")
     active = c.get("active_quests", [])
     completed = c.get("completed_quests", [])
     print("\nActive Quests:")
@@ -206,18 +237,45 @@ def view_inventory():
     if current_character is None:
         print("No character loaded.")
         return
+    sort_by = None
     while True:
         print("\n=== INVENTORY ===")
-        inventory_system.display_inventory(current_character, all_items)
+        inventory_system.display_inventory(current_character, all_items, sort_by)
         print("\nInventory Options:")
         print("1. Use Item")
         print("2. Equip Weapon")
         print("3. Equip Armor")
         print("4. Drop Item")
-        print("5. Back")
-        choice = input("Choose an option (1-5): ").strip()
-        if choice == "5":
+        print("5. Sort Items")
+        print("6. Search Items")
+        print("7. Craft Item")
+        print("8. Recommend Equipment")
+        print("9. Back")
+        choice = input("Choose an option (1-9): ").strip()
+        if choice == "9":
             break
+        if choice == "8":
+            show_equipment_recommendations()
+            continue
+        if choice == "7":
+            craft_menu()
+            continue
+        if choice == "5":
+            sort_by = input(f"Sort by ({'/'.join(inventory_system.SORT_KEYS)}): ").strip().lower()
+            if sort_by not in inventory_system.SORT_KEYS:
+                print("Unknown sort option.")
+                sort_by = None
+            else:
+                inventory_system.sort_inventory(current_character, all_items, sort_by)
+            continue
+        if choice == "6":
+            query = input("Search for: ").strip()
+            matches = inventory_system.search_inventory(current_character, query, all_items)
+            if not matches:
+                print("No matching items.")
+            for item_id, qty in matches:
+                print(f"- {all_items.get(item_id, {}).get('name', item_id)} ({item_id}) x{qty}")
+            continue
         item_id = input("Enter item ID: ").strip()
         if item_id not in all_items:
             print("Unknown item ID.")
@@ -247,6 +305,55 @@ def view_inventory():
         except InsufficientResourcesError as e:
             print(e)
 
+def show_equipment_recommendations():
+    """Rank the weapons and armor in the inventory for the current level"""
+# uses the same outcome cache as exploring, so asking again is instant
+    ranked = encounter_system.recommend_equipment(current_character, all_items, outcome_cache)
+    if not ranked:
+        print("You have no weapons or armor to compare.")
+        return
+    print("\nBest gear against the enemies at your level:")
+    for option in ranked:
+        name = all_items.get(option["item_id"], {}).get("name", option["item_id"])
+        worn = " (equipped)" if option["equipped"] else ""
+        print(f"- [{option['slot']}] {name}{worn}: wins {option['win_rate']:.0%}, "
+              f"about {option['hp_left']:.0f} HP left")
+
+def craft_menu():
+    """Show what can be crafted and craft a recipe"""
+# recipes the character can't make yet show the cheapest way to get
+# the result instead
+    if recipe_book is None:
+        print("No recipes loaded.")
+        return
+    craftable = sorted(recipe_book.craftable(current_character))
+    print("\nYou can craft:" if craftable else "\nYou can't craft anything right now.")
+    for recipe_id in craftable:
+        recipe = recipe_book.recipes[recipe_id]
+        print(f"- {recipe_id}: {recipe['output']} x{recipe['output_quantity']}")
+    recipe_id = input("Enter recipe ID (blank to cancel): ").strip()
+    if not recipe_id:
+        return
+    if recipe_id not in recipe_book.recipes:
+        print("Unknown recipe.")
+        return
+    try:
+        if recipe_id in craftable:
+            output, made = inventory_system.craft_item(current_character, recipe_id, recipe_book)
+            print(f"Crafted {all_items.get(output, {}).get('name', output)} x{made}.")
+        else:
+            output = recipe_book.recipes[recipe_id]["output"]
+            plan = inventory_system.cheapest_path(current_character, output, recipe_book)
+            print(f"Missing ingredients. Cheapest way to get {output}: {plan['gold']} gold")
+            for item_id, qty in plan["buy"].items():
+                print(f"  buy {item_id} x{qty}")
+            for step, times in plan["craft"]:
+                print(f"  craft {step} x{times}")
+    except ItemNotFoundError as e:
+        print(e)
+    except InventoryFullError as e:
+        print(e)
+
 def quest_menu():
     """Quest management menu"""
 # MANAGES quest lists stored on character. show active/available/completed quests.
@@ -263,8 +370,9 @@ def quest_menu():
         print("4. Accept Quest")
         print("5. Abandon Quest")
         print("6. Complete Quest (for testing)")
-        print("7. Back")
-        choice = input("Choose an option (1-7): ").strip()
+        print("7. Plan a Route")
+        print("8. Back")
+        choice = input("Choose an option (1-8): ").strip()
         c = current_character
         active = c.get("active_quests", [])
         completed = c.get("completed_quests", [])
@@ -276,20 +384,19 @@ def quest_menu():
                 for qid in active:
                     q = all_quests.get(qid, {})
                     title = q.get("title", qid)
-                    print(f"  - {title} ({qid})")
+                    progress = get_objective_tracker().describe(qid)
+                    left = quest_handler.get_quest_time_left(c, qid)
+                    if left is not None:
+                        progress = f"{progress}, {left} turns left" if progress else f"{left} turns left"
+                    print(f"  - {title} ({qid})" + (f" - {progress}" if progress else ""))
         elif choice == "2":
             print("\nAvailable Quests:")
-            available = []
-            for qid, q in all_quests.items():
-                if qid in active or qid in completed:
-                    continue
-                if c.get("level", 1) >= q.get("required_level", 1):
-                    available.append((qid, q))
+            available = get_quest_tracker().available_quests()
             if not available:
                 print("  None")
             else:
-                for qid, q in available:
-                    print(f"  - {q.get('title', qid)} ({qid})")
+                for q in available:
+                    print(f"  - {q.get('title', q['quest_id'])} ({q['quest_id']})")
         elif choice == "3":
             print("\nCompleted Quests:")
             if not completed:
@@ -301,60 +408,114 @@ def quest_menu():
                     print(f"  - {title} ({qid})")
         elif choice == "4":
             qid = input("Enter quest ID to accept: ").strip()
-            if qid not in all_quests:
+            try:
+                if quest_handler.accept_quest(c, qid, all_quests):
+                    print(f"Accepted quest: {all_quests[qid].get('title', qid)}")
+                else:
+                    print("Quest already active.")
+            except QuestNotFoundError:
                 print("Quest not found.")
-                continue
-            if qid in active:
-                print("Quest already active.")
-                continue
-            if qid in completed:
+            except QuestAlreadyCompletedError:
                 print("Quest already completed.")
-                continue
-            quest = all_quests[qid]
-            required = quest.get("required_level", 1)
-            if c.get("level", 1) < required:
+            except InsufficientLevelError:
                 print("Level too low for this quest.")
-                continue
-            active.append(qid)
-            c["active_quests"] = active
-            print(f"Accepted quest: {quest.get('title', qid)}")
+            except QuestRequirementsNotMetError as e:
+                print(e)
         elif choice == "5":
             qid = input("Enter quest ID to abandon: ").strip()
-            if qid not in active:
+            try:
+                quest_handler.abandon_quest(c, qid)
+                print(f"Abandoned quest: {qid}")
+            except QuestNotActiveError:
                 print("Quest is not active.")
-                continue
-            active.remove(qid)
-            c["active_quests"] = active
-            print(f"Abandoned quest: {qid}")
         elif choice == "6":
             qid = input("Enter quest ID to complete (testing): ").strip()
-            if qid not in active:
+            try:
+                rewards = quest_handler.complete_quest(c, qid, all_quests)
+                print(f"Completed quest: {all_quests[qid].get('title', qid)}. Gained {rewards['xp']} XP and {rewards['gold']} gold.")
+            except QuestNotActiveError:
                 print("Quest must be active to complete.")
-                continue
-            quest = all_quests.get(qid)
-            if quest is None:
+            except QuestNotFoundError:
                 print("Quest not found in data.")
-                continue
-            active.remove(qid)
-            completed.append(qid)
-            c["active_quests"] = active
-            c["completed_quests"] = completed
-            xp = quest.get("reward_xp", 0)
-            gold = quest.get("reward_gold", 0)
-            try:
-                character_manager.gain_experience(c, xp)
             except CharacterDeadError:
                 print("Cannot gain experience when dead.")
-            try:
-                character_manager.add_gold(c, gold)
-            except ValueError:
-                print("Error adding gold.")
-            print(f"Completed quest: {quest.get('title', qid)}. Gained {xp} XP and {gold} gold.")
         elif choice == "7":
+            plan_route()
+        elif choice == "8":
             break
         else:
             print("Invalid choice.")
 
+def plan_route():
+    """Show the quickest quest route to a level or a quest"""
+    target = input("Target level or quest ID: ").strip()
+    try:
+        if target.isdigit():
+            plan = quest_handler.plan_quests(current_character, all_quests, target_level=int(target))
+        else:
+            plan = quest_handler.plan_quests(current_character, all_quests, target_quest=target)
+    except QuestNotFoundError:
+        print("Quest not found.")
+        return
+    except QuestRequirementsNotMetError as e:
+        print(e)
+        return
+    if not plan["steps"]:
+        print("You're already there!")
+        return
+    print("\nRoute:")
+    for kind, value in plan["steps"]:
+        if kind == "quest":
+            print(f"  - {all_quests[value].get('title', value)} ({value})")
+        else:
+            print(f"  - Fight enemies for {value} XP")
+    print(f"Ends at level {plan['level']} after {len(plan['quests'])} quests and {plan['fight_xp']} XP from fights.")
+    if not plan["optimal"]:
+        print("(Quick estimate - a shorter route may exist.)")
+
+def get_objective_tracker():
+    """Objective tracker for the current character"""
+# started when the game loop starts so kills count before the quest
+# menu is ever opened
+    global objective_tracker
+    tracker = objective_tracker
+    if tracker is None or tracker.character is not current_character or tracker.quest_data is not all_quests:
+        if tracker is not None:
+            tracker.detach()
+        objective_tracker = quest_handler.ObjectiveTracker(current_character, all_quests)
+        objective_tracker.attach()
+    return objective_tracker
+
+def announce_finished_quests():
+    """Print quests that completed themselves through their objectives"""
+    if objective_tracker is None:
+        return
+    for qid, rewards in objective_tracker.take_finished():
+        title = all_quests.get(qid, {}).get("title", qid)
+        print(f"\nQuest complete: {title}! Gained {rewards['xp']} XP and {rewards['gold']} gold.")
+
+def advance_game_turn():
+    """Move the game clock one turn and report timed and repeatable quests"""
+# only the timers that are due get looked at, not every quest
+    for kind, qid in quest_handler.advance_quest_time(current_character, all_quests):
+        title = all_quests.get(qid, {}).get("title", qid)
+        if kind == "expired":
+            print(f"\nQuest failed: {title} ran out of time.")
+        else:
+            print(f"\nQuest available again: {title}")
+
+def get_quest_tracker():
+    """Available-quest tracker for the current character"""
+# one tracker at a time; a new or loaded character gets a fresh one
+    global quest_tracker
+    tracker = quest_tracker
+    if tracker is None or tracker.character is not current_character or tracker.quest_data is not all_quests:
+        if tracker is not None:
+            tracker.detach()
+        quest_tracker = quest_handler.QuestAvailability(current_character, all_quests)
+        quest_tracker.attach()
+    return quest_tracker
+
 def explore():
     """Find and fight random enemies"""
 # trigger a random emnemy to go through combat_system. 
@@ -367,13 +528,15 @@ def explore():
     level = current_character.get("level", 1)
     enemy = combat_system.get_random_enemy_for_level(level)
     print(f"You encounter a {enemy['name']}!")
-    battle = combat_system.SimpleBattle(current_character, enemy)
-    try:
-        result = battle.start_battle()
-    except CharacterDeadError:
-        print("You are too injured to fight.")
-        handle_character_death()
-        return
+    result = auto_resolve_battle(current_character, enemy)
+    if result is None:
+        battle = combat_system.SimpleBattle(current_character, enemy)
+        try:
+            result = battle.start_battle()
+        except CharacterDeadError:
+            print("You are too injured to fight.")
+            handle_character_death()
+            return
     winner = result.get("winner")
     xp_gained = result.get("xp_gained", 0)
     gold_gained = result.get("gold_gained", 0)
@@ -391,41 +554,87 @@ def explore():
                 print(f"Gained {gold_gained} gold.")
             except ValueError:
                 print("Error adding gold.")
+        if result.get("loot"):
+            print(f"Found: {loot_system.format_loot(result['loot'])}")
+        if result.get("overflow"):
+            print(f"No room for: {loot_system.format_loot(result['overflow'])} (left behind)")
     elif winner == "enemy":
         print(f"The {enemy['name']} defeated you...")
         handle_character_death()
     else:
         print("The battle ended without a clear winner.")
 
+def auto_resolve_battle(character, enemy):
+    """
+    Settle a fight without playing it out if the outcome is near certain
+    
+    Returns: Battle result dictionary like SimpleBattle.start_battle, or
+             None if the fight should be played normally
+    """
+# asks the outcome cache how this matchup usually goes. only sure
+# wins are skipped; the character still loses the expected health.
+    if character.get("health", 0) <= 0:
+        return None
+    outcome = outcome_cache.lookup(character, enemy["type"])
+    if outcome["win_rate"] < AUTO_RESOLVE_THRESHOLD:
+        return None
+    hp_loss = int(round(outcome["avg_hp_loss"]))
+    character["health"] = max(1, character["health"] - hp_loss)
+    enemy["health"] = 0
+    print(f"The {enemy['name']} is no match for you. (Auto-resolved, lost {hp_loss} HP)")
+    rewards = combat_system.get_victory_rewards(enemy)
+    drops = loot_system.grant_battle_loot(character, enemy)
+    game_events.emit("enemy_defeated", character=character, enemy_type=enemy["type"])
+    return {"winner": "player", "xp_gained": rewards["xp"], "gold_gained": rewards["gold"],
+            "loot": drops["loot"], "overflow": drops["overflow"]}
+
 def shop():
     """Shop menu for buying/selling items"""
 # uses item data to show items for sale, relies on inventory 
 # system. handle purchases and errors, like insuffient funds or full inventory.
+# items come from the shop catalog a page at a time, with optional filters
     global current_character, all_items
     if current_character is None:
         print("No character loaded.")
         return
+# prices move once per visit, from everything bought and sold since
+    shop_pricing.tick()
+    shop_catalog.reprice(shop_pricing.changed_items)
+    filters = {}
+    page = 1
     while True:
+        result = shop_catalog.query(page=page, **filters)
+        if page > result["pages"]:
+            page = result["pages"]
+            continue
         print("\n=== SHOP ===")
         print(f"Your gold: {current_character.get('gold', 0)}")
-        print("\nItems for sale:")
-        for item_id, data in all_items.items():
-            name = data.get("name", item_id)
-            cost = data.get("cost", 0)
-            item_type = data.get("type", "unknown")
-            print(f"- {item_id}: {name} [{item_type}] - {cost} gold")
+        print("\n" + shop_system.format_catalog_page(result, shop_pricing))
         print("\nShop Options:")
         print("1. Buy Item")
         print("2. Sell Item")
-        print("3. Back")
-        choice = input("Choose an option (1-3): ").strip()
-        if choice == "3":
+        print("3. Next Page")
+        print("4. Previous Page")
+        print("5. Filter Items")
+        print("6. Back")
+        choice = input("Choose an option (1-6): ").strip()
+        if choice == "6":
             break
+        if choice == "3":
+            page = min(page + 1, result["pages"])
+            continue
+        if choice == "4":
+            page = max(page - 1, 1)
+            continue
+        if choice == "5":
+            filters = ask_shop_filters()
+            page = 1
+            continue
         item_id = input("Enter item ID: ").strip()
         if item_id not in all_items:
             print("Unknown item ID.")
             continue
-        data = all_items[item_id]
+        data = shop_pricing.priced(item_id, all_items[item_id])
         try:
             if choice == "1":
                 inventory_system.purchase_item(current_character, item_id, data)
@@ -442,10 +651,87 @@ def shop():
         except ItemNotFoundError as e:
             print(e)
 
+def ask_shop_filters():
+    """
+    Ask which items the shop should show
+
+    Returns: Dictionary of ShopCatalog.query filters (blank answers are left out)
+    """
+    filters = {}
+    item_type = input("Item type (weapon/armor/consumable, blank for any): ").strip().lower()
+    if item_type:
+        filters["item_type"] = item_type
+    stat = input("Stat affected (e.g. strength, blank for any): ").strip().lower()
+    if stat:
+        filters["stat"] = stat
+    max_cost = input("Most you want to spend (blank for no limit): ").strip()
+    if max_cost.isdigit():
+        filters["max_cost"] = int(max_cost)
+    return filters
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+def bank_menu():
+    """Deposit and withdraw items from the shared bank"""
+# the bank is opened once; pages load as you look at them and are
+# written when the game is saved
+    global bank
+    if current_character is None:
+        print("No character loaded.")
+        return
+    if bank is None:
+        try:
+            bank = bank_storage.Bank()
+        except (SaveFileCorruptedError, InvalidSaveDataError) as e:
+            print(f"The bank can't be opened: {e}")
+            return
+    page = 0
+    while True:
+        print("\n=== BANK ===")
+        pages = bank.page_count()
+        if pages == 0:
+            print("The bank is empty.")
+        else:
+            print(f"Page {page + 1} of {pages}:")
+            for item_id, qty in bank.view_page(page):
+                print(f"- {all_items.get(item_id, {}).get('name', item_id)} ({item_id}) x{qty}")
+        print("\nBank Options:")
+        print("1. Deposit Item")
+        print("2. Withdraw Item")
+        print("3. Next Page")
+        print("4. Previous Page")
+        print("5. Back")
+        choice = input("Choose an option (1-5): ").strip()
+        if choice == "5":
+            break
+        if choice == "3":
+            page = min(page + 1, max(pages - 1, 0))
+            continue
+        if choice == "4":
+            page = max(page - 1, 0)
+            continue
+        if choice not in ("1", "2"):
+            print("Invalid choice.")
+            continue
+        item_id = input("Enter item ID: ").strip()
+        amount = input("How many? (default 1): ").strip()
+        quantity = int(amount) if amount.isdigit() else 1
+        try:
+            if choice == "1":
+                bank.deposit(current_character, item_id, quantity)
+                print(f"Deposited {quantity} {item_id}.")
+            else:
+                bank.withdraw(current_character, item_id, quantity)
+                print(f"Withdrew {quantity} {item_id}.")
+        except ValueError as e:
+            print(e)
+        except ItemNotFoundError as e:
+            print(e)
+        except InventoryFullError as e:
+            print(e)
+
 def save_game():
     """Save current game state"""
 # file writing for character_maanager.save_character.
@@ -457,6 +743,8 @@ def save_game():
         return
     try:
         character_manager.save_character(current_character)
+        if bank is not None:
+            bank.flush()
         print("Game saved successfully.")
     except PermissionError:
         print("Permission error: could not save game.")
@@ -466,9 +754,19 @@ def save_game():
 def load_game_data():
     """Load all quest and item data from files"""
 # assume all quests and items are ready to be loaded.
-    global all_quests, all_items
+    global all_quests, all_items, recipe_book
     all_quests = game_data.load_quests()
+# building the quest graph now catches prerequisite loops before they can hang a menu
+    quest_handler.get_quest_graph(all_quests)
     all_items = game_data.load_items()
+    recipe_book = inventory_system.RecipeBook(game_data.load_recipes(), all_items)
+    inventory_system.register_stack_limits(all_items)
+    shop_catalog.update(all_items)
+    shop_pricing.update(all_items)
+    shop_catalog.use_pricing(shop_pricing)
+    shop_pricing.attach()
+    combat_system.load_enemy_catalog()
+    loot_system.load_loot_tables(item_ids=all_items)
 
 def handle_character_death():
     """Handle character death"""
@@ -0,0 +1,337 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Quest Analyzer Module
+
+Name: Kayla Bagley
+
+This module checks the quest data offline for the content team: which
+quests can be reached, the lowest level each one opens at, where quest
+rewards run out before the next required level, standalone quests, the
+longest chains, and dead content nobody can reach.
+
+Usage (from the project folder):
+    python quest_analyzer.py [quests_file] [max_level] [report_file]
+
+Prints a summary; the report file (if given) also lists every quest.
+"""
+
+import bisect
+import heapq
+import sys
+
+import game_data
+import quest_handler
+
+# ============================================================================
+# QUEST ANALYSIS
+# ============================================================================
+# every step here is one pass over the quests and their prerequisite
+# options (plus one pass over the levels up to max_level), so it takes
+# linear time and stays quick on catalogs with thousands of quests.
+# Unlike QuestGraph it doesn't raise on prerequisite loops, it reports
+# them.
+
+DEFAULT_MAX_LEVEL = 50
+LONGEST_CHAINS = 5
+
+
+def analyze_quests(quest_data_dict, max_level=DEFAULT_MAX_LEVEL, character_class=None):
+    """
+    Work out reachability, levels, XP gaps, chains and dead content
+
+    Args:
+        quest_data_dict: Dictionary from game_data.load_quests
+        max_level: Highest level a character is expected to reach
+        character_class: Only count quests this class can take (None
+                         ignores REQUIRED_CLASS)
+
+    Returns: Dictionary with:
+        reachable: quest IDs that can be reached, prerequisites first
+        min_level: {quest_id: lowest level it opens at} for reachable
+                   quests: its required level, or the level a fresh
+                   character reaches from the reward XP along its
+                   prerequisite path (no fights), whichever is higher
+        path_xp: {quest_id: reward XP from that prerequisite path}
+        fight_xp: {quest_id: XP from fights needed before it opens} when
+                  every quest is done as soon as it can be
+        gaps: list of (level, next_level, fight_xp) where quest rewards
+              ran out before the next required level
+        final_level: level after every reachable quest (and those fights)
+        dead: {quest_id: reason} for quests that can't be reached
+        missing: {quest_id: [prerequisite IDs that aren't in the data]}
+        orphans: quests with no prerequisite that nothing needs
+        chains: longest prerequisite chains (lists of quest IDs)
+    Raises: InvalidDataFormatError if a prerequisite can't be parsed
+    """
+    options = {}
+    unlocks = {qid: [] for qid in quest_data_dict}
+    missing = {}
+# watchers maps a quest to the (quest, option number) pairs it counts toward
+    watchers = {}
+    for qid, quest in quest_data_dict.items():
+        options[qid] = game_data.parse_prerequisites(quest.get("prerequisite"))
+        mentioned = set()
+        for i, option in enumerate(options[qid]):
+            for prereq in option:
+                watchers.setdefault(prereq, []).append((qid, i))
+                if prereq in mentioned:
+                    continue
+                mentioned.add(prereq)
+                if prereq in unlocks:
+                    unlocks[prereq].append(qid)
+                else:
+                    missing.setdefault(qid, []).append(prereq)
+
+    blocked = {}
+    for qid, quest in quest_data_dict.items():
+        required = quest.get("required_level", 1)
+        if required > max_level:
+            blocked[qid] = f"required level {required} is above the max level ({max_level})"
+        elif character_class and quest.get("required_class") not in (None, character_class):
+            blocked[qid] = f"only for {quest['required_class']}"
+
+# quests are settled lowest level first, in one bucket per level (levels
+# only go up along a path, so each bucket is final once it's reached).
+# Each option counts down its unsettled prerequisites and offers the
+# quest a level when it reaches zero, so a loop in one option doesn't
+# hide a quest another option opens. An option's level covers the
+# levels of its prerequisites and the reward XP along the longest of
+# their paths.
+    thresholds = []
+    total = 0
+    for level in range(1, max_level):
+        total += level * 100
+        thresholds.append(total)
+
+    def xp_level(xp):
+        return bisect.bisect_right(thresholds, xp) + 1
+
+    left = {qid: [len(option) for option in quest_options] for qid, quest_options in options.items()}
+    buckets = [[] for _ in range(max_level + 1)]
+    for qid, quest in quest_data_dict.items():
+        if not options[qid] and qid not in blocked:
+            buckets[quest.get("required_level", 1)].append((qid, 0, 1, None))
+    min_level = {}
+    path_xp = {}
+    depth = {}
+    parent = {}
+    reachable = []
+    for level in range(1, max_level + 1):
+# quests settled at this level can offer more to the same bucket
+        for qid, xp, length, deepest in buckets[level]:
+            if qid in min_level:
+                continue
+            min_level[qid], path_xp[qid], depth[qid], parent[qid] = level, xp, length, deepest
+            reachable.append(qid)
+            for dependent, i in watchers.get(qid, ()):
+                left[dependent][i] -= 1
+                if left[dependent][i] or dependent in min_level or dependent in blocked:
+                    continue
+                option = options[dependent][i]
+                xp = max(path_xp[p] + quest_data_dict[p].get("reward_xp", 0) for p in option)
+                deepest = max(option, key=depth.__getitem__)
+                required = quest_data_dict[dependent].get("required_level", 1)
+# qid settled last, so no prerequisite in the option has a higher level
+                offer = max(required, level, xp_level(xp))
+                buckets[offer].append((dependent, xp, depth[deepest] + 1, deepest))
+        buckets[level] = []
+
+# dead content: blocked quests and quests whose every option needs a
+# missing or dead quest; whatever is left can only be stuck in a loop
+    dead = {}
+    dead_options = {}
+    queue = []
+    for qid in quest_data_dict:
+        if qid in min_level:
+            continue
+        if qid in blocked:
+            dead[qid] = blocked[qid]
+            queue.append(qid)
+            continue
+        dead_options[qid] = {i for i, option in enumerate(options[qid]) if any(p not in unlocks for p in option)}
+        if len(dead_options[qid]) == len(options[qid]):
+            dead[qid] = f"missing prerequisite {missing[qid][0]}"
+            queue.append(qid)
+    for qid in queue:
+        for dependent, i in watchers.get(qid, ()):
+            if dependent in dead or dependent in min_level:
+                continue
+            dead_options[dependent].add(i)
+            if len(dead_options[dependent]) == len(options[dependent]):
+                dead[dependent] = f"needs {qid}, which can't be reached"
+                queue.append(dependent)
+    for qid in quest_data_dict:
+        if qid not in min_level and qid not in dead:
+            dead[qid] = "prerequisites loop back on themselves"
+    dead = {qid: dead[qid] for qid in quest_data_dict if qid in dead}
+
+    fight_xp, gaps, final_level = simulate_quest_xp(quest_data_dict, reachable, options, max_level)
+
+    orphans = [qid for qid in quest_data_dict if not options[qid] and not unlocks[qid]]
+    extended = {parent[qid] for qid in reachable if parent[qid] is not None}
+# file order, so chains of the same length come out in a stable order
+    ends = [qid for qid in quest_data_dict if qid in depth and qid not in extended and depth[qid] > 1]
+    chains = []
+    for qid in heapq.nlargest(LONGEST_CHAINS, ends, key=depth.__getitem__):
+        chain = []
+        while qid is not None:
+            chain.append(qid)
+            qid = parent[qid]
+        chains.append(chain[::-1])
+
+    return {
+        "quests": len(quest_data_dict),
+        "max_level": max_level,
+        "reachable": reachable,
+        "min_level": min_level,
+        "path_xp": path_xp,
+        "fight_xp": fight_xp,
+        "gaps": gaps,
+        "final_level": final_level,
+        "dead": dead,
+        "missing": missing,
+        "orphans": orphans,
+        "chains": chains
+    }
+
+
+def simulate_quest_xp(quest_data_dict, reachable, options, max_level):
+    """
+    Play a fresh level 1 character through every reachable quest,
+    fighting only when no quest is open until the next required level
+
+    Doing a quest never hurts, so this is the least fighting needed
+    before each quest opens.
+
+    Returns: Tuple ({quest_id: fight XP before it opens}, gaps, final level)
+    """
+# watchers maps a quest to the (quest, option number) pairs it counts toward
+    left = {}
+    watchers = {}
+    for qid in reachable:
+        left[qid] = [len(option) for option in options[qid]]
+        for i, option in enumerate(options[qid]):
+            for prereq in option:
+                watchers.setdefault(prereq, []).append((qid, i))
+    buckets = [[] for _ in range(max_level + 1)]
+    ready = []
+    unlocked = set()
+    opened = {}
+    level, experience, fought = 1, 0, 0
+    gaps = []
+
+    def open_quest(qid):
+        unlocked.add(qid)
+        required = quest_data_dict[qid].get("required_level", 1)
+        if required <= level:
+            opened[qid] = fought
+            ready.append(qid)
+        else:
+            buckets[required].append(qid)
+
+    def release(old_level, new_level):
+        for bucket_level in range(old_level + 1, min(new_level, max_level) + 1):
+            for qid in buckets[bucket_level]:
+                opened[qid] = fought
+                ready.append(qid)
+            buckets[bucket_level] = []
+
+    for qid in reachable:
+        if not options[qid]:
+            open_quest(qid)
+    gate = level
+    while True:
+        while ready:
+            qid = ready.pop()
+            old_level = level
+            level, experience = quest_handler.add_planned_xp(level, experience, quest_data_dict[qid].get("reward_xp", 0))
+            release(old_level, level)
+            for dependent, i in watchers.get(qid, ()):
+                if dependent in unlocked:
+                    continue
+                left[dependent][i] -= 1
+                if left[dependent][i] == 0:
+                    open_quest(dependent)
+# quest rewards ran out; fight up to the next level with a quest waiting
+        gate = max(gate, level + 1)
+        while gate <= max_level and not buckets[gate]:
+            gate += 1
+        if gate > max_level:
+            break
+        needed = quest_handler.xp_to_reach_level(level, experience, gate)
+        gaps.append((level, gate, needed))
+        fought += needed
+        old_level = level
+        level, experience = gate, 0
+        release(old_level, level)
+    return opened, gaps, level
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+
+def format_report(analysis, details=False):
+    """
+    Turn analyze_quests results into a text report
+
+    Args:
+        details: Also list every reachable quest's level and fight XP
+
+    Returns: String
+    """
+    reachable = analysis["reachable"]
+    dead = analysis["dead"]
+    lines = ["=== QUEST CONTENT REPORT ==="]
+    lines.append(f"Quests: {analysis['quests']} ({len(reachable)} reachable, {len(dead)} dead), "
+                 f"max level {analysis['max_level']}")
+    fought = sum(xp for _, _, xp in analysis["gaps"])
+    lines.append(f"Doing every reachable quest ends at level {analysis['final_level']} "
+                 f"with {fought} XP from fights.")
+
+    lines.append("\nXP gaps (quest rewards run out before the next required level):")
+    for level, next_level, xp in analysis["gaps"]:
+        lines.append(f"  - level {level} -> {next_level}: {xp} XP from fights")
+    if not analysis["gaps"]:
+        lines.append("  None")
+
+    lines.append("\nDead content:")
+    for qid, reason in dead.items():
+        lines.append(f"  - {qid}: {reason}")
+    if not dead:
+        lines.append("  None")
+
+    lines.append("\nStandalone quests (no prerequisite, nothing needs them):")
+    lines.append("  " + (", ".join(analysis["orphans"]) or "None"))
+
+    lines.append("\nLongest chains:")
+    for i, chain in enumerate(analysis["chains"], start=1):
+        lines.append(f"  {i}. {' -> '.join(chain)} ({len(chain)} quests)")
+    if not analysis["chains"]:
+        lines.append("  None")
+
+    if details:
+        lines.append("\nQuest levels:")
+        for qid in sorted(reachable, key=analysis["min_level"].__getitem__):
+            line = f"  - {qid}: level {analysis['min_level'][qid]}"
+            fight_xp = analysis["fight_xp"].get(qid, 0)
+            if fight_xp:
+                line += f" (after {fight_xp} XP from fights)"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    filename = sys.argv[1] if len(sys.argv) > 1 else "data/quests.txt"
+    max_level = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MAX_LEVEL
+    analysis = analyze_quests(game_data.load_quests(filename), max_level)
+    print(format_report(analysis))
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "w", encoding="utf-8") as f:
+            f.write(format_report(analysis, details=True) + "\n")
+        print(f"\nFull report written to {sys.argv[3]}")
@@ -9,19 +9,316 @@ AI Usage: [Document any AI assistance used]
 This module handles quest management, dependencies, and completion.
 """
 
+import bisect
+import heapq
+
 from custom_exceptions import (
     QuestNotFoundError,
     QuestRequirementsNotMetError,
     QuestAlreadyCompletedError,
     QuestNotActiveError,
-    InsufficientLevelError
+    InsufficientLevelError,
+    InvalidDataFormatError
 )
 
+# managing all quests
+import character_manager
+import game_data
+import game_events
+import inventory_system
+
+# ============================================================================
+# QUEST STATE
+# ============================================================================
+# active_quests and completed_quests stay lists (so saving and loading
+# work as before), but they're turned into QuestSets the first time
+# quest_handler touches them so 'in' checks don't scan the list.
+
+
+class QuestSet(list):
+    """
+    List of quest IDs that also keeps a set of them
+
+    It is still a plain list in the order quests were added, but each
+    ID is only kept once and 'in' checks are O(1). Once bits_for() has
+    been called it also keeps the IDs as a bitset for that numbering,
+    and once stats_for() has been called it keeps a running count of the
+    IDs that are quests in that data. Rewards aren't counted here: a
+    repeatable quest is only in the list once, however often it's done
+    (see get_quest_rewards).
+    """
+
+    def __init__(self, quest_ids=()):
+        super().__init__()
+        self.ids = set()
+        self.index = None
+        self.bits = 0
+        self.stats_data = None
+        self.stats_size = 0
+        self.stats = {"count": 0}
+        self.extend(quest_ids)
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def _rebuild(self):
+        """Redo the set (and drop repeats) from the list contents"""
+        quest_ids = list(self)
+        self.clear()
+        self.extend(quest_ids)
+
+    def __contains__(self, quest_id):
+        return quest_id in self.ids
+
+    def count(self, quest_id):
+        return 1 if quest_id in self.ids else 0
+
+    def bits_for(self, index):
+        """
+        Get the IDs as a bitset
+
+        Args:
+            index: Dictionary {quest_id: bit number} (IDs not in it are
+                   left out), e.g. QuestGraph.index
+        """
+        if self.index is not index:
+            self.index = index
+            self.bits = 0
+            for quest_id in self:
+                self.bits |= self._bit(quest_id)
+        return self.bits
+
+    def _bit(self, quest_id):
+        if self.index is None or quest_id not in self.index:
+            return 0
+        return 1 << self.index[quest_id]
+
+    def stats_for(self, quest_data_dict):
+        """
+        Count the IDs that are in quest_data_dict
+
+        Returns: Dictionary {count} (shared, don't change it)
+        """
+# the count is redone for a different dictionary, or if quests were added/removed
+        if self.stats_data is not quest_data_dict or self.stats_size != len(quest_data_dict):
+            self.stats_data = quest_data_dict
+            self.stats_size = len(quest_data_dict)
+            self.stats = {"count": 0}
+            for quest_id in self:
+                self._count(quest_id, 1)
+        return self.stats
+
+    def _count(self, quest_id, sign):
+        if self.stats_data is not None and quest_id in self.stats_data:
+            self.stats["count"] += sign
+
+    def append(self, quest_id):
+        if quest_id not in self.ids:
+            super().append(quest_id)
+            self.ids.add(quest_id)
+            self.bits |= self._bit(quest_id)
+            self._count(quest_id, 1)
+
+    def extend(self, quest_ids):
+        for quest_id in quest_ids:
+            self.append(quest_id)
+
+    def __iadd__(self, quest_ids):
+        self.extend(quest_ids)
+        return self
+
+    def insert(self, index, quest_id):
+        if quest_id not in self.ids:
+            super().insert(index, quest_id)
+            self.ids.add(quest_id)
+            self.bits |= self._bit(quest_id)
+            self._count(quest_id, 1)
+
+    def remove(self, quest_id):
+        if quest_id not in self.ids:
+            raise ValueError(f"{quest_id!r} is not in the quest list")
+        super().remove(quest_id)
+        self.ids.discard(quest_id)
+        self.bits &= ~self._bit(quest_id)
+        self._count(quest_id, -1)
+
+    def pop(self, index=-1):
+        quest_id = super().pop(index)
+        self.ids.discard(quest_id)
+        self.bits &= ~self._bit(quest_id)
+        self._count(quest_id, -1)
+        return quest_id
+
+    def clear(self):
+        super().clear()
+        self.ids = set()
+        self.bits = 0
+        self.stats = {"count": 0}
+
+    # anything else that changes the list just rebuilds the set
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+    def __imul__(self, times):
+        super().__imul__(times)
+        self._rebuild()
+        return self
+
+
+def get_quest_set(character, field):
+    """
+    Get a character's quest list ("active_quests" or "completed_quests")
+    as a QuestSet, converting a plain list once
+    """
+    quest_ids = character.get(field)
+    if not isinstance(quest_ids, QuestSet):
+        quest_ids = QuestSet(quest_ids or [])
+        character[field] = quest_ids
+    return quest_ids
+
+
+# ============================================================================
+# QUEST TIMERS
+# ============================================================================
+# game time is counted in turns on the character ("game_time", one per
+# game menu action). timed quests get an "expire" timer when they're
+# accepted, and repeatable quests get a "reset" timer when they're
+# completed; a quest has at most one timer at a time.
+
+TURNS_PER_DAY = 24
+
+
+class QuestTimers(dict):
+    """
+    Pending quest timers for one character: {quest_id: (time, kind)}
+
+    The dictionary is what gets saved. heap holds (time, quest_id, kind)
+    so pop_due() only touches timers that are due; a timer that was
+    replaced or removed stays in the heap and is skipped when it comes up.
+    Set timers with timers[quest_id] = (time, kind).
+    """
+
+    def __init__(self, timers=()):
+        super().__init__(timers)
+        self._reheap()
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def _reheap(self):
+        self.heap = [(time, quest_id, kind) for quest_id, (time, kind) in self.items()]
+        heapq.heapify(self.heap)
+
+    def __setitem__(self, quest_id, timer):
+        time, kind = timer
+        super().__setitem__(quest_id, (time, kind))
+        heapq.heappush(self.heap, (time, quest_id, kind))
+# skipped entries are cleared out once they outnumber the live ones
+        if len(self.heap) > 2 * len(self) + 16:
+            self._reheap()
+
+    def next_due(self):
+        """Game time of the next live timer (None if there are none)"""
+        heap = self.heap
+        while heap and self.get(heap[0][1]) != (heap[0][0], heap[0][2]):
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due(self, now):
+        """
+        Remove every timer due at or before now
+
+        Returns: List of (time, quest_id, kind) tuples in time order
+        """
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            time, quest_id, kind = heapq.heappop(heap)
+            if self.get(quest_id) == (time, kind):
+                del self[quest_id]
+                due.append((time, quest_id, kind))
+        return due
+
+
+def get_quest_timers(character):
+    """Get a character's quest timers as QuestTimers, converting a plain dict once"""
+    timers = character.get("quest_timers")
+    if not isinstance(timers, QuestTimers):
+        timers = QuestTimers(timers or {})
+        character["quest_timers"] = timers
+    return timers
+
+
+def next_repeat_time(quest, now):
+    """
+    Game time a repeatable quest completed at now can be taken again
+
+    Returns: Integer time, or None if the quest isn't repeatable
+    """
+    repeatable = quest.get("repeatable")
+    if repeatable == "daily":
+        return (now // TURNS_PER_DAY + 1) * TURNS_PER_DAY
+    if repeatable == "always":
+        return now + quest.get("cooldown", 0)
+    return None
+
+
+def can_repeat_quest(character, quest_id, quest):
+    """Check if a completed quest is repeatable and its reset time has passed"""
+    if not quest.get("repeatable"):
+        return False
+    timer = get_quest_timers(character).get(quest_id)
+    return timer is None or timer[1] != "reset"
+
+
+def advance_quest_time(character, quest_data_dict, turns=1):
+    """
+    Move the character's game clock on and run the quest timers now due
+
+    Timed quests that run out are taken off the active list
+    ("quest_expired" event) and repeatable quests whose reset time
+    came up can be accepted again ("quest_reset" event).
+
+    Returns: List of ("expired" or "reset", quest_id) tuples
+    """
+    now = character.get("game_time", 0) + turns
+    character["game_time"] = now
+    results = []
+    for _, quest_id, kind in get_quest_timers(character).pop_due(now):
+        if kind == "expire":
+            active = get_quest_set(character, "active_quests")
+            if quest_id not in active:
+                continue
+            active.remove(quest_id)
+            game_events.emit("quest_expired", character=character, quest_id=quest_id)
+            results.append(("expired", quest_id))
+        elif quest_id in quest_data_dict:
+            game_events.emit("quest_reset", character=character, quest_id=quest_id)
+            results.append(("reset", quest_id))
+    return results
+
+
+def get_quest_time_left(character, quest_id):
+    """
+    Turns left before an active timed quest expires (or a completed
+    repeatable quest resets)
+
+    Returns: Integer, or None if the quest has no timer
+    """
+    timer = get_quest_timers(character).get(quest_id)
+    if timer is None:
+        return None
+    return max(0, timer[0] - character.get("game_time", 0))
+
+
 # ============================================================================
 # QUEST MANAGEMENT
 # ============================================================================
-# managing all quests
-import character_manager
 
 
 def accept_quest(character, quest_id, quest_data_dict):
@@ -37,21 +334,26 @@ def accept_quest(character, quest_id, quest_data_dict):
     if level < required_level:
         raise InsufficientLevelError("Character level too low for this quest.")
 
-    completed = character.get("completed_quests", [])
-    active = character.get("active_quests", [])
-    prereq = quest.get("prerequisite", "NONE")
+    completed = get_quest_set(character, "completed_quests")
+    active = get_quest_set(character, "active_quests")
+    missing = missing_requirement(character, quest_id, quest_data_dict)
 
-    if prereq and str(prereq).upper() != "NONE" and prereq not in completed:
-        raise QuestRequirementsNotMetError("Prerequisite quest not completed.")
+    if missing is not None:
+        raise QuestRequirementsNotMetError(missing)
 
-    if quest_id in completed:
+    if quest_id in completed and not can_repeat_quest(character, quest_id, quest):
+        left = get_quest_time_left(character, quest_id)
+        if left is not None:
+            raise QuestAlreadyCompletedError(f"Quest can be repeated in {left} turns.")
         raise QuestAlreadyCompletedError("Quest has already been completed.")
 
     if quest_id in active:
         return False
 
     active.append(quest_id)
-    character["active_quests"] = active
+    if quest.get("time_limit"):
+        get_quest_timers(character)[quest_id] = (character.get("game_time", 0) + quest["time_limit"], "expire")
+    game_events.emit("quest_accepted", character=character, quest_id=quest_id)
     return True
 
 
@@ -62,28 +364,39 @@ def complete_quest(character, quest_id, quest_data_dict):
     if quest_id not in quest_data_dict:
         raise QuestNotFoundError(f"Quest {quest_id} not found.")
 
-    active = character.get("active_quests", [])
+    active = get_quest_set(character, "active_quests")
     if quest_id not in active:
         raise QuestNotActiveError("Quest is not active.")
 
     quest = quest_data_dict[quest_id]
+    earned = get_quest_rewards(character, quest_data_dict)
+    completed = get_quest_set(character, "completed_quests")
+# older saves have no counts; each completed quest was done at least once
+    completions = character.setdefault("quest_completions", {qid: 1 for qid in completed})
 
     active.remove(quest_id)
-    completed = character.get("completed_quests", [])
-    if quest_id not in completed:
-        completed.append(quest_id)
+    completed.append(quest_id)
+    completions[quest_id] = completions.get(quest_id, 0) + 1
 
-    character["active_quests"] = active
-    character["completed_quests"] = completed
+# the expire timer (if any) goes, and a repeatable quest gets its reset time
+    timers = get_quest_timers(character)
+    timers.pop(quest_id, None)
+    now = character.get("game_time", 0)
+    repeat_time = next_repeat_time(quest, now)
+    if repeat_time is not None and repeat_time > now:
+        timers[quest_id] = (repeat_time, "reset")
 
     xp = quest.get("reward_xp", 0)
     gold = quest.get("reward_gold", 0)
+    earned["xp"] += xp
+    earned["gold"] += gold
 
     if xp:
         character_manager.gain_experience(character, xp)
     if gold:
         character_manager.add_gold(character, gold)
 
+    game_events.emit("quest_completed", character=character, quest_id=quest_id)
     return {"xp": xp, "gold": gold}
 
 
@@ -91,11 +404,14 @@ def abandon_quest(character, quest_id):
     """
     Remove a quest from active quests without completing it
     """
-    active = character.get("active_quests", [])
+    active = get_quest_set(character, "active_quests")
     if quest_id not in active:
         raise QuestNotActiveError("Quest is not active.")
     active.remove(quest_id)
-    character["active_quests"] = active
+    timers = get_quest_timers(character)
+    if timers.get(quest_id, (None, None))[1] == "expire":
+        del timers[quest_id]
+    game_events.emit("quest_abandoned", character=character, quest_id=quest_id)
     return True
 
 
@@ -127,19 +443,18 @@ def get_available_quests(character, quest_data_dict):
     """
     available = []
     level = character.get("level", 1)
-    completed = character.get("completed_quests", [])
-    active = character.get("active_quests", [])
+    completed = get_quest_set(character, "completed_quests")
+    active = get_quest_set(character, "active_quests")
+    graph = get_quest_graph(quest_data_dict)
 
-    for qid, quest in quest_data_dict.items():
-        required_level = quest.get("required_level", 1)
-        if level < required_level:
-            continue
+# quests above the character's level are never looked at
+    for qid in graph.quests_between(float("-inf"), level):
+        quest = quest_data_dict[qid]
 
-        prereq = quest.get("prerequisite", "NONE")
-        if prereq and str(prereq).upper() != "NONE" and prereq not in completed:
+        if qid in active or (qid in completed and not can_repeat_quest(character, qid, quest)):
             continue
 
-        if qid in completed or qid in active:
+        if missing_requirement(character, qid, quest_data_dict) is not None:
             continue
 
         available.append(quest)
@@ -156,14 +471,14 @@ def is_quest_completed(character, quest_id):
     """
     Check if a specific quest has been completed
     """
-    return quest_id in character.get("completed_quests", [])
+    return quest_id in get_quest_set(character, "completed_quests")
 
 
 def is_quest_active(character, quest_id):
     """
     Check if a specific quest is currently active
     """
-    return quest_id in character.get("active_quests", [])
+    return quest_id in get_quest_set(character, "active_quests")
 
 
 def can_accept_quest(character, quest_id, quest_data_dict):
@@ -179,42 +494,52 @@ def can_accept_quest(character, quest_id, quest_data_dict):
     if level < required_level:
         return False
 
-    completed = character.get("completed_quests", [])
-    active = character.get("active_quests", [])
-    prereq = quest.get("prerequisite", "NONE")
+    completed = get_quest_set(character, "completed_quests")
+    active = get_quest_set(character, "active_quests")
 
-    if prereq and str(prereq).upper() != "NONE" and prereq not in completed:
+    if missing_requirement(character, quest_id, quest_data_dict) is not None:
         return False
 
-    if quest_id in completed or quest_id in active:
+    if quest_id in active or (quest_id in completed and not can_repeat_quest(character, quest_id, quest)):
         return False
 
     return True
 
 
-def get_quest_prerequisite_chain(quest_id, quest_data_dict):
+def missing_requirement(character, quest_id, quest_data_dict):
     """
-    Get the full chain of prerequisites for a quest
+    Find what (besides level) stops a character taking a quest:
+    prerequisite quests, class, or items
+
+    Returns: Message for the first requirement not met, or None
     """
-    if quest_id not in quest_data_dict:
-        raise QuestNotFoundError(f"Quest {quest_id} not found.")
+    graph = get_quest_graph(quest_data_dict)
+    completed = get_quest_set(character, "completed_quests").bits_for(graph.index)
+    if not graph.prerequisites_met(quest_id, completed):
+        return "Prerequisite quest not completed."
+    return missing_class_or_items(character, quest_data_dict[quest_id])
 
-    chain = []
-    current_id = quest_id
 
-    while True:
-        if current_id not in quest_data_dict:
-            raise QuestNotFoundError(f"Quest {current_id} not found.")
-        chain.append(current_id)
-        quest = quest_data_dict[current_id]
-        prereq = quest.get("prerequisite", "NONE")
-        if prereq and str(prereq).upper() != "NONE":
-            current_id = prereq
-        else:
-            break
+def missing_class_or_items(character, quest):
+    """
+    Check a quest's REQUIRED_CLASS and REQUIRED_ITEMS
+
+    Returns: Message for the first one not met, or None
+    """
+    required_class = quest.get("required_class")
+    if required_class and character.get("class") != required_class:
+        return f"Only a {required_class} can take this quest."
+    for item_id, quantity in quest.get("required_items", {}).items():
+        if inventory_system.count_item(character, item_id) < quantity:
+            return f"You need {quantity} {item_id} for this quest."
+    return None
 
-    chain.reverse()
-    return chain
+
+def get_quest_prerequisite_chain(quest_id, quest_data_dict):
+    """
+    Get the full chain of prerequisites for a quest
+    """
+    return list(get_quest_graph(quest_data_dict).chain(quest_id))
 
 
 # ============================================================================
@@ -225,40 +550,64 @@ def get_quest_prerequisite_chain(quest_id, quest_data_dict):
 def get_quest_completion_percentage(character, quest_data_dict):
     """
     Calculate what percentage of all quests have been completed
+    (completed IDs that aren't in the quest data don't count)
     """
     total_quests = len(quest_data_dict)
     if total_quests == 0:
         return 0.0
-    completed_count = len(character.get("completed_quests", []))
+    completed_count = get_quest_set(character, "completed_quests").stats_for(quest_data_dict)["count"]
     percentage = (completed_count / total_quests) * 100
     return float(percentage)
 
 
+def get_completion_count(character, quest_id):
+    """
+    How many times a character has completed a quest (repeatable quests
+    can be more than once)
+    """
+    completions = character.get("quest_completions")
+    if completions is None:
+        return 1 if quest_id in get_quest_set(character, "completed_quests") else 0
+    return completions.get(quest_id, 0)
+
+
+def get_quest_rewards(character, quest_data_dict):
+    """
+    Get the character's running totals of quest rewards paid out
+
+    complete_quest adds to them every time it pays, so repeatable
+    quests count each time. Characters from older saves start from
+    their completed quests (the ones still in quest_data_dict).
+
+    Returns: Dictionary {xp, gold} stored on the character
+    """
+    earned = character.get("quest_rewards")
+    if earned is None:
+        earned = {"xp": 0, "gold": 0}
+        for quest_id in get_quest_set(character, "completed_quests"):
+            quest = quest_data_dict.get(quest_id)
+            if quest is not None:
+                earned["xp"] += quest.get("reward_xp", 0)
+                earned["gold"] += quest.get("reward_gold", 0)
+        character["quest_rewards"] = earned
+    return earned
+
+
 def get_total_quest_rewards_earned(character, quest_data_dict):
     """
     Calculate total XP and gold earned from completed quests
     """
-    total_xp = 0
-    total_gold = 0
-    for qid in character.get("completed_quests", []):
-        quest = quest_data_dict.get(qid)
-        if quest is None:
-            continue
-        total_xp += quest.get("reward_xp", 0)
-        total_gold += quest.get("reward_gold", 0)
-    return {"total_xp": total_xp, "total_gold": total_gold}
+    earned = get_quest_rewards(character, quest_data_dict)
+    return {"total_xp": earned["xp"], "total_gold": earned["gold"]}
 
 
 def get_quests_by_level(quest_data_dict, min_level, max_level):
     """
     Get all quests within a level range
     """
-    quests = []
-    for quest in quest_data_dict.values():
-        required_level = quest.get("required_level", 1)
-        if required_level >= min_level and required_level <= max_level:
-            quests.append(quest)
-    return quests
+    graph = get_quest_graph(quest_data_dict)
+    start, end = graph.level_span(min_level, max_level)
+    return graph.level_quests[start:end]
 
 
 # ============================================================================
@@ -283,6 +632,17 @@ def display_quest_info(quest_data):
     print(f"Reward XP: {reward_xp}")
     print(f"Reward Gold: {reward_gold}")
     print(f"Prerequisite: {prereq}")
+    if quest_data.get("required_class"):
+        print(f"Required Class: {quest_data['required_class']}")
+    if quest_data.get("required_items"):
+        items = ", ".join(f"{item_id} x{qty}" for item_id, qty in quest_data["required_items"].items())
+        print(f"Required Items: {items}")
+    if quest_data.get("repeatable") == "daily":
+        print("Repeatable: daily")
+    elif quest_data.get("repeatable"):
+        print(f"Repeatable: every {quest_data.get('cooldown', 0)} turns")
+    if quest_data.get("time_limit"):
+        print(f"Time Limit: {quest_data['time_limit']} turns")
 
 
 def display_quest_list(quest_list):
@@ -306,16 +666,884 @@ def display_character_quest_progress(character, quest_data_dict):
     Display character's quest statistics and progress
     """
     active_count = len(character.get("active_quests", []))
-    completed_count = len(character.get("completed_quests", []))
+    stats = get_quest_set(character, "completed_quests").stats_for(quest_data_dict)
+    earned = get_quest_rewards(character, quest_data_dict)
     percentage = get_quest_completion_percentage(character, quest_data_dict)
-    totals = get_total_quest_rewards_earned(character, quest_data_dict)
 
     print("\n=== QUEST PROGRESS ===")
     print(f"Active quests: {active_count}")
-    print(f"Completed quests: {completed_count}")
+    print(f"Completed quests: {stats['count']}")
     print(f"Completion: {percentage:.1f}%")
-    print(f"Total XP from quests: {totals['total_xp']}")
-    print(f"Total gold from quests: {totals['total_gold']}")
+    print(f"Total XP from quests: {earned['xp']}")
+    print(f"Total gold from quests: {earned['gold']}")
+
+
+# ============================================================================
+# QUEST GRAPH
+# ============================================================================
+# prerequisites as a graph, built once per quest dictionary: what each
+# quest needs, what it unlocks, and an order with every prerequisite
+# before the quests that need it.
+
+
+def quest_prerequisites(quest):
+    """
+    Get every quest ID a quest's prerequisite mentions (in any option)
+    """
+    return game_data.prerequisite_ids(game_data.parse_prerequisite_tree(quest.get("prerequisite")))
+
+
+def masks_met(masks, completed_bits):
+    """
+    Check a bitset against masks from QuestGraph.compile_masks
+
+    One AND for the quests that are all needed and one per clause (plus
+    any nested groups, only for expressions like "(a AND b) OR c").
+    """
+    all_mask, clauses = masks
+    if completed_bits & all_mask != all_mask:
+        return False
+    for any_mask, nested in clauses:
+        if completed_bits & any_mask:
+            continue
+        if not any(masks_met(group, completed_bits) for group in nested):
+            return False
+    return True
+
+
+class QuestGraph:
+    """
+    Prerequisite graph for a quest dictionary
+
+    prerequisites maps each quest to the quests its prerequisite
+    mentions, unlocks maps each quest to the quests that mention it, and
+    order lists every quest after its prerequisites (position gives each
+    quest's place in it). level_order lists quest IDs sorted by required
+    level (levels holds the matching levels for bisect, level_quests the
+    matching quest dictionaries), and level_rank gives each quest's
+    place in it.
+
+    Every quest ID gets a bit number (index), and each quest's
+    prerequisite is compiled at load into masks (see compile_masks): one
+    mask of quests that are all needed plus one mask per OR clause, so
+    "a AND (b OR c)" becomes a, and b|c. A completed-quests bitset meets
+    the prerequisite if it covers the first mask and shares a bit with
+    every clause, however complex the expression.
+    Prerequisite chains are worked out the first time they're asked
+    for and looked up after that.
+    """
+
+    def __init__(self, quest_data_dict):
+        """
+        Raises: InvalidDataFormatError if prerequisites loop back on
+                themselves
+        """
+        self.quest_data = quest_data_dict
+        self.prerequisites = {}
+        self.trees = {}
+        self.unlocks = {qid: [] for qid in quest_data_dict}
+# prerequisites that aren't in the data, {quest_id: missing_id}
+        self.missing = {}
+        for qid, quest in quest_data_dict.items():
+            self.trees[qid] = game_data.parse_prerequisite_tree(quest.get("prerequisite"))
+            prereqs = game_data.prerequisite_ids(self.trees[qid])
+            self.prerequisites[qid] = prereqs
+            for prereq in prereqs:
+                if prereq in self.unlocks:
+                    self.unlocks[prereq].append(qid)
+                else:
+                    self.missing[qid] = prereq
+        self.order = self._prerequisite_order()
+        self.position = {qid: i for i, qid in enumerate(self.order)}
+# sorted() keeps file order for quests with the same level
+        self.level_order = sorted(quest_data_dict, key=lambda qid: quest_data_dict[qid].get("required_level", 1))
+        self.level_quests = [quest_data_dict[qid] for qid in self.level_order]
+        self.levels = [quest.get("required_level", 1) for quest in self.level_quests]
+        self.level_rank = {qid: i for i, qid in enumerate(self.level_order)}
+# missing quests get bit numbers too; nobody can complete them, so
+# options that need one are never met
+        self.index = {qid: i for i, qid in enumerate(quest_data_dict)}
+        for prereqs in self.prerequisites.values():
+            for prereq in prereqs:
+                if prereq not in self.index:
+                    self.index[prereq] = len(self.index)
+        self.masks = {qid: self.compile_masks(tree) for qid, tree in self.trees.items()}
+        self.chains = {}
+
+    def _prerequisite_order(self):
+        """
+        Topological order of quests (prerequisites first)
+
+        Raises: InvalidDataFormatError if prerequisites form a loop
+        """
+        waiting = {}
+        for qid, prereqs in self.prerequisites.items():
+            waiting[qid] = sum(1 for prereq in prereqs if prereq in self.unlocks)
+        ready = [qid for qid, count in waiting.items() if count == 0]
+        order = []
+        while ready:
+            qid = ready.pop()
+            order.append(qid)
+            for dependent in self.unlocks[qid]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(waiting):
+            stuck = sorted(qid for qid, count in waiting.items() if count > 0)
+            raise InvalidDataFormatError(f"Quest prerequisites loop back on themselves: {', '.join(stuck)}")
+        return order
+
+    def bit(self, quest_id):
+        """Bit for a quest in a completed-quests bitset (0 if unknown)"""
+        if quest_id not in self.index:
+            return 0
+        return 1 << self.index[quest_id]
+
+    def compile_masks(self, tree):
+        """
+        Compile a prerequisite tree (game_data.parse_prerequisite_tree)
+
+        Returns: Tuple (all_mask, clauses): all_mask has the quests that
+                 are all needed, and each clause is (any_mask, nested)
+                 where any_mask has the quests that each meet it on their
+                 own and nested lists compiled AND groups that also do.
+                 An AND of ORs has no nested groups at all.
+        """
+        if tree is None:
+            return (0, [])
+        parts = tree[1] if isinstance(tree, tuple) and tree[0] == "AND" else [tree]
+        all_mask = 0
+        clauses = []
+        for part in parts:
+            if not isinstance(part, tuple):
+                all_mask |= 1 << self.index[part]
+                continue
+            any_mask = 0
+            nested = []
+            for option in part[1]:
+                if isinstance(option, tuple):
+                    nested.append(self.compile_masks(option))
+                else:
+                    any_mask |= 1 << self.index[option]
+            clauses.append((any_mask, nested))
+        return (all_mask, clauses)
+
+    def level_span(self, min_level, max_level):
+        """
+        Find the quests with min_level <= required level <= max_level
+
+        Returns: Tuple (start, end) to slice level_order or level_quests with
+        """
+        return bisect.bisect_left(self.levels, min_level), bisect.bisect_right(self.levels, max_level)
+
+    def quests_between(self, min_level, max_level):
+        """Get the IDs of quests in a level range (a slice of level_order)"""
+        start, end = self.level_span(min_level, max_level)
+        return self.level_order[start:end]
+
+    def prerequisites_met(self, quest_id, completed_bits):
+        """True if completed_bits meets the quest's compiled prerequisite"""
+        return masks_met(self.masks[quest_id], completed_bits)
+
+    def chain(self, quest_id):
+        """
+        Get a quest and everything it depends on, prerequisites first
+        (every quest its prerequisite mentions, even in an OR)
+
+        Returns: Tuple of quest IDs ending with quest_id
+        Raises: QuestNotFoundError if the quest (or one it depends on)
+                isn't in the data
+        """
+        chain = self.chains.get(quest_id)
+        if chain is not None:
+            return chain
+        if quest_id not in self.prerequisites:
+            raise QuestNotFoundError(f"Quest {quest_id} not found.")
+        needed = {quest_id}
+        stack = [quest_id]
+        while stack:
+            qid = stack.pop()
+            if qid in self.missing:
+                raise QuestNotFoundError(f"Quest {self.missing[qid]} not found.")
+            for prereq in self.prerequisites[qid]:
+                if prereq not in needed:
+                    needed.add(prereq)
+                    stack.append(prereq)
+        chain = tuple(sorted(needed, key=self.position.__getitem__))
+        self.chains[quest_id] = chain
+        return chain
+
+
+_quest_graph = None
+
+
+def get_quest_graph(quest_data_dict):
+    """
+    Return the quest graph for this quest data, building it if needed
+    """
+    global _quest_graph
+# rebuilt for a different dictionary, or if quests were added/removed
+    graph = _quest_graph
+    if graph is None or graph.quest_data is not quest_data_dict or len(graph.prerequisites) != len(quest_data_dict):
+        _quest_graph = QuestGraph(quest_data_dict)
+    return _quest_graph
+
+
+# ============================================================================
+# QUEST PLANNER
+# ============================================================================
+# plans which quests to do (and how much XP to earn fighting in between)
+# to reach a level or finish a quest. Quests are played out in order with
+# the same level curve as gain_experience. Item requirements are ignored
+# (items can be bought); quests for another class are never used.
+# A plan costs its fight XP first and its number of quests second. Small
+# catalogs are searched for the cheapest plan; bigger ones use a greedy
+# heuristic that doesn't always find it.
+
+PLAN_SEARCH_QUESTS = 20
+PLAN_SEARCH_STATES = 50_000
+
+
+def add_planned_xp(level, experience, xp):
+    """
+    Apply XP with the gain_experience level curve (level * 100 per level)
+
+    Returns: Tuple (level, experience)
+    """
+    experience += xp
+    while experience >= level * 100:
+        experience -= level * 100
+        level += 1
+    return level, experience
+
+
+def xp_to_reach_level(level, experience, target_level):
+    """XP needed to get from level (plus experience toward the next) to target_level"""
+    needed = -experience
+    for current in range(level, target_level):
+        needed += current * 100
+    return max(needed, 0)
+
+
+def cheapest_prerequisites(graph, quest_id, done, usable):
+    """
+    Pick the fewest quests that still need doing to complete quest_id
+
+    Costs are worked out once per quest in prerequisite order (each is
+    1 plus the quests its prerequisite tree needs, taking the cheaper
+    side of every OR), which also decides every OR.
+
+    Args:
+        graph: QuestGraph
+        quest_id: Quest to finish
+        done: Set of quest IDs already completed
+        usable: Function telling whether the character can take a quest
+
+    Returns: List of quest IDs, prerequisites first and ending with
+             quest_id, or None if it can't be done
+    """
+    if quest_id in done:
+        return []
+    needed = {quest_id}
+    stack = [quest_id]
+    while stack:
+        for prereq in graph.prerequisites.get(stack.pop(), ()):
+            if prereq not in done and prereq not in needed:
+                needed.add(prereq)
+                stack.append(prereq)
+# quests missing from the data have no position and stay impossible
+    impossible = float("inf")
+    cost = {}
+    choice = {}
+    for qid in sorted((qid for qid in needed if qid in graph.position), key=graph.position.__getitem__):
+        if not usable(qid):
+            continue
+        best, choice[qid] = cheapest_branch(graph.trees[qid], done, cost)
+        if best != impossible:
+            cost[qid] = best + 1
+    if quest_id not in cost:
+        return None
+    chosen = {quest_id}
+    stack = [quest_id]
+    while stack:
+        for prereq in choice.get(stack.pop(), ()):
+            if prereq not in done and prereq not in chosen:
+                chosen.add(prereq)
+                stack.append(prereq)
+    return sorted(chosen, key=graph.position.__getitem__)
+
+
+def cheapest_branch(tree, done, cost):
+    """
+    Pick the quests to meet a prerequisite tree with (cost gives each
+    quest's chain length, done ones are free)
+
+    Returns: Tuple (total cost, frozenset of quest IDs)
+    """
+    if tree is None:
+        return 0, frozenset()
+    if not isinstance(tree, tuple):
+        return (0 if tree in done else cost.get(tree, float("inf"))), frozenset([tree])
+    kind, children = tree
+    picks = [cheapest_branch(child, done, cost) for child in children]
+    if kind == "OR":
+        return min(picks, key=lambda pick: pick[0])
+    chosen = frozenset().union(*(ids for _, ids in picks))
+    return sum(0 if qid in done else cost.get(qid, float("inf")) for qid in chosen), chosen
+
+
+def search_plan(graph, quest_data_dict, candidates, done_bits, level, experience, target_level, target_quest):
+    """
+    A* search for the plan with the least fight XP, then the fewest quests
+
+    A state is the set of candidates done so far. Each move fights for
+    just enough XP to reach a quest's required level (if needed) and
+    then does it. The estimate of fight XP still needed (XP to the
+    target minus all the quest XP left) never overestimates, so the
+    first finished plan taken off the heap is the cheapest.
+
+    Args:
+        candidates: Quest IDs the character could still do
+        done_bits: Completed-quests bitset (QuestGraph numbering)
+
+    Returns: Tuple (steps, level, experience), or None if there's no
+             plan or the search went past PLAN_SEARCH_STATES states
+    """
+    xp = [quest_data_dict[qid].get("reward_xp", 0) for qid in candidates]
+    target_bit = 0
+    target_required = 1
+    if target_quest is not None and target_quest in candidates:
+        target_bit = 1 << candidates.index(target_quest)
+        target_required = quest_data_dict[target_quest].get("required_level", 1)
+
+    def estimate(mask, level, experience, xp_left):
+        need = 0
+        if target_level is not None:
+            need = xp_to_reach_level(level, experience, target_level)
+        if not mask & target_bit:
+            need = max(need, xp_to_reach_level(level, experience, target_required))
+        return max(0, need - xp_left)
+
+# heap entries: (fight XP + estimate, quests, fight XP, order, mask, bits,
+# level, experience, quest XP left, path); path is (moves, earlier path)
+# and None marks a finished plan's last entry
+    total = sum(xp)
+    heap = [(estimate(0, level, experience, total), 0, 0, 0, 0, done_bits, level, experience, total, ((), None))]
+    counter = 0
+    closed = set()
+    while heap:
+        _, count, fought, _, mask, bits, level, experience, xp_left, path = heapq.heappop(heap)
+        if bits is None:
+            steps = []
+            while path is not None:
+                moves, path = path
+                steps[:0] = moves
+            return steps, level, experience
+        if mask in closed:
+            continue
+        closed.add(mask)
+        if len(closed) > PLAN_SEARCH_STATES:
+            return None
+        if mask & target_bit == target_bit:
+            extra = 0 if target_level is None else xp_to_reach_level(level, experience, target_level)
+            moves = (("fight", extra),) if extra else ()
+            end_level, end_experience = add_planned_xp(level, experience, extra)
+            counter += 1
+            heapq.heappush(heap, (fought + extra, count, fought + extra, counter, mask, None,
+                                  end_level, end_experience, xp_left, (moves, path)))
+        for i, qid in enumerate(candidates):
+            new_mask = mask | 1 << i
+            if new_mask == mask or new_mask in closed or not graph.prerequisites_met(qid, bits):
+                continue
+            fight = xp_to_reach_level(level, experience, quest_data_dict[qid].get("required_level", 1))
+            moves = (("fight", fight), ("quest", qid)) if fight else (("quest", qid),)
+            new_level, new_experience = add_planned_xp(level, experience, fight + xp[i])
+            counter += 1
+            heapq.heappush(heap, (fought + fight + estimate(new_mask, new_level, new_experience, xp_left - xp[i]),
+                                  count + 1, fought + fight, counter, new_mask, bits | graph.bit(qid),
+                                  new_level, new_experience, xp_left - xp[i], (moves, path)))
+    return None
+
+
+def plan_quests(character, quest_data_dict, target_level=None, target_quest=None):
+    """
+    Plan the cheapest way to a target level and/or a target quest
+
+    Cheapest means the least XP from fights, then the fewest quests.
+    When the character has at most PLAN_SEARCH_QUESTS quests left to
+    choose from, search_plan finds the cheapest plan. Otherwise (or if
+    the search runs too long) a greedy heuristic is used, which can do
+    more quests than needed: the target quest's prerequisites are done
+    in order, whenever a level gate is in the way the open quest with
+    the most reward XP is done next, and if no quest is open the plan
+    fights for just enough XP to reach the next level that opens one.
+
+    Args:
+        character: Character dictionary
+        quest_data_dict: Dictionary of all quest data
+        target_level: Level to reach (optional)
+        target_quest: Quest ID to complete (optional)
+
+    Returns: Dictionary {'steps': [('quest', quest_id) or ('fight', xp), ...],
+                         'quests': [quest_id, ...], 'fight_xp': int,
+                         'level': int, 'experience': int, 'optimal': bool}
+             (optimal is False when the greedy heuristic made the plan)
+    Raises:
+        QuestNotFoundError if target_quest isn't in the data
+        QuestRequirementsNotMetError if target_quest can never be done
+    """
+    graph = get_quest_graph(quest_data_dict)
+    character_class = character.get("class")
+    completed = get_quest_set(character, "completed_quests")
+    done = set(completed)
+    done_bits = completed.bits_for(graph.index)
+    level = character.get("level", 1)
+    experience = character.get("experience", 0)
+
+    def usable(qid):
+        required_class = quest_data_dict[qid].get("required_class")
+        return not required_class or required_class == character_class
+
+    required = []
+    if target_quest is not None:
+        if target_quest not in quest_data_dict:
+            raise QuestNotFoundError(f"Quest {target_quest} not found.")
+        required = cheapest_prerequisites(graph, target_quest, done, usable)
+        if required is None:
+            raise QuestRequirementsNotMetError(f"Quest {target_quest} can't be reached by this character.")
+
+    candidates = [qid for qid in quest_data_dict if qid not in done and usable(qid)]
+    if len(candidates) <= PLAN_SEARCH_QUESTS:
+        found = search_plan(graph, quest_data_dict, candidates, done_bits, level, experience, target_level, target_quest)
+        if found is not None:
+            steps, level, experience = found
+            return {"steps": steps, "quests": [value for kind, value in steps if kind == "quest"],
+                    "fight_xp": sum(value for kind, value in steps if kind == "fight"),
+                    "level": level, "experience": experience, "optimal": True}
+
+# open quests by most XP, and quests waiting only on a level by level
+    open_quests = []
+    gated = []
+    queued = set()
+
+    def offer(qid):
+        if qid in done or qid in queued or not usable(qid) or not graph.prerequisites_met(qid, done_bits):
+            return
+        queued.add(qid)
+        quest = quest_data_dict[qid]
+        if quest.get("required_level", 1) <= level:
+            heapq.heappush(open_quests, (-quest.get("reward_xp", 0), graph.level_rank[qid], qid))
+        else:
+            heapq.heappush(gated, (quest.get("required_level", 1), graph.level_rank[qid], qid))
+
+    for qid in quest_data_dict:
+        offer(qid)
+
+    steps = []
+    quests = []
+    fight_xp = 0
+    next_required = 0
+    while True:
+        while next_required < len(required) and required[next_required] in done:
+            next_required += 1
+        if next_required == len(required) and (target_level is None or level >= target_level):
+            break
+        while gated and gated[0][0] <= level:
+            _, rank, qid = heapq.heappop(gated)
+            heapq.heappush(open_quests, (-quest_data_dict[qid].get("reward_xp", 0), rank, qid))
+        goal = None
+        if next_required < len(required):
+            qid = required[next_required]
+            if quest_data_dict[qid].get("required_level", 1) > level:
+                goal = quest_data_dict[qid]["required_level"]
+                qid = None
+        else:
+            qid = None
+            goal = target_level
+        if qid is None and open_quests:
+            qid = heapq.heappop(open_quests)[2]
+            if qid in done:
+                continue
+        if qid is None:
+            if gated:
+                goal = min(goal, gated[0][0])
+            xp = xp_to_reach_level(level, experience, goal)
+            steps.append(("fight", xp))
+            fight_xp += xp
+            level, experience = add_planned_xp(level, experience, xp)
+            continue
+        done.add(qid)
+        done_bits |= graph.bit(qid)
+        quests.append(qid)
+        steps.append(("quest", qid))
+        level, experience = add_planned_xp(level, experience, quest_data_dict[qid].get("reward_xp", 0))
+        for dependent in graph.unlocks[qid]:
+            offer(dependent)
+    return {"steps": steps, "quests": quests, "fight_xp": fight_xp, "level": level, "experience": experience,
+            "optimal": False}
+
+
+# ============================================================================
+# AVAILABLE QUEST TRACKING
+# ============================================================================
+# the quest menu keeps one of these for the current character. It listens
+# for quest and level up events and only rechecks the quests an event can
+# change: the quests a completed quest unlocks, or the quests at the
+# levels just reached.
+
+
+class QuestAvailability:
+    """
+    The set of quests one character can accept, kept up to date by events
+
+    If the character's quest lists or level are changed without an event
+    (e.g. a save being loaded into the same dictionary) the set is
+    rebuilt the next time it's read.
+    """
+
+    def __init__(self, character, quest_data_dict):
+        self.character = character
+        self.quest_data = quest_data_dict
+        self.graph = get_quest_graph(quest_data_dict)
+        self.available = set()
+        self.rebuild()
+
+    def attach(self):
+        """Start listening for quest and level up events"""
+        game_events.subscribe("level_up", self.on_level_up)
+        game_events.subscribe("quest_accepted", self.on_quest_accepted)
+        game_events.subscribe("quest_abandoned", self.on_quest_abandoned)
+        game_events.subscribe("quest_expired", self.on_quest_abandoned)
+        game_events.subscribe("quest_completed", self.on_quest_completed)
+        game_events.subscribe("quest_reset", self.on_quest_reset)
+
+    def detach(self):
+        """Stop listening for events"""
+        game_events.unsubscribe("level_up", self.on_level_up)
+        game_events.unsubscribe("quest_accepted", self.on_quest_accepted)
+        game_events.unsubscribe("quest_abandoned", self.on_quest_abandoned)
+        game_events.unsubscribe("quest_expired", self.on_quest_abandoned)
+        game_events.unsubscribe("quest_completed", self.on_quest_completed)
+        game_events.unsubscribe("quest_reset", self.on_quest_reset)
+
+    def rebuild(self):
+        """Work out the available set from scratch"""
+        self.level = self.character.get("level", 1)
+        self.completed = set(self.character.get("completed_quests", []))
+        self.active = set(self.character.get("active_quests", []))
+        self.completed_bits = 0
+        for qid in self.completed:
+            self.completed_bits |= self.graph.bit(qid)
+        self.available = set()
+        for qid in self.graph.quests_between(float("-inf"), self.level):
+            self._check(qid)
+        self.seen = self._snapshot()
+
+    def _check(self, quest_id):
+        """Add or remove one quest from the available set"""
+        quest = self.quest_data[quest_id]
+        if (quest_id not in self.active
+                and (quest_id not in self.completed or can_repeat_quest(self.character, quest_id, quest))
+                and self.level >= quest.get("required_level", 1)
+                and self.graph.prerequisites_met(quest_id, self.completed_bits)):
+            self.available.add(quest_id)
+        else:
+            self.available.discard(quest_id)
+
+    def _snapshot(self):
+        """Level and quest list sizes, to notice changes made without events"""
+        character = self.character
+        return (character.get("level", 1), len(character.get("completed_quests", [])),
+                len(character.get("active_quests", [])))
+
+    def available_quests(self):
+        """
+        Get full data for the quests the character can accept
+
+        Class and item requirements are checked here, since the
+        inventory changes without quest events.
+
+        Returns: List of quest dictionaries by required level
+        """
+        graph = get_quest_graph(self.quest_data)
+        if graph is not self.graph or self._snapshot() != self.seen:
+            self.graph = graph
+            self.rebuild()
+        order = self.graph.level_rank
+        quests = []
+        for qid in sorted(self.available, key=order.__getitem__):
+            if missing_class_or_items(self.character, self.quest_data[qid]) is None:
+                quests.append(self.quest_data[qid])
+        return quests
+
+    # ------------------------------------------------------------------ events
+
+    def on_level_up(self, character, old_level, level, **details):
+        """Check only the quests whose required level was just reached"""
+        if character is not self.character:
+            return
+        self.level = level
+        for qid in self.graph.quests_between(old_level + 1, level):
+            self._check(qid)
+        self.seen = self._snapshot()
+
+    def on_quest_accepted(self, character, quest_id, **details):
+        """An accepted quest is no longer available"""
+        if character is not self.character:
+            return
+# another listener (e.g. ObjectiveTracker) may have completed it already,
+# in which case quest_completed came through before this event did
+        if quest_id not in get_quest_set(character, "active_quests"):
+            return
+        self.active.add(quest_id)
+        self.available.discard(quest_id)
+        self.seen = self._snapshot()
+
+    def on_quest_abandoned(self, character, quest_id, **details):
+        """An abandoned (or expired) quest can be accepted again"""
+        if character is not self.character:
+            return
+        self.active.discard(quest_id)
+        if quest_id in self.quest_data:
+            self._check(quest_id)
+        self.seen = self._snapshot()
+
+    def on_quest_completed(self, character, quest_id, **details):
+        """Check only the quests that needed the completed one"""
+        if character is not self.character:
+            return
+        self.active.discard(quest_id)
+        self.completed.add(quest_id)
+        self.completed_bits |= self.graph.bit(quest_id)
+        if self.quest_data.get(quest_id, {}).get("repeatable"):
+            self._check(quest_id)
+        else:
+            self.available.discard(quest_id)
+        for dependent in self.graph.unlocks.get(quest_id, ()):
+            self._check(dependent)
+        self.seen = self._snapshot()
+
+    def on_quest_reset(self, character, quest_id, **details):
+        """A repeatable quest's reset time came up"""
+        if character is not self.character:
+            return
+        if quest_id in self.quest_data:
+            self._check(quest_id)
+
+
+# ============================================================================
+# QUEST OBJECTIVES
+# ============================================================================
+# quests with OBJECTIVES (kill N of an enemy, collect N of an item, reach
+# a level) count progress from battle, inventory and level up events and
+# complete themselves when every objective is met. Progress is kept on
+# the character (and saved) as {quest_id: [count for each objective]}.
+
+
+def objective_key(objective):
+    """Key an objective is listed under in ObjectiveTracker.listening"""
+    return (objective["type"], objective["target"])
+
+
+def get_quest_progress(character, quest_id, quest_data_dict):
+    """
+    Get the progress counts for a quest's objectives (starting them at 0)
+
+    Returns: List with one count per objective
+    """
+    objectives = quest_data_dict[quest_id].get("objectives", [])
+    progress = character.setdefault("quest_progress", {})
+    counts = progress.get(quest_id)
+    if counts is None or len(counts) != len(objectives):
+        counts = [0] * len(objectives)
+        progress[quest_id] = counts
+    return counts
+
+
+class ObjectiveTracker:
+    """
+    Counts objective progress for one character's active quests
+
+    listening maps (type, target) to the quests with an unfinished
+    objective of that kind, so a battle against a goblin only touches
+    quests that are waiting on goblins. Collect objectives count what
+    the character is holding (not every pickup, since bank withdrawals
+    and unequipping add items too), so their quests keep listening.
+    Quests that finish are completed with complete_quest and collected
+    in finished for the game to report.
+    """
+
+    def __init__(self, character, quest_data_dict):
+        self.character = character
+        self.quest_data = quest_data_dict
+        self.listening = {}
+        self.finished = []
+        self.rebuild()
+
+    def attach(self):
+        """Start listening for battle, item, level up and quest events"""
+        game_events.subscribe("enemy_defeated", self.on_enemy_defeated)
+        game_events.subscribe("item_added", self.on_item_added)
+        game_events.subscribe("level_up", self.on_level_up)
+        game_events.subscribe("quest_accepted", self.on_quest_accepted)
+        game_events.subscribe("quest_abandoned", self.on_quest_ended)
+        game_events.subscribe("quest_expired", self.on_quest_ended)
+        game_events.subscribe("quest_completed", self.on_quest_ended)
+
+    def detach(self):
+        """Stop listening for events"""
+        game_events.unsubscribe("enemy_defeated", self.on_enemy_defeated)
+        game_events.unsubscribe("item_added", self.on_item_added)
+        game_events.unsubscribe("level_up", self.on_level_up)
+        game_events.unsubscribe("quest_accepted", self.on_quest_accepted)
+        game_events.unsubscribe("quest_abandoned", self.on_quest_ended)
+        game_events.unsubscribe("quest_expired", self.on_quest_ended)
+        game_events.unsubscribe("quest_completed", self.on_quest_ended)
+
+    def rebuild(self):
+        """Index every active quest's unfinished objectives (e.g. after a load)"""
+        self.listening = {}
+        progress = self.character.setdefault("quest_progress", {})
+        active = get_quest_set(self.character, "active_quests")
+        for quest_id in list(progress):
+            if quest_id not in active:
+                del progress[quest_id]
+        for quest_id in list(active):
+            self._listen(quest_id)
+
+    def _listen(self, quest_id):
+        """Start tracking a quest (completing it now if it's already done)"""
+        quest = self.quest_data.get(quest_id)
+        if quest is None or not quest.get("objectives"):
+            return
+        counts = self._held_progress(quest_id)
+        for i, objective in enumerate(quest["objectives"]):
+            if objective["type"] == "level":
+                counts[i] = min(self.character.get("level", 1), objective["count"])
+            if counts[i] < objective["count"] or objective["type"] == "collect":
+                self.listening.setdefault(objective_key(objective), set()).add(quest_id)
+        self._finish_if_done(quest_id)
+
+    def _held_progress(self, quest_id):
+        """Get a quest's progress with collect counts set from the inventory"""
+        counts = get_quest_progress(self.character, quest_id, self.quest_data)
+        for i, objective in enumerate(self.quest_data[quest_id]["objectives"]):
+            if objective["type"] == "collect":
+                held = inventory_system.count_item(self.character, objective["target"])
+                counts[i] = min(held, objective["count"])
+        return counts
+
+    def _forget(self, quest_id):
+        """Stop tracking a quest and drop its progress"""
+        quest = self.quest_data.get(quest_id)
+        for objective in quest.get("objectives", []) if quest else ():
+            quest_ids = self.listening.get(objective_key(objective))
+            if quest_ids is not None:
+                quest_ids.discard(quest_id)
+                if not quest_ids:
+                    del self.listening[objective_key(objective)]
+        self.character.get("quest_progress", {}).pop(quest_id, None)
+
+    def advance(self, kind, target, amount=1):
+        """
+        Add progress to every quest waiting on (kind, target)
+
+        For "level" objectives amount is the new level, not an increase;
+        "collect" objectives ignore it and recount the inventory.
+
+        Returns: List of quest IDs that were completed
+        """
+        key = (kind, target)
+        finished = []
+        for quest_id in list(self.listening.get(key, ())):
+# completing an earlier quest can finish this one too (e.g. by levelling up)
+            if quest_id not in self.listening.get(key, ()):
+                continue
+            if kind == "collect":
+                counts = self._held_progress(quest_id)
+            else:
+                counts = get_quest_progress(self.character, quest_id, self.quest_data)
+            still_waiting = kind == "collect"
+            for i, objective in enumerate(self.quest_data[quest_id]["objectives"]):
+                if objective_key(objective) != key:
+                    continue
+                if kind == "level":
+                    counts[i] = min(amount, objective["count"])
+                elif kind != "collect":
+                    counts[i] = min(counts[i] + amount, objective["count"])
+                if counts[i] < objective["count"]:
+                    still_waiting = True
+            if not still_waiting:
+                waiting = self.listening[key]
+                waiting.discard(quest_id)
+                if not waiting:
+                    del self.listening[key]
+            if self._finish_if_done(quest_id):
+                finished.append(quest_id)
+        return finished
+
+    def _finish_if_done(self, quest_id):
+        """Complete the quest if every objective is met"""
+        objectives = self.quest_data[quest_id]["objectives"]
+        counts = self._held_progress(quest_id)
+        if any(count < objective["count"] for count, objective in zip(counts, objectives)):
+            return False
+        rewards = complete_quest(self.character, quest_id, self.quest_data)
+        self.finished.append((quest_id, rewards))
+        return True
+
+    def describe(self, quest_id):
+        """Progress text like 'kill goblin 1/3, reach level 4/5' ('' if none)"""
+        quest = self.quest_data.get(quest_id)
+        if quest is None or not quest.get("objectives"):
+            return ""
+        counts = self._held_progress(quest_id)
+        parts = []
+        for count, objective in zip(counts, quest["objectives"]):
+            if objective["type"] == "level":
+                parts.append(f"reach level {count}/{objective['count']}")
+            else:
+                parts.append(f"{objective['type']} {objective['target']} {count}/{objective['count']}")
+        return ", ".join(parts)
+
+    def take_finished(self):
+        """
+        Get the quests completed by objectives since the last call
+
+        Returns: List of (quest_id, {'xp', 'gold'}) tuples
+        """
+        finished = self.finished
+        self.finished = []
+        return finished
+
+    # ------------------------------------------------------------------ events
+
+    def on_enemy_defeated(self, character, enemy_type, **details):
+        """Count a kill for that enemy type (and for kill:any objectives)"""
+        if character is not self.character:
+            return
+        self.advance("kill", str(enemy_type).lower())
+        self.advance("kill", "any")
+
+    def on_item_added(self, character, item_id, quantity=1, **details):
+        """Recount held items for collect objectives"""
+        if character is self.character:
+            self.advance("collect", item_id, quantity)
+
+    def on_level_up(self, character, level, **details):
+        """Update level objectives"""
+        if character is self.character:
+            self.advance("level", None, level)
+
+    def on_quest_accepted(self, character, quest_id, **details):
+        """Start counting for a newly accepted quest"""
+        if character is self.character:
+            self._listen(quest_id)
+
+    def on_quest_ended(self, character, quest_id, **details):
+        """Stop counting for an abandoned, expired or completed quest"""
+        if character is self.character:
+            self._forget(quest_id)
 
 
 # ============================================================================
@@ -325,12 +1553,12 @@ def display_character_quest_progress(character, quest_data_dict):
 
 def validate_quest_prerequisites(quest_data_dict):
     """
-    Validate that all quest prerequisites exist
+    Validate that all quest prerequisites exist and don't loop
     """
-    for qid, quest in quest_data_dict.items():
-        prereq = quest.get("prerequisite", "NONE")
-        if prereq and str(prereq).upper() != "NONE" and prereq not in quest_data_dict:
-            raise QuestNotFoundError(f"Quest {qid} has invalid prerequisite {prereq}.")
+    graph = get_quest_graph(quest_data_dict)
+    if graph.missing:
+        qid, prereq = next(iter(graph.missing.items()))
+        raise QuestNotFoundError(f"Quest {qid} has invalid prerequisite {prereq}.")
     return True
 
 # ============================================================================
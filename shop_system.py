@@ -0,0 +1,356 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Shop System Module
+
+Name: Kayla Bagley
+
+This module indexes the item catalog for the shop so it can be
+filtered, sorted by price, and shown a page at a time. It also moves
+prices up and down with how much each item is bought and sold.
+"""
+
+import bisect
+from array import array
+
+import game_events
+from inventory_system import parse_item_effect
+
+# ============================================================================
+# SHOP CATALOG
+# ============================================================================
+
+PAGE_SIZE = 10
+
+class ShopCatalog:
+    """
+    Searchable index over the item data from game_data.load_items
+
+    Every item is kept in four lists sorted by (price, item_id): all
+    items, items of its type, items affecting its stat, and items of its
+    type affecting its stat. A query picks the matching list and uses
+    bisect for the price range, so it never scans the catalog.
+
+    The price is the item's base cost, or its current price once a
+    PricingEngine is attached with use_pricing(); after each
+    PricingEngine.tick(), reprice(pricing.changed_items) moves just the
+    items whose price changed, so filters and order match what the shop
+    charges.
+    """
+
+    def __init__(self, item_data_dict=None):
+        """Build the index (empty if no item data is given)"""
+        self.items = {}
+        self.entries = {}
+        self.sorted_lists = {}
+        self.pricing = None
+        if item_data_dict:
+            self.update(item_data_dict)
+
+    def __len__(self):
+        return len(self.items)
+
+    def update(self, item_data_dict):
+        """
+        Bring the index in line with freshly loaded item data
+
+        Only items that were added, removed, or changed are re-indexed.
+
+        Returns: Number of items that changed
+        """
+        changed = 0
+        for item_id in list(self.items):
+            if item_id not in item_data_dict:
+                self._unindex(item_id)
+                changed += 1
+        for item_id, data in item_data_dict.items():
+            old = self.items.get(item_id)
+            if old == data:
+                continue
+            if old is not None:
+                self._unindex(item_id)
+            self._index(item_id, dict(data))
+            changed += 1
+        return changed
+
+    def _keys(self, item_id, data):
+        """The four index keys an item is filed under"""
+        item_type = data.get("type")
+        stat = get_effect_stat(data)
+        return [(None, None), (item_type, None), (None, stat), (item_type, stat)]
+
+    def _price(self, item_id, data):
+        """Price an item is indexed under (current price if there's an engine)"""
+        if self.pricing is not None and item_id in self.pricing.positions:
+            return self.pricing.get_price(item_id)
+        return data.get("cost", 0)
+
+    def _index(self, item_id, data):
+        self.items[item_id] = data
+        entry = (self._price(item_id, data), item_id)
+        self.entries[item_id] = entry
+        for key in self._keys(item_id, data):
+            bisect.insort(self.sorted_lists.setdefault(key, []), entry)
+
+    def _unindex(self, item_id):
+        data = self.items.pop(item_id)
+        entry = self.entries.pop(item_id)
+        for key in self._keys(item_id, data):
+            entries = self.sorted_lists[key]
+            position = bisect.bisect_left(entries, entry)
+            del entries[position]
+            if not entries:
+                del self.sorted_lists[key]
+
+    def use_pricing(self, pricing):
+        """Index by a PricingEngine's current prices (None goes back to base cost)"""
+        self.pricing = pricing
+        self.reprice()
+
+    def reprice(self, item_ids=None):
+        """
+        Move items to their current price in the sorted lists
+
+        Args:
+            item_ids: Items whose price changed (e.g. the engine's
+                      changed_items), or None to re-sort everything
+        """
+        if item_ids is not None:
+            for item_id in item_ids:
+                if item_id in self.items:
+                    data = self.items[item_id]
+                    self._unindex(item_id)
+                    self._index(item_id, data)
+            return
+        self.sorted_lists = {}
+        self.entries = {}
+        for item_id, data in self.items.items():
+            entry = (self._price(item_id, data), item_id)
+            self.entries[item_id] = entry
+            for key in self._keys(item_id, data):
+                self.sorted_lists.setdefault(key, []).append(entry)
+        for entries in self.sorted_lists.values():
+            entries.sort()
+
+    def query(self, item_type=None, stat=None, min_cost=None, max_cost=None, page=1, page_size=PAGE_SIZE):
+        """
+        Find items, cheapest first, one page at a time
+
+        Args:
+            item_type: 'weapon', 'armor', 'consumable', or None for any
+            stat: Stat the item affects (e.g. 'strength'), or None for any
+            min_cost: Lowest price to include (inclusive), or None
+            max_cost: Highest price to include (inclusive), or None
+                      (prices are current prices when pricing is attached)
+            page: Page number starting at 1
+            page_size: Items per page
+
+        Returns: Dictionary {'items': [item_data, ...], 'page': int,
+                             'pages': int, 'total': int}
+        Raises: ValueError if page or page_size is less than 1
+        """
+# e.g. weapons affecting strength under 300 gold, page 3:
+# query("weapon", "strength", max_cost=299, page=3)
+        if page < 1 or page_size < 1:
+            raise ValueError("Page and page size must be at least 1.")
+        entries = self.sorted_lists.get((item_type, stat), [])
+        low = 0
+        high = len(entries)
+        if min_cost is not None:
+            low = bisect.bisect_left(entries, (min_cost, ""))
+        if max_cost is not None:
+            high = bisect.bisect_left(entries, (max_cost + 1, ""))
+        total = max(0, high - low)
+        pages = max(1, -(-total // page_size))
+        start = low + (page - 1) * page_size
+        end = min(high, start + page_size)
+        items = [self.items[item_id] for _, item_id in entries[start:end]]
+        return {"items": items, "page": page, "pages": pages, "total": total}
+
+# ============================================================================
+# DYNAMIC PRICING
+# ============================================================================
+# each tick, an item's price factor moves DEMAND_SENSITIVITY per net unit
+# bought (sold pushes it down) and keeps PRICE_DECAY of its distance
+# from the base price, so prices drift back once trading stops
+
+DEMAND_SENSITIVITY = 0.05
+PRICE_DECAY = 0.8
+MIN_PRICE_FACTOR = 0.5
+MAX_PRICE_FACTOR = 2.0
+
+class PricingEngine:
+    """
+    Supply and demand prices for every item in the catalog
+
+    Items get a fixed position, and their base prices, trade counters,
+    and price factors are kept in parallel arrays. Trades only bump a
+    counter and mark the item active; tick() reprices only the active
+    items (traded, or still drifting back to their base price), so a
+    quiet catalog costs nothing to tick, and the shop reads prices
+    straight from the price table. changed_items lists the items whose
+    price changed on the last tick.
+    """
+
+    def __init__(self, item_data_dict=None):
+        """Start every item at its base price"""
+        self.item_ids = []
+        self.positions = {}
+        self.base_prices = array("l")
+        self.bought = array("l")
+        self.sold = array("l")
+        self.factors = array("d")
+        self.prices = array("l")
+        self.active = set()
+        self.changed_items = []
+        self.ticks = 0
+        if item_data_dict:
+            self.update(item_data_dict)
+
+    def update(self, item_data_dict):
+        """
+        Match the engine to freshly loaded item data
+
+        Items that are still there keep their counters and price factor
+        (with the new base price); removed items are dropped.
+        """
+        old_positions = self.positions
+        old = (self.bought, self.sold, self.factors)
+        self.item_ids = list(item_data_dict)
+        self.positions = {item_id: i for i, item_id in enumerate(self.item_ids)}
+        self.base_prices = array("l", (data.get("cost", 0) for data in item_data_dict.values()))
+        size = len(self.item_ids)
+        self.bought = array("l", [0]) * size
+        self.sold = array("l", [0]) * size
+        self.factors = array("d", [1.0]) * size
+        for item_id, i in self.positions.items():
+            j = old_positions.get(item_id)
+            if j is not None:
+                self.bought[i] = old[0][j]
+                self.sold[i] = old[1][j]
+                self.factors[i] = old[2][j]
+        self.prices = array("l", (round(base * factor) for base, factor in zip(self.base_prices, self.factors)))
+        self.active = {i for i in range(size) if self.bought[i] or self.sold[i] or self.factors[i] != 1.0}
+
+    def attach(self):
+        """Start counting purchases and sales made through inventory_system"""
+        game_events.subscribe("item_purchased", self.record_purchase)
+        game_events.subscribe("item_sold", self.record_sale)
+
+    def detach(self):
+        """Stop counting trades"""
+        game_events.unsubscribe("item_purchased", self.record_purchase)
+        game_events.unsubscribe("item_sold", self.record_sale)
+
+    def record_purchase(self, item_id, quantity=1, **details):
+        """Count units bought (items the engine doesn't know are ignored)"""
+        i = self.positions.get(item_id)
+        if i is not None:
+            self.bought[i] += quantity
+            self.active.add(i)
+
+    def record_sale(self, item_id, quantity=1, **details):
+        """Count units sold back to the shop"""
+        i = self.positions.get(item_id)
+        if i is not None:
+            self.sold[i] += quantity
+            self.active.add(i)
+
+    def tick(self):
+        """
+        Reprice the active items from the trades since the last tick
+
+        An item with no trades whose price is back at its base price
+        settles (factor 1.0) and isn't visited again until it trades.
+
+        Returns: Number of items whose price changed
+        """
+        changed = []
+        settled = []
+        for i in sorted(self.active):
+            net = self.bought[i] - self.sold[i]
+            factor = min(MAX_PRICE_FACTOR, max(MIN_PRICE_FACTOR,
+                         1.0 + (self.factors[i] - 1.0) * PRICE_DECAY + DEMAND_SENSITIVITY * net))
+            price = round(self.base_prices[i] * factor)
+            if price != self.prices[i]:
+                self.prices[i] = price
+                changed.append(self.item_ids[i])
+            if not net and price == self.base_prices[i]:
+                factor = 1.0
+                settled.append(i)
+            self.factors[i] = factor
+            self.bought[i] = 0
+            self.sold[i] = 0
+        self.active.difference_update(settled)
+        self.changed_items = changed
+        self.ticks += 1
+        return len(changed)
+
+    def get_price(self, item_id):
+        """
+        Current buy price of an item
+
+        Raises: KeyError if the item isn't in the catalog
+        """
+        return self.prices[self.positions[item_id]]
+
+    def get_sell_price(self, item_id):
+        """What the shop pays for an item (half the current price)"""
+        return self.get_price(item_id) // 2
+
+    def priced(self, item_id, item_data):
+        """
+        Copy of an item's data with its cost set to the current price
+
+        Used so purchase_item/sell_item charge and pay the live price.
+        """
+        return dict(item_data, cost=self.get_price(item_id))
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def get_effect_stat(item_data):
+    """
+    Get the stat an item's effect changes
+
+    Returns: Stat name, or None if the effect can't be parsed
+    """
+    try:
+        stat_name, _ = parse_item_effect(item_data.get("effect", ""))
+    except ValueError:
+        return None
+    return stat_name
+
+def format_catalog_page(result, pricing=None):
+    """
+    Build the text for one page of query results
+
+    Args:
+        result: Dictionary from ShopCatalog.query
+        pricing: PricingEngine to show current prices from (list prices if None)
+
+    Returns: String ready to print
+    """
+    lines = [f"Items for sale (page {result['page']} of {result['pages']}, {result['total']} items):"]
+    if not result["items"]:
+        lines.append("  Nothing matches.")
+    for data in result["items"]:
+        item_id = data.get("item_id", "?")
+        name = data.get("name", item_id)
+        item_type = data.get("type", "unknown")
+        cost = data.get("cost", 0)
+        if pricing is not None and item_id in pricing.positions:
+            cost = pricing.get_price(item_id)
+        lines.append(f"- {item_id}: {name} [{item_type}] - {cost} gold")
+    return "\n".join(lines)
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=== SHOP SYSTEM TEST ===")
+
+    # import game_data
+    # catalog = ShopCatalog(game_data.load_items())
+    # print(format_catalog_page(catalog.query("weapon", max_cost=300)))
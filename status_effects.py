@@ -0,0 +1,281 @@
+"""
+COMP 163 - Project 3: Quest Chronicles
+Status Effects Module
+
+Name: Kayla Bagley
+
+This module handles ability cooldowns and timed status effects
+(buffs, debuffs, and damage over time) during battles.
+"""
+
+from custom_exceptions import AbilityOnCooldownError
+
+# ============================================================================
+# COOLDOWNS
+# ============================================================================
+# how many turns each class has to wait between special abilities
+
+ABILITY_COOLDOWNS = {
+    "warrior": 2,
+    "mage": 3,
+    "rogue": 2,
+    "cleric": 3,
+}
+DEFAULT_COOLDOWN = 2
+
+# ============================================================================
+# TIMING WHEEL
+# ============================================================================
+
+WHEEL_BITS = 6
+WHEEL_SLOTS = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SLOTS - 1
+WHEEL_LEVELS = 4
+MAX_WHEEL_DELAY = (1 << (WHEEL_BITS * WHEEL_LEVELS)) - 1
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel keyed on turn number
+
+    Level 0 has one slot per turn for the next 64 turns, level 1 one
+    slot per 64 turns, and so on. Entries only move down a level when
+    their slot comes up, so advancing a turn costs O(entries due) instead
+    of looking at every scheduled entry.
+    """
+
+    def __init__(self, start_turn=0):
+        """Create an empty wheel at start_turn"""
+        self.turn = start_turn
+        self.levels = [[[] for _ in range(WHEEL_SLOTS)] for _ in range(WHEEL_LEVELS)]
+        self.size = 0
+
+    def schedule(self, turn, entry):
+        """
+        Schedule an entry to come due on a turn
+
+        Turns at or before the current turn come due on the next advance.
+        """
+        if turn <= self.turn:
+            turn = self.turn + 1
+        self._place(turn, entry)
+        self.size += 1
+
+    def _place(self, turn, entry):
+        """Put an entry in the slot matching how far away its turn is"""
+        slot_turn = turn
+        delay = turn - self.turn
+        if delay > MAX_WHEEL_DELAY:
+            # too far out for the top level, it gets re-placed on cascade
+            slot_turn = self.turn + MAX_WHEEL_DELAY
+            delay = MAX_WHEEL_DELAY
+        level = 0
+        while level < WHEEL_LEVELS - 1 and delay >= (1 << (WHEEL_BITS * (level + 1))):
+            level += 1
+        slot = (slot_turn >> (WHEEL_BITS * level)) & WHEEL_MASK
+        self.levels[level][slot].append((turn, entry))
+
+    def advance(self):
+        """
+        Move forward one turn
+
+        Returns: List of entries due on the new turn
+        """
+# when the lower level wraps around, the matching higher slot gets
+# spread back out into the lower levels
+        self.turn += 1
+        turn = self.turn
+        level = 1
+        while level < WHEEL_LEVELS and (turn & ((1 << (WHEEL_BITS * level)) - 1)) == 0:
+            level += 1
+        for cascade_level in range(level - 1, 0, -1):
+            slot = (turn >> (WHEEL_BITS * cascade_level)) & WHEEL_MASK
+            bucket = self.levels[cascade_level][slot]
+            self.levels[cascade_level][slot] = []
+            for due_turn, entry in bucket:
+                self._place(due_turn, entry)
+        slot = turn & WHEEL_MASK
+        bucket = self.levels[0][slot]
+        self.levels[0][slot] = []
+        due = []
+        for due_turn, entry in bucket:
+            if due_turn == turn:
+                due.append(entry)
+            else:
+                # clamped far-future entry, not due yet
+                self._place(due_turn, entry)
+        self.size -= len(due)
+        return due
+
+# ============================================================================
+# EFFECT TRACKER
+# ============================================================================
+
+class EffectTracker:
+    """
+    Cooldowns and status effects for the combatants in one battle
+
+    Stat effects change the combatant's stat right away and are undone
+    when they expire. Damage over time is summed per combatant, so a
+    turn only touches combatants that are actually taking damage.
+    """
+
+    def __init__(self):
+        """Start at turn 0 with nothing active"""
+        self.wheel = TimingWheel()
+        self.cooldowns = {}
+        self.active = {}
+        self.dot_totals = {}
+        self.dot_targets = {}
+        self.next_effect_id = 0
+
+    @property
+    def turn(self):
+        """Current turn number"""
+        return self.wheel.turn
+
+    # ---------------------------------------------------------------- cooldowns
+
+    def check_ability_ready(self, combatant):
+        """
+        Make sure a combatant's special ability can be used
+
+        Raises: AbilityOnCooldownError if the ability is still cooling down
+        """
+        ready_turn = self.cooldowns.get(id(combatant), 0)
+        if self.turn < ready_turn:
+            remaining = ready_turn - self.turn
+            raise AbilityOnCooldownError(f"Special ability is on cooldown for {remaining} more turn(s).")
+
+    def start_cooldown(self, combatant):
+        """Put a combatant's special ability on its class cooldown"""
+        char_class = combatant.get("class", "").lower()
+        cooldown = ABILITY_COOLDOWNS.get(char_class, DEFAULT_COOLDOWN)
+        self.cooldowns[id(combatant)] = self.turn + cooldown + 1
+
+    def cooldown_remaining(self, combatant):
+        """Turns left before the combatant's ability is ready (0 if ready)"""
+        return max(0, self.cooldowns.get(id(combatant), 0) - self.turn)
+
+    # ------------------------------------------------------------------ effects
+
+    def add_effect(self, combatant, name, duration, stat=None, amount=0, damage_per_turn=0):
+        """
+        Apply a status effect to a combatant
+
+        Args:
+            combatant: Character or enemy dictionary
+            name: Display name (e.g. "Burn", "Blessing")
+            duration: Number of turns the effect lasts
+            stat: Stat changed while active (e.g. "strength"), or None
+            amount: How much the stat changes (negative for debuffs)
+            damage_per_turn: Damage dealt at the start of each turn
+
+        Returns: The effect dictionary
+        Raises: ValueError if duration is not positive
+        """
+        if duration < 1:
+            raise ValueError("Effect duration must be at least 1 turn.")
+        self.next_effect_id += 1
+        key = id(combatant)
+        effect = {
+            "id": self.next_effect_id,
+            "name": name,
+            "target": combatant,
+            "stat": stat,
+            "amount": amount,
+            "damage_per_turn": damage_per_turn,
+            "expires_turn": self.turn + duration
+        }
+        if stat is not None and amount:
+            combatant[stat] = combatant.get(stat, 0) + amount
+            modifiers = combatant.setdefault("stat_modifiers", {})
+            modifiers[stat] = modifiers.get(stat, 0) + amount
+        if damage_per_turn:
+            self.dot_totals[key] = self.dot_totals.get(key, 0) + damage_per_turn
+            self.dot_targets[key] = combatant
+        self.active.setdefault(key, {})[effect["id"]] = effect
+        self.wheel.schedule(effect["expires_turn"], effect)
+        return effect
+
+    def get_effects(self, combatant):
+        """List the effects currently on a combatant"""
+        return list(self.active.get(id(combatant), {}).values())
+
+    def advance_turn(self):
+        """
+        Move to the next turn
+
+        Collects damage over time, then expires the effects due this
+        turn (so a 3 turn burn hits 3 times).
+
+        Returns: Dictionary {'expired': [effect, ...],
+                             'damage': [(combatant, amount), ...]}
+                 The caller applies the damage so battle counters stay right.
+        """
+        damage = []
+        for key, total in self.dot_totals.items():
+            combatant = self.dot_targets[key]
+            if combatant.get("health", 0) > 0:
+                damage.append((combatant, total))
+        expired = []
+        for effect in self.wheel.advance():
+            if self._remove(effect):
+                expired.append(effect)
+        return {"expired": expired, "damage": damage}
+
+    def clear(self):
+        """
+        Remove every remaining effect (undoing stat changes)
+
+        Called when a battle ends so buffs don't carry over.
+
+        Returns: List of effects that were removed
+        """
+        removed = []
+        for effects in list(self.active.values()):
+            for effect in list(effects.values()):
+                if self._remove(effect):
+                    removed.append(effect)
+        self.wheel = TimingWheel(self.turn)
+        self.cooldowns.clear()
+        return removed
+
+    def _remove(self, effect):
+        """Undo an effect; returns False if it was already removed"""
+        target = effect["target"]
+        key = id(target)
+        effects = self.active.get(key)
+        if not effects or effect["id"] not in effects:
+            return False
+        del effects[effect["id"]]
+        if not effects:
+            del self.active[key]
+        stat = effect["stat"]
+        if stat is not None and effect["amount"]:
+            target[stat] = target.get(stat, 0) - effect["amount"]
+            modifiers = target.get("stat_modifiers", {})
+            modifiers[stat] = modifiers.get(stat, 0) - effect["amount"]
+            if modifiers.get(stat) == 0:
+                del modifiers[stat]
+        if effect["damage_per_turn"]:
+            remaining = self.dot_totals[key] - effect["damage_per_turn"]
+            if remaining:
+                self.dot_totals[key] = remaining
+            else:
+                del self.dot_totals[key]
+                del self.dot_targets[key]
+        return True
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=== STATUS EFFECTS TEST ===")
+
+    # Test a burn wearing off
+    # goblin = {'name': 'Goblin', 'health': 50, 'strength': 8}
+    # tracker = EffectTracker()
+    # tracker.add_effect(goblin, "Burn", 2, damage_per_turn=5)
+    # for _ in range(3):
+    #     print(tracker.advance_turn())
@@ -0,0 +1,474 @@
+"""
+Test Combat Features
+Tests for the data-driven enemy catalog, loot, and the extended combat mechanics
+"""
+
+import pytest
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_exceptions import *
+import character_manager
+import combat_system
+import encounter_system
+import game_data
+import status_effects
+import battle_log
+import loot_system
+import inventory_system
+
+# ============================================================================
+# ENEMY CATALOG TESTS
+# ============================================================================
+
+def test_enemy_data_loads():
+    """Test that enemies.txt loads with levels and weights"""
+    enemies = game_data.load_enemies("data/enemies.txt")
+    
+    assert "goblin" in enemies
+    assert enemies["dragon"]["max_level"] is None
+    assert enemies["goblin"]["spawn_weight"] > 0
+
+def test_create_enemy_returns_independent_copy():
+    """Test that enemies are copies of the template, not the template"""
+    first = combat_system.create_enemy("goblin")
+    first['health'] = 0
+    second = combat_system.create_enemy("Goblin")
+    
+    assert second['health'] == second['max_health'] == 50
+    assert second['type'] == "goblin"
+
+def test_random_enemy_respects_level_bands():
+    """Test that spawn tables follow the level ranges in the data file"""
+    for _ in range(20):
+        assert combat_system.get_random_enemy_for_level(1)['type'] == "goblin"
+        assert combat_system.get_random_enemy_for_level(4)['type'] == "orc"
+        assert combat_system.get_random_enemy_for_level(50)['type'] == "dragon"
+
+def test_alias_table_matches_weights():
+    """Test that alias draws follow the given weights"""
+    probabilities, aliases = combat_system.build_alias_table([1, 3])
+    rng = random.Random(7)
+    draws = [combat_system.alias_draw(probabilities, aliases, rng) for _ in range(4000)]
+    
+    share = draws.count(1) / len(draws)
+    assert 0.70 < share < 0.80
+
+def test_invalid_enemy_data_rejected():
+    """Test that a bad level range is a data format error"""
+    with open("test_bad_enemies.txt", "w") as f:
+        f.write("ENEMY_ID: imp\nHEALTH: 10\nSTRENGTH: 1\nMAGIC: 1\n"
+                "XP_REWARD: 1\nGOLD_REWARD: 1\nMIN_LEVEL: 5\nMAX_LEVEL: 2\n")
+    
+    try:
+        with pytest.raises(InvalidDataFormatError):
+            game_data.load_enemies("test_bad_enemies.txt")
+    finally:
+        os.remove("test_bad_enemies.txt")
+
+# ============================================================================
+# ENCOUNTER TESTS
+# ============================================================================
+
+def test_party_defeats_small_horde():
+    """Test that a full party beats a few goblins and collects every reward"""
+    party = [
+        character_manager.create_character("A", "Warrior"),
+        character_manager.create_character("B", "Mage"),
+        character_manager.create_character("C", "Rogue"),
+        character_manager.create_character("D", "Cleric"),
+    ]
+    horde = encounter_system.create_horde(1, 5)
+    battle = encounter_system.PartyBattle(party, horde, rng=random.Random(3))
+    result = battle.start_battle()
+    
+    assert result['winner'] == "player"
+    assert len(result['defeated']) == 5
+    assert result['xp_gained'] == 5 * horde[0]['xp_reward']
+    assert battle.horde.alive_count() == 0
+
+def test_horde_overwhelms_lone_character():
+    """Test that the enemy side wins when the party falls"""
+    party = [character_manager.create_character("Solo", "Mage")]
+    horde = [combat_system.create_enemy("dragon") for _ in range(3)]
+    result = encounter_system.PartyBattle(party, horde, rng=random.Random(1)).start_battle()
+    
+    assert result['winner'] == "enemy"
+    assert result['xp_gained'] == 0
+    assert party[0]['health'] == 0
+
+def test_faster_combatants_act_more_often():
+    """Test that the scheduler gives speed 20 twice the actions of speed 10"""
+    fast = {'name': 'Fast', 'health': 1000, 'max_health': 1000, 'strength': 1, 'speed': 20}
+    slow = {'name': 'Slow', 'health': 1000, 'max_health': 1000, 'strength': 1, 'speed': 10}
+    battle = encounter_system.PartyBattle([fast], [slow])
+    for _ in range(30):
+        battle.take_turn()
+    
+    assert fast['health'] == 1000 - 10
+    assert slow['health'] == 1000 - 20
+
+def test_weakest_policy_targets_lowest_health():
+    """Test the weakest-first targeting policy"""
+    horde = [combat_system.create_enemy("orc") for _ in range(3)]
+    horde[1]['health'] = 5
+    battle = encounter_system.PartyBattle([character_manager.create_character("T", "Warrior")], horde)
+    
+    assert battle.horde.pick_target("weakest", random.Random()) == 1
+
+def test_strongest_policy_follows_strength_changes():
+    """Test that buffs, debuffs and expiry move the strongest target"""
+    horde = [combat_system.create_enemy("orc") for _ in range(3)]
+    horde[0]['strength'] = 20
+    battle = encounter_system.PartyBattle([character_manager.create_character("T", "Warrior")], horde)
+    rng = random.Random()
+    assert battle.horde.pick_target("strongest", rng) == 0
+    
+    battle.effects.add_effect(horde[0], "Shaken", 1, stat="strength", amount=-10)
+    battle.horde.strength_changed(0)
+    assert battle.horde.pick_target("strongest", rng) == 1
+    
+    battle.process_effects()
+    assert horde[0]['strength'] == 20
+    assert battle.horde.pick_target("strongest", rng) == 0
+    
+    # an unreported drop is caught when the stale entry surfaces
+    horde[0]['strength'] = 1
+    assert battle.horde.pick_target("strongest", rng) == 1
+    battle.horde.members[1]['health'] = 0
+    battle.horde.health_changed(1)
+    assert battle.horde.pick_target("strongest", rng) == 2
+
+def test_encounter_size_limits():
+    """Test that oversized encounters are rejected"""
+    char = character_manager.create_character("Limit", "Warrior")
+    with pytest.raises(ValueError):
+        encounter_system.PartyBattle([char], [])
+    with pytest.raises(ValueError):
+        encounter_system.create_horde(1, encounter_system.MAX_ENEMIES + 1)
+
+# ============================================================================
+# COOLDOWN AND STATUS EFFECT TESTS
+# ============================================================================
+
+def test_special_ability_goes_on_cooldown():
+    """Test that AbilityOnCooldownError is raised when an ability is spammed"""
+    char = character_manager.create_character("Caster", "Mage")
+    enemy = combat_system.create_enemy("dragon")
+    tracker = status_effects.EffectTracker()
+    
+    combat_system.use_special_ability(char, enemy, tracker)
+    with pytest.raises(AbilityOnCooldownError):
+        combat_system.use_special_ability(char, enemy, tracker)
+    
+    for _ in range(status_effects.ABILITY_COOLDOWNS["mage"] + 1):
+        tracker.advance_turn()
+    combat_system.use_special_ability(char, enemy, tracker)
+
+def test_stat_effect_reverts_on_expiry():
+    """Test that a debuff is undone when it wears off"""
+    enemy = combat_system.create_enemy("orc")
+    tracker = status_effects.EffectTracker()
+    tracker.add_effect(enemy, "Shaken", 2, stat="strength", amount=-3)
+    
+    assert enemy['strength'] == 9
+    tracker.advance_turn()
+    assert enemy['strength'] == 9
+    result = tracker.advance_turn()
+    assert enemy['strength'] == 12
+    assert [effect['name'] for effect in result['expired']] == ["Shaken"]
+    assert tracker.get_effects(enemy) == []
+
+def test_damage_over_time_ticks_for_duration():
+    """Test that a 3 turn burn deals damage on 3 turns"""
+    enemy = combat_system.create_enemy("goblin")
+    tracker = status_effects.EffectTracker()
+    tracker.add_effect(enemy, "Burn", 3, damage_per_turn=4)
+    
+    ticks = [tracker.advance_turn()['damage'] for _ in range(5)]
+    assert [len(t) for t in ticks] == [1, 1, 1, 0, 0]
+    assert ticks[0][0] == (enemy, 4)
+
+def test_battle_end_clears_buffs():
+    """Test that buffs don't carry over after a battle"""
+    char = character_manager.create_character("Priest", "Cleric")
+    battle = combat_system.SimpleBattle(char, combat_system.create_enemy("goblin"))
+    battle.effects.add_effect(char, "Blessing", 5, stat="strength", amount=2)
+    
+    assert char['strength'] == 12
+    battle.effects.clear()
+    assert char['strength'] == 10
+
+def test_timing_wheel_handles_far_timers():
+    """Test that timers beyond the first wheel level still fire on time"""
+    wheel = status_effects.TimingWheel()
+    for turn in (1, 63, 64, 65, 4095, 4096, 5000):
+        wheel.schedule(turn, turn)
+    
+    fired = []
+    for _ in range(5000):
+        for entry in wheel.advance():
+            fired.append((wheel.turn, entry))
+    assert all(turn == entry for turn, entry in fired)
+    assert len(fired) == 7
+
+# ============================================================================
+# BATTLE LOG TESTS
+# ============================================================================
+
+class CountingStream:
+    """Stream stand-in that counts write calls"""
+    def __init__(self):
+        self.writes = []
+    def write(self, text):
+        self.writes.append(text)
+
+def test_battle_log_is_bounded():
+    """Test that the ring buffer keeps only the newest events"""
+    log = battle_log.BattleLog(capacity=3, render=False)
+    for turn in range(1, 6):
+        log.record(turn, "Hero", "attack", "Goblin", 5, 50 - turn * 5)
+    
+    assert [event['turn'] for event in log.to_dicts()] == [3, 4, 5]
+    assert log.to_columns()['damage'] == [5, 5, 5]
+
+def test_battle_log_renders_in_one_write():
+    """Test that pending events are written in a single batch"""
+    stream = CountingStream()
+    log = battle_log.BattleLog(stream=stream)
+    log.record(1, "Hero", "attack", "Goblin", 5, 45, "You attack the Goblin for 5 damage.")
+    log.record(1, "Goblin", "attack", "Hero", 3, 117)
+    log.flush("footer\n")
+    log.flush()
+    
+    assert len(stream.writes) == 1
+    assert "You attack the Goblin" in stream.writes[0]
+    assert stream.writes[0].endswith("footer\n")
+
+def test_disabled_battle_log_skips_everything():
+    """Test that a disabled log keeps nothing and a long fight can't pile up output"""
+    log = battle_log.BattleLog(enabled=False, stream=CountingStream())
+    log.record(1, "Hero", "attack", "Goblin", 5, 45)
+    log.flush("footer\n")
+    assert log.to_dicts() == [] and log.pending == [] and log.stream.writes == []
+    
+    stream = CountingStream()
+    log = battle_log.BattleLog(capacity=4, stream=stream)
+    for turn in range(10):
+        log.record(turn, "Hero", "attack", "Goblin", 1, 50)
+    assert len(log.pending) < 4
+    assert len(stream.writes) == 2
+    
+    battle = encounter_system.PartyBattle([character_manager.create_character("T", "Warrior")],
+                                          [combat_system.create_enemy("goblin")])
+    battle.start_battle()
+    assert battle.log.to_dicts() == []
+
+def test_battle_log_export(tmp_path):
+    """Test JSON Lines and columnar exports"""
+    import json
+    log = battle_log.BattleLog(render=False)
+    log.record(1, "Hero", "attack", "Goblin", 5, 45)
+    log.record(2, "Goblin", "attack", "Hero", 3, 117)
+    
+    jsonl_path = tmp_path / "events.jsonl"
+    assert log.export_jsonl(str(jsonl_path)) == 2
+    rows = [json.loads(line) for line in jsonl_path.read_text().splitlines()]
+    assert rows[1]['actor'] == "Goblin"
+    
+    columns_path = tmp_path / "events.json"
+    log.export_columns(str(columns_path))
+    assert json.loads(columns_path.read_text())['hp_after'] == [45, 117]
+
+def test_simple_battle_records_events(monkeypatch):
+    """Test that a scripted battle fills the log without printing"""
+    monkeypatch.setattr("builtins.input", lambda prompt="": "1")
+    char = character_manager.create_character("Logger", "Warrior")
+    log = battle_log.BattleLog(render=False)
+    result = combat_system.SimpleBattle(char, combat_system.create_enemy("goblin"), log).start_battle()
+    
+    assert result['winner'] == "player"
+    assert log.pending == []
+    assert log.to_dicts()[-1]['hp_after'] == 0
+
+# ============================================================================
+# OUTCOME CACHE TESTS
+# ============================================================================
+
+def test_outcome_cache_certain_win_is_analytic():
+    """Test that a trivial fight is cached as a certain win"""
+    char = character_manager.create_character("Vet", "Warrior")
+    char['level'] = 10
+    char['strength'] = 40
+    cache = encounter_system.OutcomeCache()
+    
+    outcome = cache.lookup(char, "goblin")
+    assert outcome['win_rate'] == 1.0
+    assert outcome['avg_hp_loss'] < char['health']
+    assert cache.lookup(char, "goblin") is outcome
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_outcome_cache_simulates_hard_fights():
+    """Test that a hopeless fight is simulated as a loss"""
+    char = character_manager.create_character("Rookie", "Mage")
+    cache = encounter_system.OutcomeCache(samples=3, rng=random.Random(0))
+    
+    assert cache.lookup(char, "dragon")['win_rate'] == 0.0
+
+def test_outcome_cache_evicts_least_recent():
+    """Test LRU eviction once capacity is reached"""
+    char = character_manager.create_character("Lru", "Warrior")
+    cache = encounter_system.OutcomeCache(capacity=2)
+    cache.lookup(char, "goblin")
+    cache.lookup(char, "orc")
+    cache.lookup(char, "goblin")
+    char['strength'] += 1
+    cache.lookup(char, "goblin")
+    
+    assert len(cache) == 2
+    char['strength'] -= 1
+    assert encounter_system.outcome_key(char, "orc") not in cache.entries
+    assert encounter_system.outcome_key(char, "goblin") in cache.entries
+
+def test_explore_auto_resolves_trivial_fight(monkeypatch):
+    """Test that explore skips the battle loop for a sure win"""
+    import main
+    char = character_manager.create_character("Explorer", "Warrior")
+    char['strength'] = 60
+    monkeypatch.setattr(main, "current_character", char)
+    monkeypatch.setattr("builtins.input", lambda prompt="": pytest.fail("battle was played"))
+    gold = char['gold']
+    main.explore()
+    
+    assert char['gold'] > gold
+    assert char['health'] > 0
+
+# ============================================================================
+# EQUIPMENT RECOMMENDATION TESTS
+# ============================================================================
+
+REC_ITEMS = {
+    'twig': {'type': 'weapon', 'effect': 'strength:1'},
+    'axe': {'type': 'weapon', 'effect': 'strength:12'},
+    'vest': {'type': 'armor', 'effect': 'max_health:5'},
+    'plate': {'type': 'armor', 'effect': 'max_health:40'},
+    'potion': {'type': 'consumable', 'effect': 'health:20'},
+}
+
+def test_level_spawn_odds_match_spawn_weights():
+    """Test that odds read from the alias table add up per level"""
+    odds = encounter_system.level_spawn_odds(1)
+    
+    assert odds == {'goblin': pytest.approx(1.0)}
+    assert sum(encounter_system.level_spawn_odds(50).values()) == pytest.approx(1.0)
+
+def test_recommend_equipment_ranks_and_uses_cache(monkeypatch):
+    """Test that better gear ranks first and a repeat query hits the cache"""
+    monkeypatch.setattr(inventory_system, "MAX_INVENTORY_SIZE", 1000)
+    char = character_manager.create_character("Picky", "Warrior")
+    char['inventory'] = ['twig', 'vest', 'potion'] + ['axe'] * 200 + ['plate'] * 300
+    inventory_system.equip_weapon(char, 'twig', REC_ITEMS['twig'])
+    cache = encounter_system.OutcomeCache(samples=3, rng=random.Random(1))
+    
+    ranked = encounter_system.recommend_equipment(char, REC_ITEMS, cache, slot='weapon')
+    assert [option['item_id'] for option in ranked] == ['axe', 'twig']
+    assert ranked[1]['equipped']
+    
+    armor = encounter_system.recommend_equipment(char, REC_ITEMS, cache, slot='armor')
+    assert armor[0]['item_id'] == 'plate'
+    misses = cache.misses
+    encounter_system.recommend_equipment(char, REC_ITEMS, cache)
+    assert cache.misses == misses
+    with pytest.raises(ValueError):
+        encounter_system.recommend_equipment(char, REC_ITEMS, cache, slot='ring')
+
+# ============================================================================
+# LOOT TESTS
+# ============================================================================
+
+def make_loot_tables(**overrides):
+    """Small loot table data: a boss that rolls a shared potion table"""
+    tables = {
+        'potions': {'table_id': 'potions', 'rolls': 1, 'entries': [
+            {'kind': 'item', 'ref': 'potion', 'weight': 1, 'min_quantity': 2, 'max_quantity': 4}]},
+        'boss': {'table_id': 'boss', 'rolls': 3, 'entries': [
+            {'kind': 'table', 'ref': 'potions', 'weight': 1, 'min_quantity': 1, 'max_quantity': 1},
+            {'kind': 'item', 'ref': 'crown', 'weight': 1, 'min_quantity': 1, 'max_quantity': 1},
+            {'kind': 'nothing', 'ref': None, 'weight': 2, 'min_quantity': 1, 'max_quantity': 1}]},
+    }
+    tables.update(overrides)
+    return tables
+
+def test_loot_tables_load():
+    """Test that loot_tables.txt parses entries, ranges, and nested tables"""
+    tables = game_data.load_loot_tables("data/loot_tables.txt")
+    
+    assert tables['orc']['rolls'] == 2
+    assert tables['goblin']['entries'][1]['kind'] == "table"
+    assert game_data.parse_loot_entry("super_health_potion, 3, 1-3")['max_quantity'] == 3
+    with pytest.raises(InvalidDataFormatError):
+        game_data.parse_loot_entry("potion, heavy")
+    
+    items = game_data.load_items("data/items.txt")
+    assert set(loot_system.load_loot_tables(item_ids=items)) == set(tables)
+
+def test_loot_compile_rejects_bad_references():
+    """Test unknown tables, unknown items, and cycles are caught"""
+    loop = {'table_id': 'potions', 'rolls': 1, 'entries': [
+        {'kind': 'table', 'ref': 'boss', 'weight': 1, 'min_quantity': 1, 'max_quantity': 1}]}
+    with pytest.raises(InvalidDataFormatError):
+        loot_system.compile_loot_tables(make_loot_tables(potions=loop))
+    with pytest.raises(InvalidDataFormatError):
+        loot_system.compile_loot_tables(make_loot_tables(), item_ids={'potion'})
+    
+    missing = make_loot_tables()
+    del missing['potions']
+    with pytest.raises(InvalidDataFormatError):
+        loot_system.compile_loot_tables(missing)
+
+def test_roll_loot_follows_weights_and_nesting():
+    """Test drop rates and that nested tables give their quantities"""
+    tables = loot_system.compile_loot_tables(make_loot_tables())
+    rng = random.Random(7)
+    crowns = 0
+    for _ in range(2000):
+        drops = loot_system.roll_loot('boss', rng, tables)
+        crowns += drops.get('crown', 0)
+        assert drops.get('potion', 0) <= 12
+    
+    # 3 rolls at 1/4 each
+    assert 1350 < crowns < 1650
+    assert loot_system.roll_loot('nobody', rng, tables) == {}
+
+def test_award_loot_handles_overflow(monkeypatch):
+    """Test that drops that don't fit are reported instead of raising"""
+    monkeypatch.setattr(inventory_system, "MAX_INVENTORY_SIZE", 2)
+    char = {'inventory': ['junk'], 'gold': 0}
+    
+    awarded, overflow = loot_system.award_loot(char, {'gem': 3, 'coin': 1})
+    assert awarded == {'gem': 1}
+    assert overflow == {'gem': 2, 'coin': 1}
+    assert len(char['inventory']) == 2
+
+def test_won_battle_drops_loot(monkeypatch):
+    """Test that winning a battle puts the enemy's loot in the inventory"""
+    tables = loot_system.compile_loot_tables(make_loot_tables())
+    monkeypatch.setattr(loot_system, "_loot_tables", tables)
+    monkeypatch.setattr("builtins.input", lambda prompt="": "1")
+    char = character_manager.create_character("Looter", "Warrior")
+    char['strength'] = 500
+    boss = {'name': 'Boss', 'type': 'boss', 'health': 10, 'max_health': 10,
+            'strength': 1, 'magic': 0, 'xp_reward': 5, 'gold_reward': 5}
+    
+    battle = combat_system.SimpleBattle(char, boss, battle_log.BattleLog(render=False))
+    result = battle.start_battle()
+    assert result['winner'] == "player"
+    for item_id, quantity in result['loot'].items():
+        assert inventory_system.count_item(char, item_id) == quantity
+    assert result['overflow'] == {}
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,653 @@
+"""
+Test Inventory Features
+Tests for stacked inventories, transactions, equipment, crafting, the bank, and the shop extensions
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_exceptions import *
+import character_manager
+import inventory_system
+import game_data
+import shop_system
+import game_events
+import bank_storage
+
+# ============================================================================
+# STACKED INVENTORY TESTS
+# ============================================================================
+
+def test_plain_list_inventory_is_converted():
+    """Test that a plain list inventory gets counts and stays a list"""
+    char = {'inventory': ['potion', 'sword', 'potion'], 'gold': 0}
+    
+    assert inventory_system.count_item(char, 'potion') == 2
+    assert isinstance(char['inventory'], list)
+    assert isinstance(char['inventory'], inventory_system.StackedInventory)
+    assert sorted(char['inventory']) == ['potion', 'potion', 'sword']
+
+def test_remove_keeps_counts_and_positions_in_sync(monkeypatch):
+    """Test many removals against a plain list model"""
+    monkeypatch.setattr(inventory_system, "MAX_INVENTORY_SIZE", 1000)
+    char = {'inventory': []}
+    model = []
+    for i in range(200):
+        item = f"item{i % 7}"
+        inventory_system.add_item_to_inventory(char, item)
+        model.append(item)
+    for i in range(0, 200, 3):
+        item = f"item{i % 7}"
+        inventory_system.remove_item_from_inventory(char, item)
+        model.remove(item)
+    
+    inventory = char['inventory']
+    assert sorted(inventory) == sorted(model)
+    for item in set(model):
+        assert inventory.count(item) == model.count(item)
+        assert all(inventory[index] == item for index in inventory.positions[item])
+
+def test_stack_limits_share_slots():
+    """Test that stackable items share a slot up to their limit"""
+    inventory_system.register_stack_limits({'health_potion': {'stack_limit': 10}})
+    try:
+        char = {'inventory': []}
+        for _ in range(10):
+            inventory_system.add_item_to_inventory(char, 'health_potion')
+        assert inventory_system.get_inventory_space_remaining(char) == inventory_system.MAX_INVENTORY_SIZE - 1
+        
+        inventory_system.add_item_to_inventory(char, 'health_potion')
+        assert inventory_system.get_inventory_space_remaining(char) == inventory_system.MAX_INVENTORY_SIZE - 2
+    finally:
+        inventory_system.register_stack_limits({})
+
+def test_stacked_inventory_saves_as_list():
+    """Test that a stacked inventory saves and loads like before"""
+    char = character_manager.create_character("StackSave", "Rogue")
+    inventory_system.add_item_to_inventory(char, 'health_potion')
+    inventory_system.add_item_to_inventory(char, 'iron_sword')
+    character_manager.save_character(char)
+    try:
+        loaded = character_manager.load_character("StackSave")
+        assert sorted(loaded['inventory']) == ['health_potion', 'iron_sword']
+        assert inventory_system.has_item(loaded, 'iron_sword')
+    finally:
+        character_manager.delete_character("StackSave")
+
+def test_item_stack_limit_is_parsed():
+    """Test that STACK_LIMIT is read from items.txt"""
+    items = game_data.load_items("data/items.txt")
+    
+    assert items['health_potion']['stack_limit'] == 10
+    assert items['iron_sword']['stack_limit'] == 1
+
+# ============================================================================
+# TRANSACTION TESTS
+# ============================================================================
+
+def test_transaction_rolls_back_on_error():
+    """Test that an exception inside the block leaves the character untouched"""
+    char = {'inventory': ['gem'], 'gold': 100, 'strength': 10}
+    
+    with pytest.raises(RuntimeError):
+        with inventory_system.transaction(char) as tx:
+            tx.add_gold(-50)
+            tx.remove_item('gem')
+            tx.change_stat('strength', 5)
+            raise RuntimeError("interrupted")
+    
+    assert char['gold'] == 100
+    assert list(char['inventory']) == ['gem']
+    assert char['strength'] == 10
+
+def test_bulk_purchase_is_all_or_nothing(monkeypatch):
+    """Test that an order that doesn't fit changes nothing"""
+    monkeypatch.setattr(inventory_system, "MAX_INVENTORY_SIZE", 3)
+    items = {'sword': {'cost': 10}, 'shield': {'cost': 20}}
+    char = {'inventory': [], 'gold': 1000}
+    
+    with pytest.raises(InventoryFullError):
+        inventory_system.purchase_items(char, [('sword', 2), ('shield', 2)], items)
+    assert char['gold'] == 1000
+    assert len(char['inventory']) == 0
+    
+    spent = inventory_system.purchase_items(char, [('sword', 2), ('shield', 1)], items)
+    assert spent == 40
+    assert char['gold'] == 960
+    assert inventory_system.count_item(char, 'sword') == 2
+
+def test_bulk_sell():
+    """Test selling several items at once"""
+    items = {'sword': {'cost': 10}, 'shield': {'cost': 25}}
+    char = {'inventory': ['sword', 'sword', 'shield'], 'gold': 0}
+    
+    with pytest.raises(ItemNotFoundError):
+        inventory_system.sell_items(char, [('sword', 3)], items)
+    assert char['gold'] == 0
+    
+    assert inventory_system.sell_items(char, [('sword', 2), ('shield', 1)], items) == 22
+    assert len(char['inventory']) == 0
+
+# ============================================================================
+# SORT AND SEARCH TESTS
+# ============================================================================
+
+SEARCH_ITEMS = {
+    'health_potion': {'name': 'Health Potion', 'type': 'consumable', 'effect': 'health:20', 'cost': 25},
+    'super_health_potion': {'name': 'Super Health Potion', 'type': 'consumable', 'effect': 'health:50', 'cost': 75},
+    'iron_sword': {'name': 'Iron Sword', 'type': 'weapon', 'effect': 'strength:5', 'cost': 100},
+    'steel_sword': {'name': 'Steel Sword', 'type': 'weapon', 'effect': 'strength:10', 'cost': 250},
+    'leather_armor': {'name': 'Leather Armor', 'type': 'armor', 'effect': 'max_health:10', 'cost': 75},
+}
+
+def test_sort_inventory_groups_stacks():
+    """Test each sort key and that the list ends up grouped"""
+    char = {'inventory': ['steel_sword', 'health_potion', 'iron_sword', 'health_potion', 'leather_armor']}
+    
+    stacks = inventory_system.sort_inventory(char, SEARCH_ITEMS, "value")
+    assert [item_id for item_id, _ in stacks] == ['health_potion', 'leather_armor', 'iron_sword', 'steel_sword']
+    assert list(char['inventory'][:2]) == ['health_potion', 'health_potion']
+    
+    by_stat = inventory_system.sorted_stacks(char, SEARCH_ITEMS, "stat")
+    assert [item_id for item_id, _ in by_stat][-2:] == ['steel_sword', 'iron_sword']
+    by_type = inventory_system.sorted_stacks(char, SEARCH_ITEMS, "type", reverse=True)
+    assert by_type[0][0] in ('iron_sword', 'steel_sword')
+    with pytest.raises(ValueError):
+        inventory_system.sorted_stacks(char, SEARCH_ITEMS, "weight")
+
+def test_compact_keeps_counts_and_positions():
+    """Test that compacting groups duplicates without changing counts"""
+    char = {'inventory': ['b', 'a', 'b', 'c', 'a', 'b']}
+    inventory = inventory_system.get_inventory(char)
+    
+    assert list(inventory) == ['b', 'b', 'b', 'a', 'a', 'c']
+    inventory.extend(['a', 'c'])
+    inventory_system.compact_inventory(char)
+    assert list(inventory) == ['b', 'b', 'b', 'a', 'a', 'a', 'c', 'c']
+    
+    inventory.remove('b')
+    assert inventory.count('b') == 2
+    assert all(inventory[i] == item_id for item_id, spots in inventory.positions.items() for i in spots)
+
+def test_search_by_prefix_and_substring():
+    """Test name search only returns items the character has"""
+    char = {'inventory': ['super_health_potion', 'health_potion', 'health_potion', 'steel_sword']}
+    
+    assert inventory_system.search_inventory(char, "potion", SEARCH_ITEMS) == [
+        ('health_potion', 2), ('super_health_potion', 1)]
+    assert inventory_system.search_inventory(char, "SW", SEARCH_ITEMS) == [('steel_sword', 1)]
+    assert inventory_system.search_inventory(char, "s", SEARCH_ITEMS, prefix=True) == [
+        ('steel_sword', 1), ('super_health_potion', 1)]
+    assert inventory_system.search_inventory(char, "iron", SEARCH_ITEMS) == []
+    assert inventory_system.search_inventory(char, "zzz", SEARCH_ITEMS) == []
+
+def test_short_substring_queries_use_the_index():
+    """Test 1 and 2 letter queries are looked up, not scanned"""
+    index = inventory_system.ItemSearchIndex(SEARCH_ITEMS)
+    assert index.ngrams['th'] == {'health_potion', 'super_health_potion', 'leather_armor'}
+    
+    assert index.substring("W") == ['iron_sword', 'steel_sword']
+    assert index.substring("th") == ['health_potion', 'leather_armor', 'super_health_potion']
+    assert index.substring("qq") == []
+    assert len(index.substring("")) == len(SEARCH_ITEMS)
+
+# ============================================================================
+# CRAFTING TESTS
+# ============================================================================
+
+CRAFT_ITEMS = {
+    'herb': {'cost': 5}, 'water': {'cost': 1}, 'potion': {'cost': 20},
+    'ore': {'cost': 30}, 'ingot': {'cost': 100}, 'sword': {'cost': 500},
+}
+CRAFT_RECIPES = {
+    'brew': {'recipe_id': 'brew', 'output': 'potion', 'output_quantity': 1, 'inputs': {'herb': 2, 'water': 1}},
+    'smelt': {'recipe_id': 'smelt', 'output': 'ingot', 'output_quantity': 2, 'inputs': {'ore': 3}},
+    'forge': {'recipe_id': 'forge', 'output': 'sword', 'output_quantity': 1, 'inputs': {'ingot': 3, 'potion': 1}},
+}
+
+def test_recipes_load():
+    """Test that recipes.txt parses and every item exists"""
+    recipes = game_data.load_recipes("data/recipes.txt")
+    items = game_data.load_items("data/items.txt")
+    
+    assert recipes['brew_super_potion']['inputs'] == {'health_potion': 2, 'wisdom_elixir': 1}
+    book = inventory_system.RecipeBook(recipes, items)
+    assert book.best_recipe['steel_sword'] == 'temper_steel_sword'
+
+def test_recipe_book_rejects_loops():
+    """Test that recipes feeding back into themselves are rejected"""
+    looped = dict(CRAFT_RECIPES)
+    looped['melt'] = {'recipe_id': 'melt', 'output': 'ore', 'output_quantity': 1, 'inputs': {'sword': 1}}
+    
+    with pytest.raises(InvalidDataFormatError):
+        inventory_system.RecipeBook(looped, CRAFT_ITEMS)
+    with pytest.raises(InvalidDataFormatError):
+        inventory_system.RecipeBook(CRAFT_RECIPES, {'herb': {'cost': 1}})
+
+def test_craftable_rechecks_only_touched_recipes(monkeypatch):
+    """Test that inventory changes only recheck recipes using those items"""
+    book = inventory_system.RecipeBook(CRAFT_RECIPES, CRAFT_ITEMS)
+    char = {'inventory': ['herb', 'herb', 'water', 'ore', 'ore']}
+    
+    assert book.craftable(char) == {'brew'}
+    checked = []
+    real_can_craft = book.can_craft
+    monkeypatch.setattr(book, "can_craft", lambda inv, rid, times=1: checked.append(rid) or real_can_craft(inv, rid, times))
+    
+    inventory_system.add_item_to_inventory(char, 'ore')
+    assert book.craftable(char) == {'brew', 'smelt'}
+    assert checked == ['smelt']
+    
+    inventory_system.craft_item(char, 'smelt', book)
+    assert inventory_system.count_item(char, 'ingot') == 2
+    assert book.craftable(char) == {'brew'}
+    with pytest.raises(ItemNotFoundError):
+        inventory_system.craft_item(char, 'forge', book)
+
+def test_recipe_books_track_inventory_changes_separately():
+    """Test that one recipe book checking an inventory doesn't hide changes from another"""
+    first = inventory_system.RecipeBook(CRAFT_RECIPES, CRAFT_ITEMS)
+    second = inventory_system.RecipeBook(CRAFT_RECIPES, CRAFT_ITEMS)
+    char = {'inventory': ['herb', 'herb', 'water', 'ore', 'ore']}
+    assert first.craftable(char) == second.craftable(char) == {'brew'}
+    
+    inventory_system.add_item_to_inventory(char, 'ore')
+    assert first.craftable(char) == {'brew', 'smelt'}
+    assert second.craftable(char) == {'brew', 'smelt'}
+    assert set(inventory_system.get_inventory(char).derived) == {first, second}
+
+def test_cheapest_path_uses_inventory_first():
+    """Test buy-versus-craft planning with what the character owns"""
+    book = inventory_system.RecipeBook(CRAFT_RECIPES, CRAFT_ITEMS)
+    
+    # potion: crafting (11) beats buying (20); ingots: 2 smelts (180) beat buying 3 (300)
+    plan = inventory_system.cheapest_path({'inventory': []}, 'sword', book)
+    assert plan['gold'] == 191
+    assert plan['craft'] == [('smelt', 2), ('brew', 1), ('forge', 1)]
+    
+    plan = inventory_system.cheapest_path({'inventory': ['ingot', 'ingot', 'potion']}, 'sword', book)
+    assert plan['use'] == {'ingot': 2, 'potion': 1}
+    assert plan['buy'] == {'ore': 3}
+    assert plan['gold'] == 90
+    assert plan['craft'] == [('smelt', 1), ('forge', 1)]
+
+def test_cheapest_path_deep_shared_recipes():
+    """Test a deep recipe tree where every item shares its ingredients"""
+    import time
+    depth = 30
+    items = {'a0': {'cost': 1}, 'b0': {'cost': 2}}
+    recipes = {}
+    for level in range(1, depth + 1):
+        for name, (qa, qb) in (('a', (1, 2)), ('b', (2, 1))):
+            item_id = f'{name}{level}'
+            items[item_id] = {'cost': 10 ** 30}
+            for n, inputs in enumerate(({f'a{level - 1}': qa, f'b{level - 1}': qb},
+                                        {f'a{level - 1}': qb + 1, f'b{level - 1}': qa})):
+                recipes[f'{item_id}_{n}'] = {'recipe_id': f'{item_id}_{n}', 'output': item_id,
+                                             'output_quantity': 1, 'inputs': inputs}
+    book = inventory_system.RecipeBook(recipes, items)
+
+    start = time.perf_counter()
+    plan = inventory_system.cheapest_path({'inventory': []}, f'a{depth}', book)
+    assert time.perf_counter() - start < 0.5
+    assert plan['gold'] == book.unit_costs[f'a{depth}']
+    assert plan['craft'][-1][0].startswith(f'a{depth}_')
+    assert len(plan['craft']) == 2 * depth - 1
+
+    # a2 = a1 + 2 b1; the stock covers the a1, and b0 is shared by both b1 crafts
+    plan = inventory_system.cheapest_path({'inventory': ['a1', 'a1', 'b0']}, 'a2', book)
+    assert plan['use'] == {'a1': 1, 'b0': 1}
+    assert plan['buy'] == {'a0': 4, 'b0': 1}
+    assert plan['craft'] == [('b1_0', 2), ('a2_0', 1)]
+    assert plan['gold'] == 6
+
+# ============================================================================
+# BANK TESTS
+# ============================================================================
+
+def test_bank_deposit_and_withdraw(tmp_path, monkeypatch):
+    """Test moving items between the inventory and the bank"""
+    monkeypatch.setattr(inventory_system, "MAX_INVENTORY_SIZE", 3)
+    bank = bank_storage.Bank("test", str(tmp_path))
+    char = {'inventory': ['gem', 'gem', 'sword']}
+    
+    assert bank.deposit(char, 'gem', 2) == 2
+    assert 'gem' not in char['inventory']
+    with pytest.raises(ItemNotFoundError):
+        bank.deposit(char, 'gem')
+    
+    char['inventory'].extend(['rock', 'rock'])
+    with pytest.raises(InventoryFullError):
+        bank.withdraw(char, 'gem', 1)
+    assert bank.count('gem') == 2
+    
+    char['inventory'].remove('rock')
+    assert bank.withdraw(char, 'gem', 1) == 1
+    with pytest.raises(ItemNotFoundError):
+        bank.withdraw(char, 'gem', 5)
+
+def test_bank_pages_load_lazily_and_flush_dirty(tmp_path, monkeypatch):
+    """Test that reopening reads only the index and writes only changed pages"""
+    monkeypatch.setattr(bank_storage, "PAGE_SIZE", 2)
+    bank = bank_storage.Bank("hoard", str(tmp_path))
+    char = {'inventory': ['a', 'b', 'c', 'd', 'e', 'e']}
+    for item_id in ['a', 'b', 'c', 'd', 'e']:
+        bank.deposit(char, item_id, char['inventory'].count(item_id))
+    assert bank.page_count() == 3
+    assert bank.flush() == 4
+    assert bank.flush() == 0
+    
+    reopened = bank_storage.Bank("hoard", str(tmp_path))
+    assert reopened.pages == {}
+    assert reopened.view_page(2) == [('e', 2)]
+    assert list(reopened.pages) == [2]
+    
+    reopened.withdraw(char, 'e', 1)
+    assert reopened.flush() == 1
+    assert bank_storage.Bank("hoard", str(tmp_path)).count('e') == 1
+    with pytest.raises(ValueError):
+        reopened.view_page(3)
+
+def test_bank_reuses_freed_slots_and_drops_empty_pages(tmp_path, monkeypatch):
+    """Test that new items fill the lowest page with room and empty end pages go"""
+    monkeypatch.setattr(bank_storage, "PAGE_SIZE", 2)
+    bank = bank_storage.Bank("tidy", str(tmp_path))
+    char = {'inventory': ['a', 'b', 'c', 'd', 'e']}
+    for item_id in ['a', 'b', 'c', 'd', 'e']:
+        bank.deposit(char, item_id)
+    bank.flush()
+    
+    bank.withdraw(char, 'e')
+    bank.withdraw(char, 'a')
+    assert bank.page_count() == 2
+    bank.deposit(char, 'e')
+    assert bank.index['e'] == 0
+    bank.flush()
+    assert not (tmp_path / "bank_tidy" / "page_0002.txt").exists()
+    
+    reopened = bank_storage.Bank("tidy", str(tmp_path))
+    assert reopened.view_page(0) == [('b', 1), ('e', 1)]
+    reopened.deposit(char, 'a')
+    assert reopened.page_count() == 3
+    assert reopened.view_page(2) == [('a', 1)]
+
+def test_bank_flush_leaves_old_files_if_writing_fails(tmp_path, monkeypatch):
+    """Test that a failed flush doesn't leave the bank half updated"""
+    monkeypatch.setattr(bank_storage, "PAGE_SIZE", 2)
+    bank = bank_storage.Bank("safe", str(tmp_path))
+    char = {'inventory': ['a', 'b', 'c', 'a']}
+    bank.deposit(char, 'a')
+    bank.deposit(char, 'b')
+    bank.flush()
+    
+    bank.deposit(char, 'a')
+    bank.deposit(char, 'c')
+    real_write = bank_storage.write_pairs
+    calls = []
+    def failing_write(path, pairs):
+        calls.append(path)
+        if len(calls) == 3:
+            raise OSError("disk full")
+        real_write(path, pairs)
+    monkeypatch.setattr(bank_storage, "write_pairs", failing_write)
+    with pytest.raises(OSError):
+        bank.flush()
+    
+    reopened = bank_storage.Bank("safe", str(tmp_path))
+    assert (reopened.count('a'), reopened.count('c'), reopened.page_count()) == (1, 0, 1)
+
+def test_bank_rejects_bad_index(tmp_path):
+    """Test that a damaged index raises a save data error"""
+    bank_dir = tmp_path / "bank_broken"
+    bank_dir.mkdir()
+    (bank_dir / "index.txt").write_text("PAGES: 1\ngem: lots\n")
+    
+    with pytest.raises(InvalidSaveDataError):
+        bank_storage.Bank("broken", str(tmp_path))
+
+def test_bank_item_named_pages_survives_reload(tmp_path):
+    """Test that an item called PAGES isn't read back as the page count"""
+    bank = bank_storage.Bank("odd", str(tmp_path))
+    char = {'inventory': ['PAGES'] * 7 + ['gem']}
+    bank.deposit(char, 'PAGES', 7)
+    bank.deposit(char, 'gem', 1)
+    bank.flush()
+    
+    reopened = bank_storage.Bank("odd", str(tmp_path))
+    assert reopened.page_count() == 1
+    assert reopened.count('PAGES') == 7
+    assert reopened.count('gem') == 1
+    
+    bank.deposit({'inventory': ['key:blue']}, 'key:blue')
+    bank.flush()
+    assert bank_storage.Bank("odd", str(tmp_path)).count('key:blue') == 1
+    
+    legacy = tmp_path / "bank_legacy"
+    legacy.mkdir()
+    (legacy / "index.txt").write_text("PAGES: 1\ngem: 0\n")
+    (legacy / "page_0000.txt").write_text("gem: 3\n")
+    assert bank_storage.Bank("legacy", str(tmp_path)).count('gem') == 3
+
+# ============================================================================
+# EQUIPMENT TESTS
+# ============================================================================
+
+SWORD = {'type': 'weapon', 'effect': 'strength:5'}
+AXE = {'type': 'weapon', 'effect': 'strength:8'}
+PLATE = {'type': 'armor', 'effect': 'max_health:20'}
+
+def test_weapon_swaps_do_not_drift_stats():
+    """Test that swapping weapons replaces the bonus instead of stacking it"""
+    char = character_manager.create_character("Swapper", "Warrior")
+    char['inventory'] = ['sword', 'axe']
+    
+    inventory_system.equip_weapon(char, 'sword', SWORD)
+    inventory_system.equip_weapon(char, 'axe', AXE)
+    inventory_system.equip_weapon(char, 'sword', SWORD)
+    assert char['strength'] == 15 + 5
+    assert char['base_stats']['strength'] == 15
+    assert inventory_system.count_item(char, 'axe') == 1
+    
+    assert inventory_system.unequip_weapon(char) == 'sword'
+    assert char['strength'] == 15
+    assert char['equipped_weapon'] is None
+    assert inventory_system.unequip_weapon(char) is None
+
+def test_unequip_armor_caps_health():
+    """Test that losing max_health from armor also caps health"""
+    char = character_manager.create_character("Tank", "Cleric")
+    char['inventory'] = ['plate']
+    
+    inventory_system.equip_armor(char, 'plate', PLATE)
+    char['health'] = char['max_health']
+    assert char['health'] == 120
+    
+    inventory_system.unequip_armor(char)
+    assert char['max_health'] == 100
+    assert char['health'] == 100
+
+def test_level_up_keeps_equipment_bonus():
+    """Test that level ups raise base stats and gear stays on top"""
+    char = character_manager.create_character("Grower", "Rogue")
+    char['inventory'] = ['sword']
+    inventory_system.equip_weapon(char, 'sword', SWORD)
+    
+    character_manager.gain_experience(char, 300)
+    assert char['level'] == 3
+    assert char['base_stats']['strength'] == 12 + 4
+    assert char['strength'] == 12 + 4 + 5
+    
+    inventory_system.unequip_weapon(char)
+    assert char['strength'] == 16
+
+def test_equipment_survives_save_and_load():
+    """Test that equipped items and base stats round trip through a save"""
+    char = character_manager.create_character("GearSave", "Mage")
+    char['inventory'] = ['sword', 'plate']
+    inventory_system.equip_weapon(char, 'sword', SWORD)
+    inventory_system.equip_armor(char, 'plate', PLATE)
+    character_manager.save_character(char)
+    try:
+        loaded = character_manager.load_character("GearSave")
+        assert inventory_system.get_equipped(loaded, 'weapon') == 'sword'
+        assert loaded['strength'] == 13
+        assert loaded['base_stats'] == {'max_health': 80, 'strength': 8, 'magic': 20}
+        
+        inventory_system.unequip_armor(loaded)
+        assert loaded['max_health'] == 80
+    finally:
+        character_manager.delete_character("GearSave")
+
+# ============================================================================
+# SHOP CATALOG TESTS
+# ============================================================================
+
+def make_catalog_items():
+    """Build a small catalog: 12 strength weapons, 3 armors, 2 potions"""
+    items = {}
+    for i in range(12):
+        items[f"sword_{i}"] = {'item_id': f"sword_{i}", 'type': 'weapon', 'effect': 'strength:5', 'cost': 50 * (i + 1)}
+    for i in range(3):
+        items[f"armor_{i}"] = {'item_id': f"armor_{i}", 'type': 'armor', 'effect': 'max_health:10', 'cost': 100 + i}
+    items['potion'] = {'item_id': 'potion', 'type': 'consumable', 'effect': 'health:20', 'cost': 25}
+    items['elixir'] = {'item_id': 'elixir', 'type': 'consumable', 'effect': 'strength:2', 'cost': 60}
+    return items
+
+def test_catalog_filters_by_type_stat_and_cost():
+    """Test combined type, stat, and price filters"""
+    catalog = shop_system.ShopCatalog(make_catalog_items())
+    
+    result = catalog.query('weapon', 'strength', max_cost=299)
+    assert result['total'] == 5
+    assert [item['item_id'] for item in result['items']] == [f"sword_{i}" for i in range(5)]
+    
+    strength = catalog.query(stat='strength', min_cost=50, max_cost=100)
+    assert [item['item_id'] for item in strength['items']] == ['sword_0', 'elixir', 'sword_1']
+    assert catalog.query('armor', 'strength')['total'] == 0
+
+def test_catalog_pagination():
+    """Test that pages are cheapest first and report the page count"""
+    catalog = shop_system.ShopCatalog(make_catalog_items())
+    
+    result = catalog.query('weapon', page=3, page_size=5)
+    assert result['pages'] == 3
+    assert [item['item_id'] for item in result['items']] == ['sword_10', 'sword_11']
+    assert catalog.query(page_size=100)['total'] == 17
+    
+    with pytest.raises(ValueError):
+        catalog.query(page=0)
+
+def test_catalog_incremental_update():
+    """Test that reloading only re-indexes what changed"""
+    items = make_catalog_items()
+    catalog = shop_system.ShopCatalog(items)
+    
+    items = dict(items)
+    items['potion'] = dict(items['potion'], cost=500)
+    del items['armor_0']
+    items['bow'] = {'item_id': 'bow', 'type': 'weapon', 'effect': 'strength:3', 'cost': 1}
+    
+    assert catalog.update(items) == 3
+    assert catalog.update(items) == 0
+    assert len(catalog) == 17
+    assert catalog.query('weapon')['items'][0]['item_id'] == 'bow'
+    assert catalog.query('consumable', 'health', min_cost=400)['total'] == 1
+    assert 'armor_0' not in [item['item_id'] for item in catalog.query('armor')['items']]
+
+# ============================================================================
+# DYNAMIC PRICING TESTS
+# ============================================================================
+
+def test_game_events_subscribe_and_emit():
+    """Test that listeners get event details until they unsubscribe"""
+    seen = []
+    def listener(**details):
+        seen.append(details)
+    
+    game_events.subscribe("test_event", listener)
+    game_events.subscribe("test_event", listener)
+    assert game_events.emit("test_event", value=1) == 1
+    assert game_events.unsubscribe("test_event", listener)
+    assert game_events.emit("test_event", value=2) == 0
+    assert seen == [{'value': 1}]
+
+def test_prices_follow_trades_and_decay():
+    """Test that buying raises a price, and it drifts back afterwards"""
+    items = {'potion': {'cost': 100}, 'sword': {'cost': 200}}
+    engine = shop_system.PricingEngine(items)
+    engine.attach()
+    try:
+        char = {'inventory': [], 'gold': 10000}
+        inventory_system.purchase_items(char, [('potion', 4)], items)
+        assert engine.get_price('potion') == 100
+        
+        assert engine.tick() == 1
+        assert engine.get_price('potion') == 120
+        assert engine.get_price('sword') == 200
+        
+        engine.tick()
+        assert engine.get_price('potion') == 116
+        for _ in range(30):
+            engine.tick()
+        assert engine.get_price('potion') == 100
+    finally:
+        engine.detach()
+
+def test_selling_lowers_price_within_bounds():
+    """Test that heavy selling drops the price but never below the floor"""
+    engine = shop_system.PricingEngine({'gem': {'cost': 50}})
+    engine.record_sale('gem', 1000)
+    engine.tick()
+    
+    assert engine.get_price('gem') == 25
+    assert engine.get_sell_price('gem') == 12
+    assert engine.priced('gem', {'cost': 50, 'type': 'consumable'})['cost'] == 25
+
+def test_pricing_update_keeps_existing_factors():
+    """Test that reloading items keeps prices for items still sold"""
+    engine = shop_system.PricingEngine({'a': {'cost': 10}, 'b': {'cost': 100}})
+    engine.record_purchase('b', 10)
+    engine.tick()
+    
+    engine.update({'b': {'cost': 100}, 'c': {'cost': 40}})
+    assert engine.get_price('b') == 150
+    assert engine.get_price('c') == 40
+    with pytest.raises(KeyError):
+        engine.get_price('a')
+
+def test_tick_only_visits_traded_items():
+    """Test that quiet items are skipped and settled items drop out"""
+    items = {f"item_{i}": {'cost': 100} for i in range(1000)}
+    engine = shop_system.PricingEngine(items)
+    engine.record_purchase('item_7', 2)
+    
+    assert engine.tick() == 1
+    assert engine.changed_items == ['item_7']
+    assert engine.active == {7}
+    for _ in range(30):
+        engine.tick()
+    assert engine.get_price('item_7') == 100
+    assert engine.active == set()
+    assert engine.tick() == 0
+
+def test_catalog_filters_on_current_prices():
+    """Test that catalog filters and order follow the price actually charged"""
+    items = make_catalog_items()
+    catalog = shop_system.ShopCatalog(items)
+    engine = shop_system.PricingEngine(items)
+    catalog.use_pricing(engine)
+    engine.record_purchase('sword_1', 10)
+    engine.record_sale('sword_2', 1000)
+    engine.tick()
+    assert sorted(engine.changed_items) == ['sword_1', 'sword_2']
+    catalog.reprice(engine.changed_items)
+    
+    result = catalog.query('weapon', max_cost=149)
+    assert [item['item_id'] for item in result['items']] == ['sword_0', 'sword_2']
+    assert [item['item_id'] for item in catalog.query('weapon', min_cost=150)['items']][:2] == ['sword_1', 'sword_3']
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
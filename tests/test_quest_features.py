@@ -0,0 +1,875 @@
+"""
+Test Quest Features
+Tests for the quest graph and the quest handler extensions
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from custom_exceptions import *
+import character_manager
+import quest_handler
+import quest_analyzer
+import inventory_system
+import game_data
+import game_events
+
+def make_quest(quest_id, level=1, prerequisite=None, xp=10, gold=5):
+    """Build a quest dictionary like game_data.parse_quest_block does"""
+    return {
+        'quest_id': quest_id,
+        'title': quest_id.replace('_', ' ').title(),
+        'description': 'Test quest',
+        'reward_xp': xp,
+        'reward_gold': gold,
+        'required_level': level,
+        'prerequisite': prerequisite
+    }
+
+def chain_quests(count):
+    """Quests q0 -> q1 -> ... each needing the one before"""
+    quests = {'q0': make_quest('q0')}
+    for i in range(1, count):
+        quests[f'q{i}'] = make_quest(f'q{i}', prerequisite=f'q{i - 1}')
+    return quests
+
+# ============================================================================
+# QUEST GRAPH TESTS
+# ============================================================================
+
+def test_quest_graph_orders_prerequisites_first():
+    """Test adjacency, reverse edges, and topological order"""
+    quests = game_data.load_quests("data/quests.txt")
+    graph = quest_handler.QuestGraph(quests)
+
+    assert graph.prerequisites['goblin_hunter'] == ['first_steps']
+    assert sorted(graph.unlocks['first_steps']) == ['equipment_upgrade', 'goblin_hunter']
+    for qid, prereqs in graph.prerequisites.items():
+        for prereq in prereqs:
+            assert graph.position[prereq] < graph.position[qid]
+
+def test_prerequisite_chain_matches_walk_and_is_memoized():
+    """Test chains come back prerequisites first and are cached"""
+    quests = game_data.load_quests("data/quests.txt")
+
+    chain = quest_handler.get_quest_prerequisite_chain('dragon_slayer', quests)
+    assert chain == ['first_steps', 'goblin_hunter', 'orc_menace', 'dragon_slayer']
+
+    graph = quest_handler.get_quest_graph(quests)
+    assert graph.chains['dragon_slayer'] is graph.chain('dragon_slayer')
+    assert quest_handler.get_quest_prerequisite_chain('first_steps', quests) == ['first_steps']
+
+def test_long_chain_does_not_recurse():
+    """Test a chain far deeper than the recursion limit"""
+    quests = chain_quests(5000)
+    chain = quest_handler.get_quest_prerequisite_chain('q4999', quests)
+    assert len(chain) == 5000
+    assert chain[0] == 'q0'
+
+def test_prerequisite_cycle_raises_data_error():
+    """Test that a loop is reported instead of hanging"""
+    quests = chain_quests(3)
+    quests['q0']['prerequisite'] = 'q2'
+
+    with pytest.raises(InvalidDataFormatError):
+        quest_handler.QuestGraph(quests)
+    with pytest.raises(InvalidDataFormatError):
+        quest_handler.get_quest_prerequisite_chain('q1', quests)
+
+def test_missing_prerequisite_raises_quest_not_found():
+    """Test broken chains still raise QuestNotFoundError"""
+    quests = chain_quests(3)
+    quests['q1']['prerequisite'] = 'gone'
+
+    with pytest.raises(QuestNotFoundError):
+        quest_handler.get_quest_prerequisite_chain('q2', quests)
+    with pytest.raises(QuestNotFoundError):
+        quest_handler.validate_quest_prerequisites(quests)
+    with pytest.raises(QuestNotFoundError):
+        quest_handler.get_quest_prerequisite_chain('nope', quests)
+
+def test_graph_rebuilt_for_new_quest_data():
+    """Test the cached graph follows the quest dictionary"""
+    quests = chain_quests(2)
+    assert quest_handler.get_quest_graph(quests).order[-1] == 'q1'
+
+    quests['q2'] = make_quest('q2', prerequisite='q1')
+    assert quest_handler.get_quest_prerequisite_chain('q2', quests) == ['q0', 'q1', 'q2']
+
+def test_available_quests_respect_prerequisites_and_level():
+    """Test available quests skip locked, active, and completed quests"""
+    quests = game_data.load_quests("data/quests.txt")
+    char = {'level': 2, 'active_quests': ['equipment_upgrade'], 'completed_quests': ['first_steps']}
+
+    available = quest_handler.get_available_quests(char, quests)
+    assert [q['quest_id'] for q in available] == ['goblin_hunter']
+
+# ============================================================================
+# AVAILABLE QUEST TRACKING TESTS
+# ============================================================================
+
+def test_availability_tracker_follows_events():
+    """Test the tracker against a full rescan after each event"""
+    quests = game_data.load_quests("data/quests.txt")
+    char = character_manager.create_character("Tracker", "Warrior")
+    tracker = quest_handler.QuestAvailability(char, quests)
+    tracker.attach()
+    try:
+        def ids():
+            return [q['quest_id'] for q in tracker.available_quests()]
+        def rescan():
+            return [q['quest_id'] for q in quest_handler.get_available_quests(char, quests)]
+
+        assert ids() == rescan() == ['first_steps']
+        quest_handler.accept_quest(char, 'first_steps', quests)
+        assert ids() == rescan() == []
+        quest_handler.complete_quest(char, 'first_steps', quests)
+        assert char['level'] == 1
+        assert ids() == rescan() == []
+
+        character_manager.gain_experience(char, 100)
+        assert ids() == rescan() == ['goblin_hunter', 'equipment_upgrade']
+        quest_handler.accept_quest(char, 'goblin_hunter', quests)
+        quest_handler.abandon_quest(char, 'goblin_hunter')
+        assert ids() == rescan()
+    finally:
+        tracker.detach()
+
+def test_availability_tracker_only_checks_affected_quests(monkeypatch):
+    """Test completing a quest rechecks just its dependents"""
+    quests = {'root': make_quest('root')}
+    for i in range(200):
+        quests[f'side{i}'] = make_quest(f'side{i}')
+    quests['next'] = make_quest('next', prerequisite='root')
+    char = {'level': 1, 'health': 10, 'experience': 0, 'gold': 0,
+            'active_quests': ['root'], 'completed_quests': []}
+    tracker = quest_handler.QuestAvailability(char, quests)
+    tracker.attach()
+    checked = []
+    original = tracker._check
+    monkeypatch.setattr(tracker, "_check", lambda qid: (checked.append(qid), original(qid)))
+    try:
+        char['active_quests'].remove('root')
+        char['completed_quests'].append('root')
+        game_events.emit("quest_completed", character=char, quest_id='root')
+        assert checked == ['next']
+        assert 'next' in tracker.available
+    finally:
+        tracker.detach()
+
+def test_availability_tracker_rebuilds_after_direct_edits():
+    """Test lists changed without events are noticed"""
+    quests = chain_quests(3)
+    char = {'level': 1, 'active_quests': [], 'completed_quests': []}
+    tracker = quest_handler.QuestAvailability(char, quests)
+
+    char['completed_quests'].append('q0')
+    assert [q['quest_id'] for q in tracker.available_quests()] == ['q1']
+
+# ============================================================================
+# QUEST STATE TESTS
+# ============================================================================
+
+def test_quest_set_is_an_ordered_list_without_repeats():
+    """Test QuestSet keeps list order and behaves like a list"""
+    quest_ids = quest_handler.QuestSet(['a', 'b', 'a', 'c'])
+
+    assert quest_ids == ['a', 'b', 'c']
+    assert isinstance(quest_ids, list)
+    assert 'b' in quest_ids and 'z' not in quest_ids
+    quest_ids.remove('b')
+    quest_ids.append('d')
+    quest_ids.append('a')
+    assert quest_ids == ['a', 'c', 'd']
+    assert ",".join(quest_ids) == "a,c,d"
+    del quest_ids[0]
+    assert 'a' not in quest_ids
+    with pytest.raises(ValueError):
+        quest_ids.remove('a')
+
+def test_quest_lists_are_converted_and_still_save(tmp_path):
+    """Test quest_handler converts the lists and saving still works"""
+    quests = game_data.load_quests("data/quests.txt")
+    char = character_manager.create_character("SetSaver", "Mage")
+    quest_handler.accept_quest(char, 'first_steps', quests)
+    quest_handler.complete_quest(char, 'first_steps', quests)
+
+    assert isinstance(char['completed_quests'], quest_handler.QuestSet)
+    assert quest_handler.is_quest_completed(char, 'first_steps')
+    character_manager.save_character(char, str(tmp_path))
+    loaded = character_manager.load_character("SetSaver", str(tmp_path))
+    assert loaded['completed_quests'] == ['first_steps']
+    assert quest_handler.can_accept_quest(loaded, 'goblin_hunter', quests) == False
+
+# ============================================================================
+# PREREQUISITE EXPRESSION TESTS
+# ============================================================================
+
+def test_parse_prerequisites_expands_and_or():
+    """Test AND/OR expressions become lists of options"""
+    assert game_data.parse_prerequisites(None) == []
+    assert game_data.parse_prerequisites("NONE") == []
+    assert game_data.parse_prerequisites("a") == [('a',)]
+    assert game_data.parse_prerequisites("a AND (b OR c)") == [('a', 'b'), ('a', 'c')]
+    assert game_data.parse_prerequisites("a or b and c") == [('a',), ('b', 'c')]
+    for bad in ["a AND", "(a OR b", "a b", "OR a", "a )"]:
+        with pytest.raises(InvalidDataFormatError):
+            game_data.parse_prerequisites(bad)
+
+def test_quest_block_parses_class_and_items():
+    """Test the new optional quest fields"""
+    quests = game_data.load_quests("data/quests.txt")
+    oath = quests['warriors_oath']
+
+    assert oath['required_class'] == 'Warrior'
+    assert oath['required_items'] == {'iron_sword': 1}
+    assert quests['first_steps']['required_class'] is None
+    assert quests['first_steps']['required_items'] == {}
+    with pytest.raises(InvalidDataFormatError):
+        game_data.parse_quest_block([
+            "QUEST_ID: bad", "TITLE: Bad", "DESCRIPTION: x", "REWARD_XP: 1",
+            "REWARD_GOLD: 1", "REQUIRED_LEVEL: 1", "PREREQUISITE: a AND AND b"
+        ])
+
+def test_prerequisite_masks_check_and_or():
+    """Test bitset masks against each way of meeting an expression"""
+    quests = {qid: make_quest(qid) for qid in ['a', 'b', 'c']}
+    quests['goal'] = make_quest('goal', prerequisite='a AND (b OR c)')
+    graph = quest_handler.QuestGraph(quests)
+    bit = graph.bit
+
+    assert graph.masks['goal'] == (bit('a'), [(bit('b') | bit('c'), [])])
+    assert not graph.prerequisites_met('goal', bit('a'))
+    assert not graph.prerequisites_met('goal', bit('b') | bit('c'))
+    assert graph.prerequisites_met('goal', bit('a') | bit('c'))
+    assert graph.prerequisites_met('a', 0)
+    assert sorted(graph.unlocks['b']) == ['goal']
+
+def test_prerequisite_masks_handle_any_expression():
+    """Test expressions that multiply out to many options, and nested groups"""
+    ids = [f"q{i}" for i in range(40)]
+    quests = {qid: make_quest(qid) for qid in ids}
+    pairs = [f"(q{i} OR q{i + 1})" for i in range(0, 40, 2)]
+    quests['wide'] = make_quest('wide', prerequisite=" AND ".join(pairs))
+    quests['nested'] = make_quest('nested', prerequisite='(q0 AND q1) OR (q2 AND (q3 OR q4))')
+    graph = quest_handler.QuestGraph(quests)
+    bit = graph.bit
+
+    evens = sum(bit(f"q{i}") for i in range(0, 40, 2))
+    assert len(graph.masks['wide'][1]) == 20
+    assert graph.prerequisites_met('wide', evens)
+    assert not graph.prerequisites_met('wide', evens - bit('q38'))
+    assert graph.prerequisites_met('nested', bit('q2') | bit('q4'))
+    assert not graph.prerequisites_met('nested', bit('q0') | bit('q3'))
+    assert graph.prerequisites_met('nested', bit('q0') | bit('q1'))
+
+def test_accept_checks_expression_class_and_items():
+    """Test accept_quest with every kind of requirement"""
+    quests = game_data.load_quests("data/quests.txt")
+    char = character_manager.create_character("Oath", "Warrior")
+    char['level'] = 3
+    char['completed_quests'] = ['first_steps', 'equipment_upgrade']
+
+    with pytest.raises(QuestRequirementsNotMetError):
+        quest_handler.accept_quest(char, 'warriors_oath', quests)
+    char['completed_quests'].append('goblin_hunter')
+    with pytest.raises(QuestRequirementsNotMetError, match="iron_sword"):
+        quest_handler.accept_quest(char, 'warriors_oath', quests)
+
+    char['inventory'].append('iron_sword')
+    assert quest_handler.can_accept_quest(char, 'warriors_oath', quests)
+    char['class'] = 'Mage'
+    assert not quest_handler.can_accept_quest(char, 'warriors_oath', quests)
+    char['class'] = 'Warrior'
+    assert quest_handler.accept_quest(char, 'warriors_oath', quests)
+
+def test_completed_bits_follow_quest_set_changes():
+    """Test the QuestSet bitset stays in step with the list"""
+    quests = chain_quests(4)
+    graph = quest_handler.get_quest_graph(quests)
+    completed = quest_handler.QuestSet(['q0'])
+
+    assert completed.bits_for(graph.index) == graph.bit('q0')
+    completed.append('q2')
+    completed.append('unknown')
+    assert completed.bits == graph.bit('q0') | graph.bit('q2')
+    completed.remove('q0')
+    assert completed.bits == graph.bit('q2')
+    del completed[0]
+    assert completed.bits == 0
+
+# ============================================================================
+# LEVEL INDEX TESTS
+# ============================================================================
+
+def test_quests_by_level_matches_scan():
+    """Test bisect range queries against a full scan"""
+    quests = {}
+    for i in range(300):
+        quests[f'q{i}'] = make_quest(f'q{i}', level=(i * 7) % 23 + 1)
+
+    for low, high in [(1, 1), (5, 9), (0, 100), (20, 30), (10, 5), (24, 99)]:
+        expected = [q for q in quests.values() if low <= q['required_level'] <= high]
+        result = quest_handler.get_quests_by_level(quests, low, high)
+        assert sorted(q['quest_id'] for q in result) == sorted(q['quest_id'] for q in expected)
+        assert [q['required_level'] for q in result] == sorted(q['required_level'] for q in result)
+
+def test_available_quests_skip_higher_levels_without_looking(monkeypatch):
+    """Test get_available_quests only checks quests at or below the level"""
+    quests = {f'q{i}': make_quest(f'q{i}', level=i % 10 + 1) for i in range(100)}
+    char = {'level': 3, 'class': 'Warrior', 'active_quests': [], 'completed_quests': []}
+    checked = []
+    original = quest_handler.missing_requirement
+    monkeypatch.setattr(quest_handler, "missing_requirement",
+                        lambda c, qid, data: (checked.append(qid), original(c, qid, data))[1])
+
+    available = quest_handler.get_available_quests(char, quests)
+    assert len(available) == 30
+    assert len(checked) == 30
+    assert all(quests[qid]['required_level'] <= 3 for qid in checked)
+
+# ============================================================================
+# QUEST OBJECTIVE TESTS
+# ============================================================================
+
+def test_parse_objectives():
+    """Test OBJECTIVES lines and their errors"""
+    assert game_data.parse_objectives("NONE") == []
+    assert game_data.parse_objectives("kill:Goblin:3, level:5") == [
+        {'type': 'kill', 'target': 'goblin', 'count': 3},
+        {'type': 'level', 'target': None, 'count': 5}
+    ]
+    for bad in ["dance:goblin:3", "kill:goblin", "kill:goblin:zero", "level:5:5", "collect:potion:0"]:
+        with pytest.raises(InvalidDataFormatError):
+            game_data.parse_objectives(bad)
+    quests = game_data.load_quests("data/quests.txt")
+    assert quests['goblin_hunter']['objectives'] == [{'type': 'kill', 'target': 'goblin', 'count': 3}]
+
+def test_kill_objectives_complete_quest():
+    """Test goblin kills finish Goblin Hunter and other kills don't count"""
+    quests = game_data.load_quests("data/quests.txt")
+    char = character_manager.create_character("Hunter", "Warrior")
+    char['level'] = 2
+    char['completed_quests'].append('first_steps')
+    tracker = quest_handler.ObjectiveTracker(char, quests)
+    tracker.attach()
+    try:
+        quest_handler.accept_quest(char, 'goblin_hunter', quests)
+        game_events.emit("enemy_defeated", character=char, enemy_type="orc")
+        game_events.emit("enemy_defeated", character=char, enemy_type="goblin")
+        game_events.emit("enemy_defeated", character=char, enemy_type="goblin")
+        other = character_manager.create_character("Other", "Mage")
+        game_events.emit("enemy_defeated", character=other, enemy_type="goblin")
+        assert char['quest_progress'] == {'goblin_hunter': [2]}
+        assert tracker.describe('goblin_hunter') == "kill goblin 2/3"
+
+        game_events.emit("enemy_defeated", character=char, enemy_type="goblin")
+        assert 'goblin_hunter' in char['completed_quests']
+        assert char['quest_progress'] == {}
+        assert tracker.take_finished() == [('goblin_hunter', {'xp': 100, 'gold': 75})]
+        assert tracker.listening == {}
+    finally:
+        tracker.detach()
+
+def test_objectives_only_touch_listening_quests():
+    """Test the type index and collect/level objectives"""
+    quests = {
+        'potions': make_quest('potions'),
+        'orcs': make_quest('orcs'),
+        'grow': make_quest('grow')
+    }
+    quests['potions']['objectives'] = game_data.parse_objectives("collect:health_potion:2")
+    quests['orcs']['objectives'] = game_data.parse_objectives("kill:orc:1, level:2")
+    quests['grow']['objectives'] = game_data.parse_objectives("level:3")
+    char = character_manager.create_character("Busy", "Cleric")
+    char['active_quests'] = ['potions', 'orcs', 'grow']
+    tracker = quest_handler.ObjectiveTracker(char, quests)
+    tracker.attach()
+    try:
+        assert tracker.listening[('kill', 'orc')] == {'orcs'}
+        assert ('kill', 'goblin') not in tracker.listening
+        assert tracker.advance("kill", "goblin") == []
+
+        inventory_system.add_item_to_inventory(char, 'health_potion')
+        with inventory_system.transaction(char) as tx:
+            tx.add_item('health_potion')
+        assert 'potions' in char['completed_quests']
+
+        assert tracker.advance("kill", "orc") == []
+        character_manager.gain_experience(char, 100)
+        assert char['level'] == 2
+        assert 'orcs' in char['completed_quests']
+        assert 'grow' in char['active_quests']
+    finally:
+        tracker.detach()
+
+def test_collect_objectives_count_held_items(tmp_path):
+    """Test bank round trips don't count as collecting the same item again"""
+    import bank_storage
+    quests = {'potions': make_quest('potions')}
+    quests['potions']['objectives'] = game_data.parse_objectives("collect:health_potion:3")
+    char = character_manager.create_character("Hoarder", "Mage")
+    inventory_system.add_item_to_inventory(char, 'health_potion')
+    tracker = quest_handler.ObjectiveTracker(char, quests)
+    tracker.attach()
+    bank = bank_storage.Bank("hoarder", str(tmp_path))
+    try:
+        quest_handler.accept_quest(char, 'potions', quests)
+        assert tracker.describe('potions') == "collect health_potion 1/3"
+        for _ in range(3):
+            bank.deposit(char, 'health_potion')
+            bank.withdraw(char, 'health_potion')
+        assert 'potions' in char['active_quests']
+        assert tracker.describe('potions') == "collect health_potion 1/3"
+
+        inventory_system.remove_item_from_inventory(char, 'health_potion')
+        assert tracker.describe('potions') == "collect health_potion 0/3"
+        for _ in range(3):
+            inventory_system.add_item_to_inventory(char, 'health_potion')
+        assert 'potions' in char['completed_quests']
+    finally:
+        tracker.detach()
+
+def test_quest_progress_is_saved(tmp_path):
+    """Test objective progress survives save and load"""
+    quests = game_data.load_quests("data/quests.txt")
+    char = character_manager.create_character("Saver", "Rogue")
+    char['level'] = 3
+    char['completed_quests'] = ['first_steps', 'goblin_hunter']
+    tracker = quest_handler.ObjectiveTracker(char, quests)
+    tracker.attach()
+    try:
+        quest_handler.accept_quest(char, 'orc_menace', quests)
+        game_events.emit("enemy_defeated", character=char, enemy_type="orc")
+    finally:
+        tracker.detach()
+    character_manager.save_character(char, str(tmp_path))
+
+    loaded = character_manager.load_character("Saver", str(tmp_path))
+    assert loaded['quest_progress'] == {'orc_menace': [1]}
+    tracker = quest_handler.ObjectiveTracker(loaded, quests)
+    assert tracker.listening == {('kill', 'orc'): {'orc_menace'}}
+
+# ============================================================================
+# QUEST PLANNER TESTS
+# ============================================================================
+
+def test_planned_xp_matches_gain_experience():
+    """Test the planner's level curve against character_manager"""
+    char = character_manager.create_character("Curve", "Mage")
+    level, experience = 1, 0
+    for xp in [50, 75, 300, 1000, 5]:
+        character_manager.gain_experience(char, xp)
+        level, experience = quest_handler.add_planned_xp(level, experience, xp)
+        assert (level, experience) == (char['level'], char['experience'])
+    assert quest_handler.xp_to_reach_level(2, 50, 4) == 450
+
+def test_plan_to_quest_fights_only_when_needed():
+    """Test the default quest line plan and its level gates"""
+    quests = game_data.load_quests("data/quests.txt")
+    char = character_manager.create_character("Planner", "Mage")
+
+    plan = quest_handler.plan_quests(char, quests, target_quest='orc_menace')
+    assert plan['steps'][:3] == [('quest', 'first_steps'), ('fight', 50), ('quest', 'goblin_hunter')]
+    assert plan['quests'][-1] == 'orc_menace'
+    assert 'warriors_oath' not in plan['quests']
+    assert plan['level'] >= quests['orc_menace']['required_level']
+
+    with pytest.raises(QuestRequirementsNotMetError):
+        quest_handler.plan_quests(char, quests, target_quest='warriors_oath')
+    with pytest.raises(QuestNotFoundError):
+        quest_handler.plan_quests(char, quests, target_quest='nope')
+
+def test_plan_picks_cheaper_or_branch_and_best_xp():
+    """Test OR prerequisites choose the shorter chain and XP goes greedy"""
+    quests = chain_quests(5)
+    quests['shortcut'] = make_quest('shortcut')
+    quests['goal'] = make_quest('goal', prerequisite='q4 OR shortcut')
+    quests['big'] = make_quest('big', xp=1000)
+    char = {'level': 1, 'experience': 0, 'class': 'Rogue', 'active_quests': [], 'completed_quests': []}
+
+    plan = quest_handler.plan_quests(char, quests, target_quest='goal')
+    assert plan['quests'] == ['shortcut', 'goal']
+    assert plan['fight_xp'] == 0
+
+    plan = quest_handler.plan_quests(char, quests, target_level=4)
+    assert plan['quests'][0] == 'big'
+
+def test_plan_search_beats_greedy_xp():
+    """Test small catalogs get the cheapest plan, not the biggest-XP-first one"""
+    quests = {'a': make_quest('a', xp=150), 'b': make_quest('b', xp=0), 'c': make_quest('c', prerequisite='b', xp=500)}
+    char = {'level': 1, 'experience': 0, 'class': 'Mage', 'active_quests': [], 'completed_quests': []}
+    plan = quest_handler.plan_quests(char, quests, target_level=3)
+    assert plan['quests'] == ['b', 'c']
+    assert plan['fight_xp'] == 0
+    assert plan['optimal'] is True
+
+def test_plan_search_matches_brute_force():
+    """Test the searched plan costs the same as trying every order"""
+    import random
+    rng = random.Random(470)
+
+    def brute(quests, done, level, experience, target_level, target_quest):
+        best = None
+        if target_quest in done:
+            extra = quest_handler.xp_to_reach_level(level, experience, target_level)
+            best = (extra, 0)
+        for qid, quest in quests.items():
+            if qid in done or (quest['prerequisite'] and quest['prerequisite'] not in done):
+                continue
+            fight = quest_handler.xp_to_reach_level(level, experience, quest['required_level'])
+            new_level, new_experience = quest_handler.add_planned_xp(level, experience, fight + quest['reward_xp'])
+            rest = brute(quests, done | {qid}, new_level, new_experience, target_level, target_quest)
+            if rest is not None and (best is None or (fight + rest[0], rest[1] + 1) < best):
+                best = (fight + rest[0], rest[1] + 1)
+        return best
+
+    for _ in range(30):
+        quests = {}
+        for i in range(6):
+            prereq = f'b{rng.randrange(i)}' if i and rng.random() < 0.5 else None
+            quests[f'b{i}'] = make_quest(f'b{i}', level=rng.randint(1, 4), prerequisite=prereq, xp=rng.choice([0, 50, 120, 300]))
+        target = rng.choice(list(quests))
+        char = {'level': 1, 'experience': 0, 'class': 'Mage', 'active_quests': [], 'completed_quests': []}
+        plan = quest_handler.plan_quests(char, quests, target_level=4, target_quest=target)
+        assert (plan['fight_xp'], len(plan['quests'])) == brute(quests, frozenset(), 1, 0, 4, target)
+        assert target in plan['quests'] and plan['level'] >= 4
+
+def test_plan_follows_the_simulated_rules():
+    """Test every planned quest is acceptable when its turn comes"""
+    import random
+    rng = random.Random(47)
+    quests = {}
+    for i in range(400):
+        prereq = f'r{rng.randrange(i)}' if i and rng.random() < 0.7 else None
+        if prereq and rng.random() < 0.3:
+            prereq = f"{prereq} OR r{rng.randrange(i)}"
+        quests[f'r{i}'] = make_quest(f'r{i}', level=rng.randint(1, 15), prerequisite=prereq, xp=rng.randint(0, 200))
+    char = {'level': 1, 'experience': 0, 'class': 'Cleric', 'active_quests': [], 'completed_quests': []}
+
+    plan = quest_handler.plan_quests(char, quests, target_level=12, target_quest='r399')
+    sim = {'level': 1, 'experience': 0, 'health': 1, 'max_health': 1, 'strength': 1, 'magic': 1,
+           'class': 'Cleric', 'active_quests': [], 'completed_quests': []}
+    for kind, value in plan['steps']:
+        if kind == 'fight':
+            sim['level'], sim['experience'] = quest_handler.add_planned_xp(sim['level'], sim['experience'], value)
+        else:
+            assert quest_handler.can_accept_quest(sim, value, quests)
+            sim['completed_quests'].append(value)
+            sim['level'], sim['experience'] = quest_handler.add_planned_xp(sim['level'], sim['experience'], quests[value]['reward_xp'])
+    assert 'r399' in sim['completed_quests']
+    assert sim['level'] >= 12
+    assert (sim['level'], sim['experience']) == (plan['level'], plan['experience'])
+
+# ============================================================================
+# QUEST STATISTICS TESTS
+# ============================================================================
+
+def test_quest_stats_ignore_unknown_ids():
+    """Test completion percentage only counts quests that are in the data"""
+    quests = chain_quests(4)
+    char = {'level': 1, 'active_quests': [], 'completed_quests': ['q0', 'old_quest', 'q1', 'gone']}
+    assert quest_handler.get_quest_completion_percentage(char, quests) == 50.0
+    assert quest_handler.get_total_quest_rewards_earned(char, quests) == {'total_xp': 20, 'total_gold': 10}
+
+def test_quest_stats_follow_completed_list():
+    """Test completion follows the list and reward totals follow payouts"""
+    quests = chain_quests(6)
+    quests['q5']['reward_xp'] = 100
+    char = character_manager.create_character("Stats", "Cleric")
+
+    assert quest_handler.get_total_quest_rewards_earned(char, quests) == {'total_xp': 0, 'total_gold': 0}
+    for i in range(6):
+        quest_handler.accept_quest(char, f'q{i}', quests)
+        quest_handler.complete_quest(char, f'q{i}', quests)
+        assert quest_handler.get_total_quest_rewards_earned(char, quests) == {'total_xp': 10 * i + 10 + 90 * (i == 5),
+                                                                               'total_gold': 5 * i + 5}
+    # rewards already paid stay counted when the list is edited
+    char['completed_quests'].remove('q5')
+    char['completed_quests'].pop(0)
+    char['completed_quests'].append('missing')
+    assert quest_handler.get_total_quest_rewards_earned(char, quests) == {'total_xp': 150, 'total_gold': 30}
+    assert quest_handler.get_quest_completion_percentage(char, quests) == 4 / 6 * 100
+
+    # a different quest dictionary (e.g. reloaded data) gets its own count
+    reloaded = chain_quests(2)
+    assert quest_handler.get_quest_completion_percentage(char, reloaded) == 50.0
+    quests['q6'] = make_quest('q6')
+    char['completed_quests'].append('q6')
+    assert quest_handler.get_quest_completion_percentage(char, quests) == 5 / 7 * 100
+
+def test_quest_rewards_survive_save_and_old_saves_catch_up():
+    """Test earned rewards are saved, and saves without them are recounted"""
+    quests = chain_quests(2)
+    char = character_manager.create_character("Earner", "Rogue")
+    quest_handler.accept_quest(char, 'q0', quests)
+    quest_handler.complete_quest(char, 'q0', quests)
+    character_manager.save_character(char)
+    try:
+        loaded = character_manager.load_character("Earner")
+        assert loaded['quest_rewards'] == {'xp': 10, 'gold': 5}
+
+        del loaded['quest_rewards']
+        loaded['completed_quests'].append('q1')
+        character_manager.save_character(loaded)
+        old = character_manager.load_character("Earner")
+        assert 'quest_rewards' not in old
+        assert quest_handler.get_total_quest_rewards_earned(old, quests) == {'total_xp': 20, 'total_gold': 10}
+    finally:
+        character_manager.delete_character("Earner")
+
+def test_display_quest_progress_uses_stats(capsys):
+    """Test the progress display shows the valid completed count"""
+    quests = chain_quests(2)
+    char = {'level': 1, 'active_quests': ['q1'], 'completed_quests': ['q0', 'retired']}
+    quest_handler.display_character_quest_progress(char, quests)
+    out = capsys.readouterr().out
+    assert "Completed quests: 1" in out
+    assert "Completion: 50.0%" in out
+    assert "Total XP from quests: 10" in out
+
+# ============================================================================
+# QUEST TIMER TESTS
+# ============================================================================
+
+def timed_quests():
+    """A daily quest, a quest with a cooldown, and a timed quest"""
+    quests = chain_quests(1)
+    quests['daily'] = dict(make_quest('daily'), repeatable='daily')
+    quests['again'] = dict(make_quest('again'), repeatable='always', cooldown=5)
+    quests['rush'] = dict(make_quest('rush'), time_limit=3)
+    return quests
+
+def test_repeatable_quest_fields_parse():
+    """Test REPEATABLE, COOLDOWN and TIME_LIMIT in quest blocks"""
+    base = ["QUEST_ID: r", "TITLE: R", "DESCRIPTION: d", "REWARD_XP: 1", "REWARD_GOLD: 1", "REQUIRED_LEVEL: 1"]
+    quest = game_data.parse_quest_block(base + ["REPEATABLE: always", "COOLDOWN: 7", "TIME_LIMIT: 3"])
+    assert (quest['repeatable'], quest['cooldown'], quest['time_limit']) == ('always', 7, 3)
+    quest = game_data.parse_quest_block(base)
+    assert (quest['repeatable'], quest['cooldown'], quest['time_limit']) == (None, 0, None)
+    with pytest.raises(InvalidDataFormatError):
+        game_data.parse_quest_block(base + ["REPEATABLE: weekly"])
+    with pytest.raises(InvalidDataFormatError):
+        game_data.parse_quest_block(base + ["TIME_LIMIT: 0"])
+
+def test_repeatable_quests_reset_on_schedule():
+    """Test cooldown and daily quests come back only when their time is up"""
+    quests = timed_quests()
+    char = character_manager.create_character("Repeat", "Rogue")
+    char['game_time'] = 20
+    for qid in ('q0', 'daily', 'again'):
+        quest_handler.accept_quest(char, qid, quests)
+        quest_handler.complete_quest(char, qid, quests)
+
+    with pytest.raises(QuestAlreadyCompletedError):
+        quest_handler.accept_quest(char, 'q0', quests)
+    with pytest.raises(QuestAlreadyCompletedError):
+        quest_handler.accept_quest(char, 'again', quests)
+    assert quest_handler.get_quest_time_left(char, 'daily') == 4
+
+    assert quest_handler.advance_quest_time(char, quests, 4) == [('reset', 'daily')]
+    assert quest_handler.can_accept_quest(char, 'daily', quests)
+    assert not quest_handler.can_accept_quest(char, 'again', quests)
+    assert quest_handler.advance_quest_time(char, quests) == [('reset', 'again')]
+    available = [q['quest_id'] for q in quest_handler.get_available_quests(char, quests)]
+    assert sorted(available) == ['again', 'daily', 'rush']
+
+    gold = char['gold']
+    assert quest_handler.accept_quest(char, 'again', quests) is True
+    quest_handler.complete_quest(char, 'again', quests)
+    assert char['gold'] == gold + 5
+
+def test_repeatable_quest_counts_every_completion():
+    """Test a repeatable quest done twice pays and counts twice, across a save"""
+    quests = timed_quests()
+    quests['again']['cooldown'] = 0
+    char = character_manager.create_character("Twice", "Warrior")
+    for _ in range(2):
+        quest_handler.accept_quest(char, 'again', quests)
+        quest_handler.complete_quest(char, 'again', quests)
+
+    assert char['completed_quests'] == ['again']
+    assert quest_handler.get_completion_count(char, 'again') == 2
+    assert quest_handler.get_total_quest_rewards_earned(char, quests) == {'total_xp': 20, 'total_gold': 10}
+    character_manager.save_character(char)
+    try:
+        loaded = character_manager.load_character("Twice")
+        assert quest_handler.get_completion_count(loaded, 'again') == 2
+        assert quest_handler.get_total_quest_rewards_earned(loaded, quests) == {'total_xp': 20, 'total_gold': 10}
+    finally:
+        character_manager.delete_character("Twice")
+
+    # saves from before the counts were kept count each completed quest once
+    old = {'level': 1, 'active_quests': [], 'completed_quests': ['q0']}
+    assert quest_handler.get_completion_count(old, 'q0') == 1
+    assert quest_handler.get_completion_count(old, 'daily') == 0
+
+def test_timed_quest_expires_and_events_reach_trackers():
+    """Test an expired quest leaves the active list and becomes available again"""
+    quests = timed_quests()
+    char = character_manager.create_character("Timed", "Mage")
+    tracker = quest_handler.QuestAvailability(char, quests)
+    tracker.attach()
+    try:
+        quest_handler.accept_quest(char, 'rush', quests)
+        assert quest_handler.advance_quest_time(char, quests, 2) == []
+        assert quest_handler.get_quest_time_left(char, 'rush') == 1
+        assert quest_handler.advance_quest_time(char, quests) == [('expired', 'rush')]
+        assert 'rush' not in char['active_quests']
+        assert 'rush' in [q['quest_id'] for q in tracker.available_quests()]
+
+        # an abandoned or completed timed quest never expires later
+        quest_handler.accept_quest(char, 'rush', quests)
+        quest_handler.abandon_quest(char, 'rush')
+        quest_handler.accept_quest(char, 'rush', quests)
+        quest_handler.complete_quest(char, 'rush', quests)
+        assert quest_handler.advance_quest_time(char, quests, 10) == []
+
+        quest_handler.accept_quest(char, 'daily', quests)
+        quest_handler.complete_quest(char, 'daily', quests)
+        assert 'daily' not in [q['quest_id'] for q in tracker.available_quests()]
+        quest_handler.advance_quest_time(char, quests, quest_handler.TURNS_PER_DAY)
+        assert 'daily' in [q['quest_id'] for q in tracker.available_quests()]
+    finally:
+        tracker.detach()
+
+def test_quest_completed_on_accept_stays_available():
+    """Test a quest finished inside quest_accepted isn't put back in the tracker's active set"""
+    quests = timed_quests()
+    quests['again']['cooldown'] = 0
+    quests['again']['objectives'] = game_data.parse_objectives("level:1")
+    char = character_manager.create_character("Instant", "Warrior")
+    objectives = quest_handler.ObjectiveTracker(char, quests)
+    objectives.attach()
+    tracker = quest_handler.QuestAvailability(char, quests)
+    tracker.attach()
+    try:
+        quest_handler.accept_quest(char, 'again', quests)
+        assert 'again' in char['completed_quests']
+        live = [q['quest_id'] for q in tracker.available_quests()]
+        fresh = [q['quest_id'] for q in quest_handler.QuestAvailability(char, quests).available_quests()]
+        assert 'again' in live
+        assert live == fresh
+    finally:
+        tracker.detach()
+        objectives.detach()
+
+def test_quest_timers_pop_only_due_entries():
+    """Test the timer heap skips replaced timers and stays small"""
+    timers = quest_handler.QuestTimers({'a': (5, 'expire'), 'b': (1, 'reset')})
+    timers['a'] = (9, 'expire')
+    for i in range(100):
+        timers['c'] = (i + 100, 'reset')
+    assert len(timers.heap) <= 2 * len(timers) + 16
+    assert timers.next_due() == 1
+    assert timers.pop_due(8) == [(1, 'b', 'reset')]
+    assert timers.pop_due(9) == [(9, 'a', 'expire')]
+    assert timers == {'c': (199, 'reset')}
+
+def test_quest_timers_are_saved(tmp_path):
+    """Test game time and quest timers survive a save and load"""
+    quests = timed_quests()
+    char = character_manager.create_character("Clock", "Cleric")
+    quest_handler.advance_quest_time(char, quests, 30)
+    quest_handler.accept_quest(char, 'rush', quests)
+    quest_handler.accept_quest(char, 'daily', quests)
+    quest_handler.complete_quest(char, 'daily', quests)
+    character_manager.save_character(char, str(tmp_path))
+
+    loaded = character_manager.load_character("Clock", str(tmp_path))
+    assert loaded['game_time'] == 30
+    assert loaded['quest_timers'] == {'rush': (33, 'expire'), 'daily': (48, 'reset')}
+    assert quest_handler.advance_quest_time(loaded, quests, 3) == [('expired', 'rush')]
+
+# ============================================================================
+# QUEST ANALYZER TESTS
+# ============================================================================
+
+def test_analyzer_finds_dead_content():
+    """Test missing prerequisites, level caps and loops are reported, not raised"""
+    quests = chain_quests(3)
+    quests['broken'] = make_quest('broken', prerequisite='ghost')
+    quests['after_broken'] = make_quest('after_broken', prerequisite='broken')
+    quests['either'] = make_quest('either', prerequisite='ghost OR q1')
+    quests['too_high'] = make_quest('too_high', level=80, prerequisite='q2')
+    quests['after_high'] = make_quest('after_high', prerequisite='too_high')
+    quests['loop_a'] = make_quest('loop_a', prerequisite='loop_b')
+    quests['loop_b'] = make_quest('loop_b', prerequisite='loop_a')
+    quests['lonely'] = make_quest('lonely')
+
+    analysis = quest_analyzer.analyze_quests(quests, max_level=50)
+    dead = analysis['dead']
+    assert set(dead) == {'broken', 'after_broken', 'too_high', 'after_high', 'loop_a', 'loop_b'}
+    assert 'ghost' in dead['broken']
+    assert 'above the max level' in dead['too_high']
+    assert 'loop' in dead['loop_a']
+    assert analysis['missing'] == {'broken': ['ghost'], 'either': ['ghost']}
+    assert set(analysis['reachable']) == {'q0', 'q1', 'q2', 'either', 'lonely'}
+    assert analysis['orphans'] == ['lonely']
+    assert analysis['chains'][0] == ['q0', 'q1', 'q2']
+
+    report = quest_analyzer.format_report(analysis, details=True)
+    assert "broken: missing prerequisite ghost" in report
+    assert "q0 -> q1 -> q2 (3 quests)" in report
+
+def test_analyzer_opens_quest_through_any_option():
+    """Test a loop in one OR option doesn't hide a quest reachable through another"""
+    quests = {
+        'a': make_quest('a'),
+        'b': make_quest('b', prerequisite='c'),
+        'c': make_quest('c', prerequisite='b'),
+        'either': make_quest('either', level=2, prerequisite='a OR b'),
+        'after': make_quest('after', prerequisite='either AND b'),
+    }
+    analysis = quest_analyzer.analyze_quests(quests, max_level=10)
+    assert set(analysis['reachable']) == {'a', 'either'}
+    assert analysis['min_level']['either'] == 2
+    assert set(analysis['dead']) == {'b', 'c', 'after'}
+    assert 'loop' in analysis['dead']['b']
+    assert analysis['chains'] == [['a', 'either']]
+
+def test_analyzer_levels_and_xp_gaps():
+    """Test lowest levels follow the easiest path and gaps show where to fight"""
+    quests = {
+        'start': make_quest('start', xp=100),
+        'mid': make_quest('mid', level=2, prerequisite='start', xp=50),
+        'late': make_quest('late', level=5, prerequisite='mid'),
+        'shortcut': make_quest('shortcut', level=3, prerequisite='late OR start'),
+    }
+    analysis = quest_analyzer.analyze_quests(quests, max_level=10)
+    assert analysis['min_level'] == {'start': 1, 'mid': 2, 'late': 5, 'shortcut': 3}
+    # start gets level 2, mid leaves 50/200 toward 3
+    assert analysis['gaps'][0] == (2, 3, 150)
+    assert analysis['fight_xp']['shortcut'] == 150
+    assert analysis['fight_xp']['late'] > analysis['fight_xp']['shortcut']
+    assert analysis['final_level'] == 5
+
+def test_analyzer_levels_include_path_reward_xp():
+    """Test reward XP from prerequisites raises the level a quest opens at"""
+    quests = chain_quests(3)
+    for quest in quests.values():
+        quest['reward_xp'] = 300
+    quests['side'] = make_quest('side', prerequisite='q0 OR q1')
+    analysis = quest_analyzer.analyze_quests(quests, max_level=10)
+    # 300 XP takes a fresh character to level 3, 600 to level 4
+    assert analysis['path_xp'] == {'q0': 0, 'q1': 300, 'q2': 600, 'side': 300}
+    assert analysis['min_level'] == {'q0': 1, 'q1': 3, 'q2': 4, 'side': 3}
+
+def test_analyzer_fight_xp_is_a_lower_bound_for_the_planner():
+    """Test the analyzer never asks for more fighting than a real plan needs"""
+    import random
+    rng = random.Random(50)
+    quests = {}
+    for i in range(300):
+        prereq = f'a{rng.randrange(i)}' if i and rng.random() < 0.7 else None
+        quests[f'a{i}'] = make_quest(f'a{i}', level=rng.randint(1, 12), prerequisite=prereq, xp=rng.randint(0, 150))
+    analysis = quest_analyzer.analyze_quests(quests, max_level=12)
+    assert len(analysis['reachable']) == 300
+    char = {'level': 1, 'experience': 0, 'class': 'Mage', 'active_quests': [], 'completed_quests': []}
+    for qid in rng.sample(list(quests), 20):
+        plan = quest_handler.plan_quests(char, quests, target_quest=qid)
+        assert analysis['fight_xp'][qid] <= plan['fight_xp']
+        assert quests[qid]['required_level'] <= analysis['min_level'][qid] <= 12